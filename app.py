@@ -5,12 +5,44 @@ from datetime import datetime, timedelta
 import numpy as np
 import toml
 import os
+import io
+import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 import msal
 import requests
 
 import plotly.express as px
 
+from event_rules import classify_events
+from import_engine import (
+    plan_eventi_merge, plan_fiscali_insert, plan_highlights_insert, execute_plan,
+    parse_top_flop, iter_fiscali_rows, iter_fiscali_rows_pandas, aggregate_fiscali, FISCALI_TABLE,
+    verify_eventi_plan, StalePlanError
+)
+from dashboard_metrics import (
+    KPI_ORDER, KPI_RPC, calculate_metrics, fetch_kpi_metrics, incasso_deltas, metric_table,
+    nationality_shares, ticket_totals, MAX_SEASONS, season_periods, period_metric_tables,
+    period_summary, period_nationality_shares, period_ticket_totals
+)
+from daily_rollup import (
+    ROLLUP_EVENTI_TABLE, ROLLUP_TABLE, fetch_period_rollup, groups_from_rollup, mark_rollup_pending,
+    pie_frames_from_rollup, plan_days, refresh_daily_rollup
+)
+from result_cache import ResultCache
+from season_cache import load_season_totals, mark_stale
+from season_rules import fetch_season_totals, season_totals, summer_totals
+from table_schema import (
+    DASHBOARD_DETAIL_COLUMNS,
+    DASHBOARD_EVENTI_COLUMNS,
+    DETTAGLIO_INGRESSI_SCHEMA,
+    EVENTI_SCHEMA,
+    HIGHLIGHTS_SCHEMA,
+    select_list,
+    typed_frame,
+)
+from supabase_io import MAX_WORKERS, BulkWriteError, fetch_paginated, fetch_range, fetch_rows_by_keys, fetch_windows
+
 # Configurazione Pagina
 st.set_page_config(
     page_title="Dashboard Eventi",
@@ -36,6 +68,11 @@ supabase_key_global = st.secrets.get("supabase", {}).get("key", "")
 DB_TABLE_NAME = st.secrets.get("supabase", {}).get("table_name", "eventi_importati")
 supabase = init_supabase(supabase_url_global, supabase_key_global)
 
+# Cache dei risultati delle query della dashboard, condivisa da tutte le sessioni
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
 # --- CONFIGURATION HELPERS ---
 def get_config(key):
     """Fetch a configuration value from the app_config table."""
@@ -248,6 +285,208 @@ def render_config_page():
                     except Exception as e:
                         st.error(f"Eccezione durante l'invio SMS: {e}")
 
+# --- IMPORT: parse-once cache ---
+# Ogni interazione rilancia lo script: i file caricati vengono elaborati una sola volta
+# per contenuto (hash SHA-256) e riutilizzati nei rerun. Cache LRU limitata per uploader.
+UPLOAD_CACHE_ENTRIES = 3
+BANNED_TITLES = ["TITOLO DI PROVA SIAE", "Verifica Conformità"]
+
+def upload_digest(uploaded_file):
+    """Content hash of an st.file_uploader file (cache key)."""
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Elaborazione file...")
+def parse_eventi_upload(digest, _data):
+    """ExportEventi -> (df_uploaded, excluded_count). Raises ValueError for invalid files."""
+    try:
+        df_uploaded = pd.read_excel(io.BytesIO(_data), sheet_name='export_titolieventi', header=1)
+    except ValueError:
+        raise ValueError("Il foglio 'export_titolieventi' non è stato trovato nel file Excel.")
+
+    if df_uploaded.shape[1] < 12:
+        raise ValueError("Il file Excel non ha abbastanza colonne (richieste almeno fino alla colonna L).")
+
+    # Updated Indices: A(0), B(1), C(2), D(3), E(4), F(5), I(8), L(11)
+    col_indices = [0, 1, 2, 3, 4, 5, 8, 11]
+    selected_columns = df_uploaded.iloc[:, col_indices].copy()
+    
+    # Strict Renaming
+    selected_columns.columns = [
+        'data_inizio', 'data_fine', 'Nr. Eventi', 'Titolo Evento', 'autore', 
+        'Nazionalità', 'Tot. Presenze', 'Incasso'
+    ]
+    
+    # Capture temp_datetime from data_inizio to process Event/Rassegna logic correctly
+    selected_columns['temp_datetime'] = pd.to_datetime(selected_columns['data_inizio'], dayfirst=True, errors='coerce')
+
+    # Date Cleaning (No Time)
+    selected_columns['data_inizio'] = selected_columns['temp_datetime'].dt.strftime('%Y-%m-%d')
+    selected_columns['data_fine'] = pd.to_datetime(selected_columns['data_fine'], dayfirst=True, errors='coerce').dt.strftime('%Y-%m-%d')
+    
+    # Autore Cleaning
+    selected_columns['autore'] = selected_columns['autore'].astype(str).str.strip()
+    
+    # Numeric Cleaning
+    selected_columns['Nr. Eventi'] = pd.to_numeric(selected_columns['Nr. Eventi'], errors='coerce').fillna(0).astype(int)
+    selected_columns['Tot. Presenze'] = pd.to_numeric(selected_columns['Tot. Presenze'], errors='coerce').fillna(0).astype(int)
+    selected_columns['Incasso'] = pd.to_numeric(selected_columns['Incasso'], errors='coerce').fillna(0.0)
+    
+    event_name_col = 'Titolo Evento'
+
+    # Evento / RASSEGNA / VOS (vectorized rules, see event_rules.py)
+    classify_events(selected_columns, datetime_col='temp_datetime', title_col=event_name_col)
+
+    # Drop temp_datetime (Data is already set and formatted)
+    selected_columns = selected_columns.drop(columns=['temp_datetime'])
+    
+    cols = ['data_inizio', 'data_fine', 'Evento', 'VOS', 'RASSEGNA'] + [c for c in selected_columns.columns if c not in ['data_inizio', 'data_fine', 'Evento', 'VOS', 'RASSEGNA']]
+    df_uploaded = selected_columns[cols]
+
+    # Row Exclusion Logic
+    initial_count = len(df_uploaded)
+    df_uploaded = df_uploaded[~df_uploaded[event_name_col].isin(BANNED_TITLES)]
+    return df_uploaded, initial_count - len(df_uploaded)
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Elaborazione file...")
+def parse_top_flop_upload(digest, _data):
+    """ExportEventi (Top/Flop) -> df_clean. Raises ValueError for invalid files."""
+    try:
+        df_tf = pd.read_excel(io.BytesIO(_data), sheet_name='export_eventi')
+    except ValueError:
+        raise ValueError("Foglio 'export_eventi' non trovato.")
+
+    # Logic: Col A=Data (0), Col B=Titolo (1), Col K=Ingressi (10), Col M=Incasso (12)
+    if df_tf.shape[1] < 11:
+        raise ValueError("Il file non ha abbastanza colonne (serve almeno Colonna K).")
+
+    # Columnar parse: one date parse, masks for ingressi/summer, string cleanup
+    return parse_top_flop(df_tf)
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Elaborazione file...")
+def parse_fiscali_upload(digest, _data, is_xls=False):
+    """ExportTitoliFiscali -> per-screening ticket counts. Raises ValueError for invalid files."""
+    # Streaming read: only Col C=2, H=7, V=21 are kept, aggregated chunk by chunk
+    if is_xls:
+        fiscali_rows = iter_fiscali_rows_pandas(io.BytesIO(_data))
+    else:
+        fiscali_rows = iter_fiscali_rows(io.BytesIO(_data))
+    return aggregate_fiscali(fiscali_rows)
+
+# --- IMPORT: plan / preview / execute ---
+# The plan (insert / update / skip) is computed once per file and kept in the
+# session: reruns only redraw the preview, the execute button writes it as is.
+PLAN_PREVIEW_ROWS = 200
+
+def get_import_plan(kind, digest):
+    return st.session_state.get('import_plans', {}).get((kind, digest))
+
+def store_import_plan(kind, digest, plan):
+    # One pending plan per importer
+    plans = {k: v for k, v in st.session_state.get('import_plans', {}).items() if k[0] != kind}
+    plans[(kind, digest)] = plan
+    st.session_state['import_plans'] = plans
+
+def drop_import_plan(kind):
+    plans = st.session_state.get('import_plans', {})
+    st.session_state['import_plans'] = {k: v for k, v in plans.items() if k[0] != kind}
+
+def render_plan_preview(plan):
+    c1, c2, c3 = st.columns(3)
+    c1.metric("➕ Da inserire", len(plan.inserts))
+    c2.metric("🔄 Da aggiornare", len(plan.updates))
+    c3.metric("⏭️ Già presenti", len(plan.skipped))
+
+    sections = [("Inserimenti", plan.inserts), ("Aggiornamenti (prima / dopo)", plan.updates), ("Saltati", plan.skipped)]
+    for label, frame in sections:
+        if frame.empty:
+            continue
+        with st.expander(f"{label} ({len(frame)})", expanded=False):
+            if len(frame) > PLAN_PREVIEW_ROWS:
+                st.caption(f"Mostrate le prime {PLAN_PREVIEW_ROWS} righe.")
+            st.dataframe(frame.head(PLAN_PREVIEW_ROWS), hide_index=True)
+
+def rollup_days_for_plan(plan):
+    """Days of the daily rollup a plan writes (eventi and fiscali imports; [] for the others)."""
+    date_col = {ROLLUP_EVENTI_TABLE: "data_inizio", FISCALI_TABLE: "data"}.get(plan.table)
+    if date_col is None:
+        return []   # eventi_highlights (per-title rankings) or an eventi table the rollup does not summarize
+    return plan_days(plan, date_col)
+
+def mark_rollup_pending_for_plan(plan):
+    """Flag the rollup days of the plan before writing it; the token for refresh_rollup_for_plan (None if not flagged)."""
+    days = rollup_days_for_plan(plan)
+    if not days:
+        return None
+    try:
+        return mark_rollup_pending(supabase, days)
+    except Exception as e:
+        print(f"Giorni del riepilogo non segnati in sospeso: {e}")
+        return None
+
+def refresh_rollup_for_plan(plan, token):
+    """Recompute the daily rollup for the days the plan wrote and clear their pending flags."""
+    days = rollup_days_for_plan(plan)
+    if not days:
+        return
+    try:
+        refresh_daily_rollup(supabase, days, token)
+    except Exception as e:
+        st.warning(f"Riepilogo giornaliero non aggiornato ({e}): KPI e torte di quei giorni vengono dai dati grezzi finché non si riesegue sql/004_rollup_giornaliero.sql.")
+    get_result_cache().invalidate(ROLLUP_TABLE)
+
+def mark_riepiloghi_stale(plan):
+    """Flag the Riepiloghi periods (anno sociale / estate) of the days an eventi import wrote."""
+    if plan.table != DB_TABLE_NAME:
+        return
+    days = plan_days(plan, "data_inizio")
+    if not days:
+        return
+    try:
+        mark_stale(supabase, plan.table, days)
+    except Exception as e:
+        st.warning(f"Cache dei Riepiloghi non aggiornata ({e}): se la tabella riepiloghi_cache esiste, svuotarla per ricalcolare.")
+
+def run_import_plan(kind, plan):
+    """
+    Execute a stored plan with a progress bar; the plan is dropped once written.
+    A partial failure keeps the written chunks and is reported (BulkWriteError).
+    """
+    progress_bar = st.progress(0)
+    rollup_token = mark_rollup_pending_for_plan(plan)
+    try:
+        report = execute_plan(supabase, plan, progress=lambda done, total: progress_bar.progress(min(done / total, 1.0)))
+    except BulkWriteError:
+        # Part of the plan is already in the DB: it can't be executed again as is,
+        # the next "Prepara Importazione" recomputes it against the new DB state
+        drop_import_plan(kind)
+        refresh_rollup_for_plan(plan, rollup_token)
+        mark_riepiloghi_stale(plan)
+        get_result_cache().invalidate(plan.table)
+        raise
+    progress_bar.progress(1.0)
+    drop_import_plan(kind)
+    refresh_rollup_for_plan(plan, rollup_token)
+    mark_riepiloghi_stale(plan)
+    # Dashboard results of this table are stale for every session
+    get_result_cache().invalidate(plan.table)
+    st.caption(f"⏱️ Scrittura DB: {report.rows} righe in {report.seconds:.2f}s ({report.rows_per_sec:,.0f} righe/s, {report.chunks} blocchi, {report.retries} tentativi ripetuti)")
+    return report
+
+def fetch_eventi_rows(title_col, titles):
+    """Current DB rows of the given titles, with the columns plan_eventi_merge sums into."""
+    return fetch_rows_by_keys(
+        supabase,
+        DB_TABLE_NAME,
+        "id, data_inizio, data_fine, \"Nr. Eventi\", autore, \"Tot. Presenze\", Incasso, \"" + title_col + "\"",
+        title_col,
+        titles
+    )
+
+def plan_titles(plan, title_col):
+    """Titles written by an eventi plan (updated and inserted)."""
+    frames = [frame[title_col] for frame in (plan.updates, plan.inserts) if title_col in frame.columns]
+    return pd.concat(frames).dropna().unique().tolist() if frames else []
+
 # Funzione per la pagina di Importazione (Logica esistente)
 def render_import_page():
     st.title("📥 Importa Dati")
@@ -263,115 +502,25 @@ def render_import_page():
     
     st.success("Credenziali caricate correttamente.")
 
-    # Helper function for Event Logic (Used by both imports)
-    def get_evento(dt):
-        if pd.isna(dt):
-            return None
-        if dt.weekday() == 4:
-            return "ven"
-        current_time = dt.time()
-        start_time = pd.Timestamp("14:00:00").time()
-        end_time = pd.Timestamp("16:00:00").time()
-        if start_time <= current_time <= end_time:
-            return "bam"
-        return "adu"
-
     # --- SECTION 1: ExportEventi.xlsx ---
     st.subheader("Carica file ExportEventi.xlsx")
     uploaded_file = st.file_uploader("Scegli un file Excel", type=['xlsx', 'xls'])
 
     if uploaded_file is not None:
         try:
+            event_name_col = 'Titolo Evento'
             try:
-                df_uploaded = pd.read_excel(uploaded_file, sheet_name='export_titolieventi', header=1)
-            except ValueError:
-                st.error("Il foglio 'export_titolieventi' non è stato trovato nel file Excel.")
+                # Parsed once per file content, reused across reruns
+                df_uploaded, excluded_count = parse_eventi_upload(upload_digest(uploaded_file), uploaded_file.getvalue())
+            except ValueError as e_parse:
+                st.error(str(e_parse))
                 st.stop()
 
-            if df_uploaded.shape[1] < 12:
-                 st.error("Il file Excel non ha abbastanza colonne (richieste almeno fino alla colonna L).")
-                 st.stop()
-
-            # Updated Indices: A(0), B(1), C(2), D(3), E(4), F(5), I(8), L(11)
-            col_indices = [0, 1, 2, 3, 4, 5, 8, 11]
-            selected_columns = df_uploaded.iloc[:, col_indices].copy()
-            
-            # Strict Renaming
-            selected_columns.columns = [
-                'data_inizio', 'data_fine', 'Nr. Eventi', 'Titolo Evento', 'autore', 
-                'Nazionalità', 'Tot. Presenze', 'Incasso'
-            ]
-            
-            # Capture temp_datetime from data_inizio to process Event/Rassegna logic correctly
-            selected_columns['temp_datetime'] = pd.to_datetime(selected_columns['data_inizio'], dayfirst=True, errors='coerce')
-
-            # Date Cleaning (No Time)
-            selected_columns['data_inizio'] = selected_columns['temp_datetime'].dt.strftime('%Y-%m-%d')
-            selected_columns['data_fine'] = pd.to_datetime(selected_columns['data_fine'], dayfirst=True, errors='coerce').dt.strftime('%Y-%m-%d')
-            
-
-            
-            # Autore Cleaning
-            selected_columns['autore'] = selected_columns['autore'].astype(str).str.strip()
-            
-            # Numeric Cleaning
-            selected_columns['Nr. Eventi'] = pd.to_numeric(selected_columns['Nr. Eventi'], errors='coerce').fillna(0).astype(int)
-            selected_columns['Tot. Presenze'] = pd.to_numeric(selected_columns['Tot. Presenze'], errors='coerce').fillna(0).astype(int)
-            selected_columns['Incasso'] = pd.to_numeric(selected_columns['Incasso'], errors='coerce').fillna(0.0)
-            
-            # Use shared get_evento
-            selected_columns['Evento'] = selected_columns['temp_datetime'].apply(get_evento)
-            
-            # --- RASSEGNA Logic (New) ---
-            def get_rassegna(row):
-                dt = row['temp_datetime']
-                if pd.isna(dt):
-                    return "STANDARD"
-                
-                # 1. SCUOLE Rule: Time between 06:00 and 13:30
-                current_time = dt.time()
-                start_time = pd.Timestamp("06:00:00").time()
-                end_time = pd.Timestamp("13:30:00").time()
-                if start_time <= current_time <= end_time:
-                    return "SCUOLE"
-                
-                # 2. CASTELLO Rule: Date between July 1st and September 15th
-                md = (dt.month, dt.day)
-                if (7, 1) <= md <= (9, 15):
-                    return "CASTELLO"
-                
-                # 3. Fallback
-                return "STANDARD"
-
-            selected_columns['RASSEGNA'] = selected_columns.apply(get_rassegna, axis=1)
-
-            event_name_col = 'Titolo Evento'
-            
-            def check_vos(val):
-                if not isinstance(val, str):
-                    return False
-                val_lower = val.lower()
-                keywords = ["(eng)", "(en)", "(originale)", "(vos)"]
-                return any(k in val_lower for k in keywords)
-
-            selected_columns['VOS'] = selected_columns[event_name_col].apply(check_vos)
-
-            # Drop temp_datetime (Data is already set and formatted)
-            selected_columns = selected_columns.drop(columns=['temp_datetime'])
-            
-            cols = ['data_inizio', 'data_fine', 'Evento', 'VOS', 'RASSEGNA'] + [c for c in selected_columns.columns if c not in ['data_inizio', 'data_fine', 'Evento', 'VOS', 'RASSEGNA']]
-            df_uploaded = selected_columns[cols]
-
             st.success("File caricato ed elaborato con successo!")
             
             # --- 1. Row Exclusion Logic ---
-            if event_name_col in df_uploaded.columns:
-                initial_count = len(df_uploaded)
-                banned_titles = ["TITOLO DI PROVA SIAE", "Verifica Conformità"]
-                df_uploaded = df_uploaded[~df_uploaded[event_name_col].isin(banned_titles)]
-                filtered_count = len(df_uploaded)
-                if initial_count != filtered_count:
-                    st.info(f"Escluse {initial_count - filtered_count} righe con titoli non validi ({', '.join(banned_titles)}).")
+            if excluded_count:
+                st.info(f"Escluse {excluded_count} righe con titoli non validi ({', '.join(BANNED_TITLES)}).")
 
             st.subheader("Anteprima Dati Elaborati")
             st.dataframe(
@@ -384,137 +533,46 @@ def render_import_page():
             st.subheader("Carica su Supabase")
             st.info(f"Tabella di destinazione: {DB_TABLE_NAME}")
             
-            if st.button("Carica Dati su Supabase", key="btn_upload_eventi"):
+            eventi_digest = upload_digest(uploaded_file)
+            if st.button("🔍 Prepara Importazione", key="btn_plan_eventi"):
                 if not supabase:
                     st.error("Client Supabase non inizializzato. Controlla le credenziali.")
                 else:
                     try:
+                        timings = {}
+
                         # 1. Fetch Existing Data needed for Summation
                         # We need ID to update, and current values to sum
                         # Important: event_name_col contains the column name for the title (e.g. "Titolo Evento")
-                        response = supabase.table(DB_TABLE_NAME).select("id, data_inizio, data_fine, \"Nr. Eventi\", autore, \"Tot. Presenze\", Incasso, \"" + event_name_col + "\"").execute()
-                        existing_rows = response.data if response.data else []
-                        
-                        # Map: (Titolo) -> {id, pres, inc, start_date, end_date, nr_eventi}
-                        existing_map = {}
-                        for r in existing_rows:
-                            t = r.get(event_name_col)
-                            if t:
-                                existing_map[t] = {
-                                    'id': r['id'],
-                                    'presenze': r.get('Tot. Presenze') or 0,
-                                    'incasso': r.get('Incasso') or 0.0,
-                                    'nr_eventi': r.get('Nr. Eventi') or 0,
-                                    'data_inizio': r.get('data_inizio'),
-                                    'data_fine': r.get('data_fine')
-                                }
-
-                        new_records = []
-                        updated_count = 0
-                        skipped_count = 0
-                        
-                        progress_bar = st.progress(0)
-                        total_rows = len(df_uploaded)
-
-                        for i, (index, row) in enumerate(df_uploaded.iterrows()):
-                             # row_pres already numeric
-                            row_title = row['Titolo Evento']
-                            row_pres = pd.to_numeric(row.get('Tot. Presenze', 0), errors='coerce')
-                            row_pres = 0 if pd.isna(row_pres) else row_pres
-                            
-                            row_inc = pd.to_numeric(row.get('Incasso', 0.0), errors='coerce')
-                            row_inc = 0.0 if pd.isna(row_inc) else row_inc
-                            
-                            key = row_title
-
-                            if key in existing_map:
-                                db_rec = existing_map[key]
-                                
-                                # --- STRICT DUPLICATE RULE ---
-                                db_start_str = str(db_rec.get('data_inizio', ''))
-                                db_end_str = str(db_rec.get('data_fine', ''))
-                                row_start_str = str(row['data_inizio'])
-                                row_end_str = str(row['data_fine'])
-                                
-                                db_pres = int(db_rec.get('presenze', 0))
-                                row_pres_val = int(row_pres)
-
-                                # If Title (key), Start, End, and Presenze match exactly -> Skip
-                                if (db_start_str == row_start_str) and \
-                                   (db_end_str == row_end_str) and \
-                                   (db_pres == row_pres_val):
-                                    skipped_count += 1
-                                    if i % 5 == 0: progress_bar.progress(min((i + 1) / total_rows, 1.0))
-                                    continue 
-
-                                # UPDATE Logic (Sum + Date Range Merge)
-                                new_pres_val = db_rec['presenze'] + row_pres
-                                new_inc_val = db_rec['incasso'] + row_inc
-                                new_ev_val = db_rec['nr_eventi'] + row.get('Nr. Eventi', 0)
-                                
-                                # Date Comparison Logic
-                                try:
-                                    db_start = pd.to_datetime(db_rec['data_inizio']).date() if db_rec['data_inizio'] else None
-                                    db_end = pd.to_datetime(db_rec['data_fine']).date() if db_rec['data_fine'] else None
-                                    
-                                    row_start = pd.to_datetime(row['data_inizio']).date()
-                                    row_end = pd.to_datetime(row['data_fine']).date()
-                                    
-                                    # Handle Start
-                                    if db_start:
-                                        final_start = min(db_start, row_start)
-                                    else:
-                                        final_start = row_start
-                                        
-                                    # Handle End
-                                    if db_end:
-                                        final_end = max(db_end, row_end)
-                                    else:
-                                        final_end = row_end
-                                        
-                                except Exception:
-                                    # Fallback
-                                    final_start = row['data_inizio']
-                                    final_end = row['data_fine']
-                                
-                                # Perform Update
-                                supabase.table(DB_TABLE_NAME).update({
-                                    "Tot. Presenze": int(new_pres_val),
-                                    "Incasso": float(new_inc_val),
-                                    "Nr. Eventi": int(new_ev_val),
-                                    "data_inizio": str(final_start),
-                                    "data_fine": str(final_end),
-                                    "autore": row['autore'] # Keeping latest author logic
-                                }).eq("id", db_rec['id']).execute()
-                                
-                                # Update local map
-                                existing_map[key]['presenze'] = new_pres_val
-                                existing_map[key]['incasso'] = new_inc_val
-                                existing_map[key]['nr_eventi'] = new_ev_val
-                                existing_map[key]['data_inizio'] = str(final_start)
-                                existing_map[key]['data_fine'] = str(final_end)
-                                
-                                updated_count += 1
-                            else:
-                                # INSERT Logic
-                                # Clean NaN for JSON
-                                clean_row = row.where(pd.notnull(row), None).to_dict()
-                                new_records.append(clean_row)
-                            
-                            # Update progress
-                            if i % 5 == 0:
-                                progress_bar.progress(min((i + 1) / total_rows, 1.0))
-                        
-                        progress_bar.progress(1.0)
+                        t0 = time.perf_counter()
+                        # Only the titles present in the file, paginated and checked for completeness
+                        existing_rows = fetch_eventi_rows(event_name_col, df_uploaded[event_name_col].dropna().unique().tolist())
+                        timings['Lettura DB'] = time.perf_counter() - t0
 
-                        # Bulk Insert New
-                        if new_records:
-                            supabase.table(DB_TABLE_NAME).insert(new_records).execute()
-                        
-                        st.success(f"Operazione completata! ✅ Inseriti: {len(new_records)} nuovi record. 🔄 Aggiornati (sommati): {updated_count} record esistenti.")
+                        # 2. Set-based merge (sum + date range) computed on DataFrames
+                        t0 = time.perf_counter()
+                        store_import_plan('eventi', eventi_digest, plan_eventi_merge(df_uploaded, existing_rows, DB_TABLE_NAME, title_col=event_name_col))
+                        timings['Merge'] = time.perf_counter() - t0
+                        st.caption("⏱️ " + " • ".join(f"{k}: {v:.2f}s" for k, v in timings.items()))
 
                     except Exception as e:
                         st.error(f"Errore durante l'elaborazione: {e}")
+
+            plan = get_import_plan('eventi', eventi_digest)
+            if plan is not None:
+                render_plan_preview(plan)
+                if st.button("Carica Dati su Supabase", key="btn_upload_eventi", disabled=plan.is_empty()):
+                    try:
+                        # 3. The sums were computed at "Prepara" time: refuse if the rows changed since
+                        verify_eventi_plan(plan, fetch_eventi_rows(event_name_col, plan_titles(plan, event_name_col)), title_col=event_name_col)
+                        # 4. Chunked bulk writes: updates as upsert on id, then inserts
+                        run_import_plan('eventi', plan)
+                        st.success(f"Operazione completata! ✅ Inseriti: {len(plan.inserts)} nuovi record. 🔄 Aggiornati (sommati): {len(plan.updates)} record esistenti. ⏭️ Saltati (già presenti): {len(plan.skipped)}.")
+                    except StalePlanError as e:
+                        drop_import_plan('eventi')
+                        st.error(str(e))
+                    except Exception as e:
+                        st.error(f"Errore durante l'elaborazione: {e}")
                         
         except Exception as e:
             st.error(f"Errore nella lettura del file: {e}")
@@ -534,6 +592,7 @@ def render_import_page():
             else:
                 try:
                     supabase.table("eventi_highlights").delete().neq("id", 0).execute()
+                    get_result_cache().invalidate("eventi_highlights")
                     st.success("Tabella svuotata. Ora puoi ricaricare il file Excel.")
                     time.sleep(1)
                     st.rerun()
@@ -544,66 +603,13 @@ def render_import_page():
 
     if uploaded_top_flop:
         try:
-            # Load specific sheet
+            df_clean = None
             try:
-                df_tf = pd.read_excel(uploaded_top_flop, sheet_name='export_eventi')
-            except ValueError:
-                st.error("Foglio 'export_eventi' non trovato.")
-                st.stop()
-            
-            # Logic: Col A=Data (0), Col C=Titolo (2), Col K=Ingressi (10)
-            if df_tf.shape[1] < 11:
-                st.error("Il file non ha abbastanza colonne (serve almeno Colonna K).")
-            else:
-                top_flop_data = []
-                
-                for idx, row in df_tf.iterrows():
-                    r_data = row.iloc[0]      # Col A
-                    r_titolo = row.iloc[1]    # Col B
-                    r_autore = row.iloc[2]    # Col C
-                    r_nazione = row.iloc[3]   # Col D
-                    r_ingressi = row.iloc[10] # Col K
-                    r_incasso = row.iloc[12]  # Col M (Index 12) - Incasso
-                    
-                    try:
-                        ing_val = float(r_ingressi)
-                        if pd.isna(ing_val) or ing_val <= 0: continue
-                        
-                        inc_val = 0.0
-                        try:
-                            inc_val = float(r_incasso)
-                        except:
-                            inc_val = 0.0
-                            
-                    except: continue
-                    
-                    try:
-                         d_parsed = pd.to_datetime(r_data, dayfirst=True)
-                         if pd.isna(d_parsed): continue
-                         
-                         # NEW: Extract Time string (HH:MM)
-                         time_str = d_parsed.strftime('%H:%M')
-                         
-                         # SUMMER FILTER (15/06 - 15/09)
-                         md = (d_parsed.month, d_parsed.day)
-                         if (6, 15) <= md <= (9, 15):
-                             continue # Skip summer movies
-                    except: continue
-                        
-                    top_flop_data.append({
-                        "data": d_parsed.strftime('%Y-%m-%d'),
-                        "orario": time_str,
-                        "titolo_evento": str(r_titolo).strip(),
-                        "autore": str(r_autore).strip() if pd.notna(r_autore) else "",
-                        "nazione": str(r_nazione).strip() if pd.notna(r_nazione) else "",
-                        "ingressi": int(ing_val),
-                        "incasso": float(inc_val)
-                    })
-                
-                df_clean = pd.DataFrame(top_flop_data)
-                
-                df_clean = pd.DataFrame(top_flop_data)
-                
+                df_clean = parse_top_flop_upload(upload_digest(uploaded_top_flop), uploaded_top_flop.getvalue())
+            except ValueError as e_parse:
+                st.error(str(e_parse))
+
+            if df_clean is not None:
                 if df_clean.empty:
                     st.warning("Nessun dato valido trovato.")
                 else:
@@ -616,41 +622,33 @@ def render_import_page():
                     # --- SAVING LOGIC (INCREMENTAL) ---
                     st.info("Tabella destinazione: eventi_highlights (Append mode)")
                     
-                    if st.button("💾 Carica Dati (Incrementale)", type="primary"):
+                    top_flop_digest = upload_digest(uploaded_top_flop)
+                    if st.button("🔍 Prepara Importazione", key="btn_plan_top_flop"):
                         if not supabase:
                             st.error("DB non connesso.")
                         else:
                             try:
-                                # Prepare ALL records (Let DB handle duplicates)
-                                records_payload = []
-                                
-                                for _, row in df_clean.iterrows():
-                                    records_payload.append({
-                                        "data": row['data'],
-                                        "orario": row['orario'],
-                                        "titolo_evento": row['titolo_evento'],
-                                        "autore": row['autore'],
-                                        "nazione": row['nazione'],
-                                        "ingressi": int(row['ingressi']),
-                                        "incasso": float(row['incasso']),
-                                        "categoria": "DATA", # Correct Italian column name
-                                        "proiezioni_count": 1
-                                    })
-                                
-                                # Perform UPSERT with Ignore Duplicates
-                                if records_payload:
-                                    # count='exact' helps us know if insertion happened, but upsert return is tricky with ignore.
-                                    # We trust the operation.
-                                    supabase.table("eventi_highlights").upsert(
-                                        records_payload, 
-                                        on_conflict="data, titolo_evento, orario", 
-                                        ignore_duplicates=True
-                                    ).execute()
-                                    
-                                    st.success(f"✅ Elaborazione completata! I dati sono stati uniti (Upsert). Se i numeri non tornano, prova a svuotare la tabella e ricaricare.")
-                                else:
-                                    st.warning("Nessun dato da elaborare.")
-                                
+                                # Projections already stored in the dates covered by the file
+                                date_min, date_max = df_clean['data'].min(), df_clean['data'].max()
+                                existing_rows = fetch_paginated(
+                                    lambda count=None: supabase.table("eventi_highlights")
+                                        .select("data, titolo_evento, orario", count=count)
+                                        .gte("data", date_min)
+                                        .lte("data", date_max)
+                                        .order("id")
+                                )
+                                store_import_plan('top_flop', top_flop_digest, plan_highlights_insert(df_clean, existing_rows))
+                            except Exception as e:
+                                st.error(f"Errore DB: {e}")
+
+                    plan = get_import_plan('top_flop', top_flop_digest)
+                    if plan is not None:
+                        render_plan_preview(plan)
+                        if st.button("💾 Carica Dati (Incrementale)", type="primary", disabled=plan.is_empty()):
+                            try:
+                                # Upsert with ignore_duplicates: rows added meanwhile are absorbed by the unique key
+                                run_import_plan('top_flop', plan)
+                                st.success(f"✅ Elaborazione completata! Inserite {len(plan.inserts)} righe ({len(plan.skipped)} già presenti).")
                             except Exception as e:
                                 st.error(f"Errore DB: {e}")
                                 if "column" in str(e):
@@ -668,146 +666,55 @@ def render_import_page():
 
     if uploaded_fiscali is not None:
         try:
-            # We use header=None because we rely on Excel A=0 index logic
-            # Col C=2, H=7, V=21
-            df_fiscali = pd.read_excel(uploaded_fiscali, header=None)
-            
-            if df_fiscali.shape[1] < 22:
-                st.error("Il file non ha abbastanza colonne (richiesta almeno Colonna V / Indice 21).")
-            else:
-                agg_map = {}
-                
-                # Iterate rows
-                for idx, row in df_fiscali.iterrows():
-                    # Parse Date (Col C / Index 2)
-                    # Parse Date (Col C / Index 2)
-                    raw_val = row.iloc[2]
-                    dt_obj = None
+            df_agg = None
+            try:
+                df_agg = parse_fiscali_upload(
+                    upload_digest(uploaded_fiscali),
+                    uploaded_fiscali.getvalue(),
+                    is_xls=uploaded_fiscali.name.lower().endswith('.xls')
+                )
+            except ValueError as e_cols:
+                st.error(str(e_cols))
 
-                    try:
-                        if pd.isnull(raw_val):
-                            continue
-                            
-                        # Case 1: Already a datetime/timestamp object (Pandas auto-conversion)
-                        if isinstance(raw_val, (datetime, pd.Timestamp)):
-                            dt_obj = raw_val
-                        # Case 2: String - try specific format first, then generic
-                        elif isinstance(raw_val, str):
-                            raw_val = raw_val.strip()
-                            try:
-                                # Specific format requested by user
-                                dt_obj = datetime.strptime(raw_val, "%d/%m/%Y %H.%M.%S")
-                            except ValueError:
-                                # Fallback for standard formats
-                                dt_obj = pd.to_datetime(raw_val, dayfirst=True)
-                                
-                    except Exception:
-                        continue # Skip row if date is unparseable
-
-                    if dt_obj is None:
-                        continue
-                    
-                    # Parse Title (Col H / Index 7)
-                    title = row.iloc[7]
-                    if pd.isna(title):
-                        continue
-                    
-                    # Parse TicketType (Col V / Index 21)
-                    ticket_val = str(row.iloc[21]).strip()
-                    
-                    # Extract time string (HH:MM)
-                    time_str = dt_obj.strftime('%H:%M')
-                    
-                    # New Key: (Title, Date, Time)
-                    key = (title, dt_obj.date(), time_str)
-                    
-                    if key not in agg_map:
-                        agg_map[key] = {
-                            "titolo_evento": title,
-                            "data": dt_obj.date(),
-                            "orario": time_str,
-                            "first_dt": dt_obj, # for get_evento
-                            "interi": 0, "ridotti": 0, "soci": 0, "omaggio": 0, "nc": 0
-                        }
-                    
-                    stats = agg_map[key]
-                    if ticket_val == 'R7':
-                        stats['ridotti'] += 1
-                    elif ticket_val == 'I1':
-                        stats['interi'] += 1
-                    elif ticket_val == 'O7':
-                        stats['omaggio'] += 1
-                    elif ticket_val == 'R8':
-                        stats['soci'] += 1
-                    else:
-                        stats['nc'] += 1
-                
-                if not agg_map:
+            if df_agg is not None:
+                if df_agg.empty:
                     st.warning("Nessuna riga valida trovata (controlla il formato data 'dd/mm/yyyy H.M.S').")
                 else:
-                    st.success(f"File elaborato! Trovati {len(agg_map)} eventi aggregati.")
+                    st.success(f"File elaborato! Trovati {len(df_agg)} eventi aggregati.")
                     
-                    if st.button("Carica Dati Fiscali su Supabase", key="btn_upload_fiscali"):
+                    fiscali_digest = upload_digest(uploaded_fiscali)
+                    if st.button("🔍 Prepara Importazione", key="btn_plan_fiscali"):
                         if not supabase:
                              st.error("Client Supabase non connesso.")
                         else:
+                             # 1. Fetch Existing Keys, only for the dates covered by the file
+                             existing_rows = []
+                             date_min = min(df_agg['data']).strftime('%Y-%m-%d')
+                             date_max = max(df_agg['data']).strftime('%Y-%m-%d')
+                             try:
+                                 existing_rows = fetch_paginated(
+                                     lambda count=None: supabase.table("dettaglio_ingressi")
+                                         .select("data, orario, evento, titolo_evento", count=count)
+                                         .gte("data", date_min)
+                                         .lte("data", date_max)
+                                         .order("id")
+                                 )
+                             except Exception as e_fetch:
+                                 st.warning(f"Attenzione: Impossibile scaricare dati esistenti per controllo duplicati ({e_fetch}).")
+
+                             # 2. Prepare Insert (id assigned by the database)
+                             store_import_plan('fiscali', fiscali_digest, plan_fiscali_insert(df_agg, existing_rows))
+
+                    plan = get_import_plan('fiscali', fiscali_digest)
+                    if plan is not None:
+                        render_plan_preview(plan)
+                        if plan.is_empty():
+                            st.warning(f"Nessun dato da inserire. {len(plan.skipped)} record saltati perché già presenti.")
+                        elif st.button("Carica Dati Fiscali su Supabase", key="btn_upload_fiscali"):
                              try:
-                                 # 1. Fetch Existing Keys (Pre-processing)
-                                 existing_records = set()
-                                 try:
-                                     response = supabase.table("dettaglio_ingressi").select("data, evento").execute()
-                                     if response.data:
-                                         existing_records = {(row['data'], row['evento']) for row in response.data}
-                                 except Exception as e_fetch:
-                                     st.warning(f"Attenzione: Impossibile scaricare dati esistenti per controllo duplicati ({e_fetch}).")
-
-                                 # 2. Get Max ID
-                                 next_id = 1
-                                 try:
-                                     res_id = supabase.table("dettaglio_ingressi").select("id").order("id", desc=True).limit(1).execute()
-                                     if res_id.data:
-                                         next_id = res_id.data[0]['id'] + 1
-                                 except Exception as e:
-                                     st.warning(f"Attenzione: Impossibile recuperare ultimo ID ({e}). Parto da 1.")
-                                 
-                                 # 3. Prepare Insert
-                                 records_insert = []
-                                 skipped_count = 0
-
-                                 for k, v in agg_map.items():
-                                     evt_tag = get_evento(v['first_dt'])
-                                     final_tag = evt_tag if evt_tag else "adu"
-                                     date_str = v['data'].strftime('%Y-%m-%d')
-                                     
-                                     # Duplicate Check
-                                     if (date_str, final_tag) in existing_records:
-                                         skipped_count += 1
-                                         continue
-
-                                     rec = {
-                                         "id": next_id,
-                                         "data": date_str,
-                                         "orario": v['orario'],
-                                         "evento": final_tag,
-                                         "interi": v['interi'],
-                                         "ridotti": v['ridotti'],
-                                         "soci": v['soci'],
-                                         "omaggio": v['omaggio'],
-                                         "nc": v['nc']
-                                     }
-                                     records_insert.append(rec)
-                                     next_id += 1
-                                 
-                                 # 4. Insert
-                                 if records_insert:
-                                    supabase.table("dettaglio_ingressi").insert(records_insert).execute()
-                                    st.success(f"Importazione completata: {len(records_insert)} nuovi ingressi inseriti ({skipped_count} saltati perché già presenti).")
-                                 else:
-                                    if skipped_count > 0:
-                                        st.warning(f"Nessun dato inserito. {skipped_count} record saltati perché già presenti.")
-                                    else:
-                                        st.info("Nessun dato da inserire.")
-                                     
+                                 # 3. Chunked insert; the unique key (data, orario, evento, titolo_evento) absorbs concurrent imports
+                                 run_import_plan('fiscali', plan)
+                                 st.success(f"Importazione completata: {len(plan.inserts)} nuovi ingressi inseriti ({len(plan.skipped)} saltati perché già presenti).")
                              except Exception as ex:
                                  st.error(f"Errore durante l'inserimento: {ex}")
 
@@ -838,6 +745,13 @@ def render_kpi_card(title, value, comparison_html, details, border_color="gray",
 </div>
 """, unsafe_allow_html=True)
 
+# Helper per formattazione Euro
+def format_euro(amount):
+    return f"€ {amount:,.0f}".replace(",", ".")
+
+def format_euro_precise(amount):
+    return f"€ {amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
 # Funzione per generare dati mock per il Periodo 2
 def generate_mock_data(start_date, end_date):
     dates = pd.date_range(start=start_date, end=end_date)
@@ -862,43 +776,6 @@ def generate_mock_data(start_date, end_date):
     
     return pd.DataFrame(data)
 
-# Funzione per calcolare le metriche
-def calculate_metrics(df):
-    kpi_configs = {
-        'TOTALE': {'filter': None, 'color': 'blue'},
-        'ADULTI': {'filter': 'adu', 'color': 'green'},
-        'VENERDÌ': {'filter': 'ven', 'color': 'red'},
-        'BAMBINI': {'filter': 'bam', 'color': 'orange'}
-    }
-    
-    metrics = {}
-    for key, config in kpi_configs.items():
-        if config['filter']:
-            subset = df[df['Evento'] == config['filter']]
-        else:
-            subset = df
-        
-        total_incasso = subset['Incasso'].sum() if 'Incasso' in subset.columns else 0
-        tot_presenze = 0
-        if 'Tot. Presenze' in subset.columns:
-            tot_presenze = pd.to_numeric(subset['Tot. Presenze'], errors='coerce').fillna(0).sum()
-        elif 'Presenze' in subset.columns:
-            tot_presenze = pd.to_numeric(subset['Presenze'], errors='coerce').fillna(0).sum()
-        else:
-            tot_presenze = len(subset)
-
-        avg_ticket = total_incasso / tot_presenze if tot_presenze > 0 else 0
-        count_events = len(subset)
-        
-        metrics[key] = {
-            'incasso': total_incasso,
-            'presenze': tot_presenze,
-            'avg_ticket': avg_ticket,
-            'count': count_events,
-            'color': config['color']
-        }
-    return metrics
-
 # Helper to get max date
 def get_latest_date():
     try:
@@ -909,6 +786,522 @@ def get_latest_date():
         return None
     return None
 
+# --- STATISTICHE: period data ---
+# Per-view projections: only the columns the dashboard shows or computes with
+MAIN_PROJECTION = select_list(DASHBOARD_EVENTI_COLUMNS)
+DETAIL_PROJECTION = select_list(DASHBOARD_DETAIL_COLUMNS)
+DASHBOARD_FETCH_WORKERS = 6   # 3 queries per period, 2 periods
+DASHBOARD_MAX_REQUESTS = 8    # requests in flight on the shared client (queries x their page workers)
+
+def fetch_main_frame(start_date, end_date, max_workers=MAX_WORKERS):
+    # Paginated: count="exact" first, then the pages concurrently (no max-rows truncation)
+    rows = fetch_range(supabase, DB_TABLE_NAME, "data_inizio", start_date, end_date, columns=MAIN_PROJECTION, max_workers=max_workers)
+    # Typed once here (category / int32 / float / datetime64): no coercions while rendering
+    return typed_frame(rows, EVENTI_SCHEMA, DASHBOARD_EVENTI_COLUMNS)
+
+def fetch_detail_frame(start_date, end_date, max_workers=MAX_WORKERS):
+    rows = fetch_range(supabase, "dettaglio_ingressi", "data", start_date, end_date, columns=DETAIL_PROJECTION, max_workers=max_workers)
+    return typed_frame(rows, DETTAGLIO_INGRESSI_SCHEMA, DASHBOARD_DETAIL_COLUMNS)
+
+def fetch_dashboard_data(periods, kinds):
+    """
+    Run the requested queries of every period concurrently.
+
+    periods: {label: (start_date, end_date)}; kinds: any of 'df' (eventi rows),
+    'detail' (dettaglio_ingressi rows) and 'kpi' (metric table, plus under 'rollup'
+    the daily rollup rows it came from, or None). Returns (data, errors, timings)
+    keyed by (label, kind): a failed query gets its empty typed frame (or None for
+    the KPIs) and its exception in `errors`; timings['wall'] is the total.
+    Results come from the shared result cache when another session already loaded them;
+    the KPIs of a period whose rows are already cached are computed from those rows
+    (returned as its 'df' too).
+    """
+    cache = get_result_cache()
+
+    def cached_rows(table, projection, date_col, start, end, fetch):
+        # Shared by every session; narrower ranges are sliced from the loaded ones
+        return cache.get_range(table, projection, date_col, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                               lambda lo, hi: fetch(lo, hi, max_workers=page_workers))
+
+    def cached_kpi(start, end):
+        # Daily rollup first (a few rows per day, it feeds the pies too), then the kpi_per_evento RPC.
+        # The rollup is keyed by its table: every import that rewrites rollup days drops it
+        days = (start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        rollup = cache.get_or_fetch((ROLLUP_TABLE, DB_TABLE_NAME, *days),
+                                    lambda: fetch_period_rollup(supabase, DB_TABLE_NAME, start, end, max_workers=page_workers))
+        if rollup is not None:
+            return metric_table(groups_from_rollup(rollup)), rollup
+        # Keyed by the eventi table: an import into it (or a switch of DB_TABLE_NAME) never reuses it
+        return cache.get_or_fetch((DB_TABLE_NAME, KPI_RPC, *days),
+                                  lambda: fetch_kpi_metrics(supabase, DB_TABLE_NAME, start, end)), None
+
+    tasks, local_kpi = {}, []
+    for label, (start, end) in periods.items():
+        main_cached = cache.covers(DB_TABLE_NAME, MAIN_PROJECTION, "data_inizio", start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        if 'df' in kinds or ('kpi' in kinds and main_cached):
+            tasks[(label, 'df')] = (cached_rows, (DB_TABLE_NAME, MAIN_PROJECTION, "data_inizio", start, end, fetch_main_frame), lambda: typed_frame([], EVENTI_SCHEMA, DASHBOARD_EVENTI_COLUMNS))
+        if 'detail' in kinds:
+            tasks[(label, 'detail')] = (cached_rows, ("dettaglio_ingressi", DETAIL_PROJECTION, "data", start, end, fetch_detail_frame), lambda: typed_frame([], DETTAGLIO_INGRESSI_SCHEMA, DASHBOARD_DETAIL_COLUMNS))
+        if 'kpi' in kinds:
+            if main_cached:
+                # Rows already in memory: the KPIs come from the sliced frame, no query
+                local_kpi.append(label)
+            else:
+                tasks[(label, 'kpi')] = (cached_kpi, (start, end), lambda: (None, None))
+
+    # Every query pages with its own workers: split the request budget among them
+    page_workers = max(1, DASHBOARD_MAX_REQUESTS // max(1, len(tasks)))
+
+    def timed(fn, args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args), None, time.perf_counter() - t0
+        except Exception as e:
+            return None, e, time.perf_counter() - t0
+
+    data, errors, timings = {}, {}, {}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(DASHBOARD_FETCH_WORKERS, len(tasks))) as pool:
+        futures = {key: pool.submit(timed, fn, args) for key, (fn, args, _) in tasks.items()}
+        for key, future in futures.items():
+            result, error, elapsed = future.result()
+            timings[key] = elapsed
+            if error is not None:
+                errors[key] = error
+                result = tasks[key][2]()
+            data[key] = result
+    for label in periods:
+        if (label, 'kpi') in data:
+            data[(label, 'kpi')], data[(label, 'rollup')] = data[(label, 'kpi')]
+    for label in local_kpi:
+        data[(label, 'kpi')] = calculate_metrics(data[(label, 'df')]) if (label, 'df') not in errors else None
+        data[(label, 'rollup')] = None
+    timings['wall'] = time.perf_counter() - t0
+    return data, errors, timings
+
+def fetch_season_windows(periods):
+    """
+    Eventi and dettaglio_ingressi rows of the season windows only (one query per
+    table, see fetch_windows), shared between sessions through the result cache.
+    Returns (data, errors, wall) with data keyed 'df' / 'detail' as in fetch_dashboard_data.
+    """
+    cache = get_result_cache()
+    windows = tuple((p_start.strftime('%Y-%m-%d'), p_end.strftime('%Y-%m-%d')) for _, p_start, p_end in periods)
+    page_workers = max(1, DASHBOARD_MAX_REQUESTS // 2)
+
+    def main_rows():
+        rows = fetch_windows(supabase, DB_TABLE_NAME, "data_inizio", windows, columns=MAIN_PROJECTION, max_workers=page_workers)
+        return typed_frame(rows, EVENTI_SCHEMA, DASHBOARD_EVENTI_COLUMNS)
+
+    def detail_rows():
+        rows = fetch_windows(supabase, "dettaglio_ingressi", "data", windows, columns=DETAIL_PROJECTION, max_workers=page_workers)
+        return typed_frame(rows, DETTAGLIO_INGRESSI_SCHEMA, DASHBOARD_DETAIL_COLUMNS)
+
+    tasks = {
+        'df': ((DB_TABLE_NAME, MAIN_PROJECTION, "windows", windows), main_rows, lambda: typed_frame([], EVENTI_SCHEMA, DASHBOARD_EVENTI_COLUMNS)),
+        'detail': (("dettaglio_ingressi", DETAIL_PROJECTION, "windows", windows), detail_rows, lambda: typed_frame([], DETTAGLIO_INGRESSI_SCHEMA, DASHBOARD_DETAIL_COLUMNS)),
+    }
+    data, errors = {}, {}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = {name: pool.submit(cache.get_or_fetch, key, fetch) for name, (key, fetch, _) in tasks.items()}
+        for name, future in futures.items():
+            try:
+                data[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+                data[name] = tasks[name][2]()
+    return data, errors, time.perf_counter() - t0
+
+def render_multi_season_comparison():
+    """
+    The same date window over the last N seasons: one read of just those windows
+    (eventi + dettaglio_ingressi), rows labelled by period and grouped once for
+    KPIs, nationalities and tickets.
+    """
+    col_date1, col_date2, col_n, col_button = st.columns([2, 2, 1, 1])
+    with col_date1:
+        start_date = st.date_input("Da Data", value=datetime.now() - timedelta(days=30), format="DD/MM/YYYY", key="ms_start")
+    with col_date2:
+        end_date = st.date_input("A Data", value=datetime.now(), format="DD/MM/YYYY", key="ms_end")
+    with col_n:
+        n_seasons = st.number_input("Stagioni", min_value=2, max_value=MAX_SEASONS, value=5, key="ms_n")
+    with col_button:
+        st.write("")
+        st.write("")
+        elabora_btn = st.button("ELABORA", type="primary", use_container_width=True, key="ms_elabora")
+
+    if elabora_btn:
+        try:
+            periods = season_periods(start_date, end_date, int(n_seasons))
+        except ValueError as e:
+            st.error(str(e))
+            return
+        data, errors, wall = fetch_season_windows(periods)
+        for key, error in errors.items():
+            st.error(f"Errore durante il recupero dei dati: {error}")
+        df_windows, detail_windows = data['df'], data['detail']
+        st.session_state.multi_season = {
+            'periods': periods,
+            'tables': period_metric_tables(df_windows, periods) if 'data_inizio' in df_windows.columns else {},
+            'nationality': period_nationality_shares(df_windows, periods) if 'Nazionalità' in df_windows.columns else pd.DataFrame(),
+            'tickets': period_ticket_totals(detail_windows, periods) if 'data' in detail_windows.columns else {},
+            'wall': wall,
+        }
+
+    result = st.session_state.get('multi_season')
+    if not result:
+        st.info("Seleziona l'intervallo e il numero di stagioni, poi clicca 'ELABORA'.")
+        return
+    if not result['tables']:
+        st.info("Nessun dato disponibile.")
+        return
+
+    labels = [p[0] for p in result['periods']]
+    st.caption(" • ".join(f"{label}: {p_start:%d/%m/%Y} – {p_end:%d/%m/%Y}" for label, p_start, p_end in result['periods']))
+
+    kpi_key = st.radio("KPI", options=KPI_ORDER, horizontal=True, label_visibility="collapsed", key="ms_kpi")
+
+    # KPI per stagione, con variazione dell'incasso rispetto alla stagione precedente
+    summary = period_summary(result['tables'], kpi_key)
+    fig = px.bar(summary.reset_index(names='Stagione'), x='Stagione', y='incasso', text=summary['incasso'].map(format_euro).to_numpy(),
+                 title=f"Incasso {kpi_key} per stagione", labels={'incasso': 'Incasso'})
+    st.plotly_chart(fig, use_container_width=True)
+
+    table = pd.DataFrame({
+        'Stagione': summary.index,
+        'Incasso': summary['incasso'].map(format_euro).to_numpy(),
+        'Δ Incasso': summary['delta_incasso'].map(lambda v: "" if pd.isna(v) else f"{v:+.1f}%").to_numpy(),
+        'Presenze': summary['presenze'].astype(int).to_numpy(),
+        'Eventi': summary['count'].astype(int).to_numpy(),
+        'Biglietto medio': summary['avg_ticket'].map(format_euro_precise).to_numpy(),
+        'Media Ingressi': summary['media_ingressi'].round(2).to_numpy(),
+    })
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        nationality = result['nationality']
+        if nationality.empty:
+            st.info("Dati insufficienti per Nazionalità")
+        else:
+            fig = px.bar(nationality, x='periodo', y='Incasso', color='Nazionalità', barmode='stack',
+                         category_orders={'periodo': labels}, title="Ripartizione Incassi per Nazionalità",
+                         labels={'periodo': 'Stagione'})
+            fig.update_layout(barnorm='percent')
+            st.plotly_chart(fig, use_container_width=True)
+    with c2:
+        tickets = result['tickets']
+        if not tickets:
+            st.info("Dati insufficienti per Ingressi")
+        else:
+            ticket_rows = pd.DataFrame({label: tickets[label].loc[kpi_key].drop('rows') for label in labels}).T
+            ticket_long = ticket_rows.rename_axis('periodo').reset_index().melt(id_vars='periodo', var_name='Tipologia', value_name='Totale')
+            ticket_long['Tipologia'] = ticket_long['Tipologia'].str.capitalize()
+            fig = px.bar(ticket_long, x='periodo', y='Totale', color='Tipologia', barmode='stack',
+                         title=f"Distribuzione Ingressi ({kpi_key})", labels={'periodo': 'Stagione'})
+            fig.update_layout(barnorm='percent')
+            st.plotly_chart(fig, use_container_width=True)
+
+# --- Statistiche: righe grezze caricate dai blocchi che le mostrano ---
+# ELABORA legge solo i KPI (riepilogo giornaliero / kpi_per_evento): le righe
+# di eventi e dettaglio_ingressi servono solo alla tabella e ai grafici, che le
+# chiedono a load_period_rows quando vengono disegnati. Se il riepilogo copre il
+# periodo, anche le torte vengono da lì (period_pie_frames).
+PERIOD_ROWS_STATE = {'df': 'df_{}', 'detail': 'detail_df_{}'}
+PERIOD_ROWS_ERRORS = {
+    ('main', 'df'): "Errore durante il recupero dei dati",
+    ('compare', 'df'): "Errore recupero dati Periodo 2",
+}
+
+def record_fetch_timings(timings):
+    """Add the query timings of a fetch round to the ones shown in the sidebar."""
+    shown = st.session_state.get('fetch_timings') or {'wall': 0.0}
+    for key, elapsed in timings.items():
+        shown[key] = shown.get(key, 0.0) + elapsed
+    st.session_state.fetch_timings = shown
+
+def load_period_rows(dataset, *kinds):
+    """
+    Raw rows ('df' eventi / 'detail' dettaglio_ingressi) of a Statistiche period
+    ('main' / 'compare'): fetched concurrently through the shared cache the first
+    time a block asks for them, then kept in session_state until the next ELABORA.
+    Returns one frame per kind (None for a period that was not requested).
+    """
+    if dataset not in st.session_state.periods:
+        return (None,) * len(kinds)   # comparison without a second period
+    keys = {kind: PERIOD_ROWS_STATE[kind].format(dataset) for kind in kinds}
+    missing = [kind for kind, key in keys.items() if st.session_state.get(key) is None]
+    if missing:
+        data, errors, timings = fetch_dashboard_data({dataset: st.session_state.periods[dataset]}, missing)
+        record_fetch_timings(timings)
+        for kind in missing:
+            if (dataset, kind) in errors:
+                message = PERIOD_ROWS_ERRORS.get((dataset, kind))
+                if message:
+                    st.error(f"{message}: {errors[(dataset, kind)]}")
+                else:
+                    print(f"Errore {kind} {dataset}: {errors[(dataset, kind)]}")
+            st.session_state[keys[kind]] = data[(dataset, kind)]
+    return tuple(st.session_state[keys[kind]] for kind in kinds)
+
+def period_pie_frames(dataset):
+    """(nationality, tickets) frames for the pies of a period: the daily rollup's if it covers it, else the raw rows."""
+    pies = st.session_state.get(f'pies_{dataset}')
+    if pies is not None:
+        return pies
+    return load_period_rows(dataset, 'df', 'detail')
+
+# --- Statistiche: blocchi della pagina ---
+# Solo i blocchi con widget sono st.fragment (filtro, VOS, ordinamento, pagina):
+# un click riesegue solo il frammento che lo contiene, senza CSS,
+# get_latest_date, controlli MSAL/RBAC di main() né ridisegno degli altri
+# blocchi. ELABORA (fuori dai frammenti) riesegue tutta la pagina.
+
+def render_kpi_row(metrics_p1, metrics_p2=None):
+    # Every card's delta in one vectorized pass
+    deltas = incasso_deltas(metrics_p1, metrics_p2) if metrics_p2 is not None else None
+
+    st.markdown("###") # Spacer
+    cols = st.columns(4)
+    
+    for i, key in enumerate(KPI_ORDER):
+        m1 = metrics_p1.loc[key]
+        
+        comparison_html = "&nbsp;"
+        prev_value_formatted = None
+
+        if metrics_p2 is not None:
+            prev_value_formatted = format_euro(metrics_p2.loc[key, 'incasso'])
+            delta_percent = deltas[key]
+            
+            if delta_percent > 0:
+                color = "#28a745"
+                arrow = "▲"
+            elif delta_percent < 0:
+                color = "#dc3545"
+                arrow = "▼"
+            else:
+                color = "#6c757d"
+                arrow = "•"
+            
+            comparison_html = f'<span style="color: {color}; font-weight: bold;">{arrow} {delta_percent:+.1f}%</span>'
+
+        presenze_formatted = f"{int(m1['presenze']):,}".replace(",", ".")
+        avg_ticket_formatted = format_euro_precise(m1['avg_ticket'])
+        details = f"<strong>{presenze_formatted}</strong> Presenze<br>Biglietto medio: <strong>{avg_ticket_formatted}</strong> • {m1['count']} Eventi"
+
+        with cols[i]:
+            render_kpi_card(
+                title=key,
+                value=format_euro(m1['incasso']),
+                comparison_html=comparison_html,
+                details=details,
+                border_color=m1['color'],
+                prev_value=prev_value_formatted
+            )
+
+@st.fragment
+def render_detail_section(metrics_p1):
+    """Filter radio, table and the charts it drives (single period): rerun together on a filter click."""
+    df_main = load_period_rows('main', 'df')[0]
+    st.markdown("###")
+    st.markdown("### Dettaglio Analitico")
+    
+    # Filtro visivo
+    col_filter, col_metric = st.columns([3, 1])
+    
+    with col_filter:
+        st.radio(
+            "Filtra Tabella:",
+            options=KPI_ORDER,
+            horizontal=True,
+            label_visibility="collapsed",
+            key="active_filter"
+        )
+    active_filter = st.session_state.active_filter
+
+    # Metrica Dinamica: lookup in the metric table (no recomputation per click)
+    media_ingressi = metrics_p1.loc[active_filter, 'media_ingressi']
+
+    with col_metric:
+        st.metric(label="Media Ingressi", value=f"{media_ingressi:.2f}")
+
+    render_detail_table(df_main, active_filter)
+
+    st.markdown("### Analisi Dettagliata")
+    render_single_charts(*period_pie_frames('main'), active_filter)
+
+DETAIL_COLUMN_LABELS = {'Titolo Evento': 'Titolo', 'autore': 'Autore', 'data_inizio': 'Data inizio', 'data_fine': 'Data fine'}
+DETAIL_PAGE_ROWS = 200
+
+@st.fragment
+def render_detail_table(df_main, active_filter):
+    # Own fragment: the VOS checkbox and the page selector rerun the table only
+    # Define styling configurations for the filters
+    kpi_configs = {
+        "TOTALE": {"label": "TOTALE", "color": "#0d6efd", "filter": None},   # Blue
+        "ADULTI": {"label": "ADULTI", "color": "#198754", "filter": "adu"},   # Green
+        "VENERDÌ": {"label": "VENERDÌ", "color": "#dc3545", "filter": "ven"}, # Red
+        "BAMBINI": {"label": "BAMBINI", "color": "#fd7e14", "filter": "bam"}  # Orange
+    }
+    
+    current_config = kpi_configs[active_filter]
+    if current_config['filter']:
+        display_df = df_main[df_main['Evento'] == current_config['filter']].copy()
+    else:
+        display_df = df_main.copy()
+
+    if 'VOS' in display_df.columns and display_df['VOS'].any():
+        if st.checkbox("Mostra solo Versione Originale (VOS)", value=False):
+            display_df = display_df[display_df['VOS'] == True]
+
+    # 1. Hide the columns only used for filtering (the query already skips the rest)
+    cols_to_drop = ['Evento', 'VOS']
+    display_df = display_df.drop(columns=[c for c in cols_to_drop if c in display_df.columns])
+
+    # 2. Reorder Columns (Autore after Title)
+    desired_order = ['Titolo Evento', 'autore', 'Nr. Eventi', 'Nazionalità', 'Tot. Presenze', 'Incasso', 'data_inizio', 'data_fine']
+    # Select only existing columns from desired_order + any others not mentioned
+    final_cols = [c for c in desired_order if c in display_df.columns] + [c for c in display_df.columns if c not in desired_order]
+    display_df = display_df[final_cols]
+
+    # 3. Rename & Format
+    column_config = {
+        "data_inizio": st.column_config.DateColumn("Data inizio", format="DD/MM/YYYY"),
+        "data_fine": st.column_config.DateColumn("Data fine", format="DD/MM/YYYY"),
+        "Incasso": st.column_config.NumberColumn("Incasso", format="%.2f €"),
+    }
+    
+    # 4. Paging: the browser gets at most DETAIL_PAGE_ROWS rows per rerun
+    n_rows = len(display_df)
+    if n_rows > DETAIL_PAGE_ROWS:
+        n_pages = -(-n_rows // DETAIL_PAGE_ROWS)
+        col_sort, col_dir, col_page, col_rows = st.columns([2, 1, 1, 2])
+        # Sorting applies to every row before paging (the column headers sort the shown page only)
+        with col_sort:
+            sort_col = st.selectbox("Ordina per", options=[None, *display_df.columns], key="detail_sort_col",
+                                    format_func=lambda c: "Ordine originale" if c is None else DETAIL_COLUMN_LABELS.get(c, c))
+        with col_dir:
+            descending = st.radio("Verso", options=[True, False], key="detail_sort_desc",
+                                  format_func=lambda d: "↓ Decr." if d else "↑ Cresc.") if sort_col else True
+        if sort_col:
+            display_df = display_df.sort_values(sort_col, ascending=not descending, kind='stable', na_position='last')
+        with col_page:
+            # Keyed on the row count: a new filter/dataset starts again from page 1
+            page = st.number_input("Pagina", min_value=1, max_value=n_pages, value=1, step=1, key=f"detail_page_{n_rows}")
+        first = (int(page) - 1) * DETAIL_PAGE_ROWS
+        last = min(first + DETAIL_PAGE_ROWS, n_rows)
+        with col_rows:
+            st.caption(f"Righe {first + 1}–{last} di {n_rows} (pagina {int(page)} di {n_pages}). "
+                       "Le intestazioni ordinano solo la pagina: per tutto il periodo usa \"Ordina per\".")
+        display_df = display_df.iloc[first:last]
+
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config
+    )
+
+# --- PIE CHARTS SECTION (Refactored) ---
+# Figures are memoized per dataset version (bumped by ELABORA) and filter:
+# switching filters back and forth reuses the figure already built.
+def build_pie_figure(data_df, chart_type, title, active_filter):
+    """Return (figure, None) or (None, info message)."""
+    if chart_type == "nationality":
+        if 'Nazionalità' not in data_df.columns or 'Incasso' not in data_df.columns:
+            return None, "Colonne mancanti per Nazionalità."
+        # Altri < 5% (vectorized share mask)
+        pie_final = nationality_shares(data_df)
+        if pie_final.empty:
+            return None, f"Totale incassi 0 per {title}."
+        fig = px.pie(pie_final, values='Incasso', names='Nazionalità', title=title)
+        fig.update_traces(textinfo='percent+label')
+        return fig, None
+
+    # Tickets: totals of all four filters from a single groupby('evento')
+    totals_table = ticket_totals(data_df)
+    current = totals_table.loc[active_filter if active_filter else 'TOTALE']
+    if current['rows'] == 0:
+        return None, f"Nessun dato ingressi per {title}"
+    totals = current.drop('rows')
+    pie_data = pd.DataFrame({'Tipologia': totals.index.str.capitalize(), 'Totale': totals.values})
+    pie_data = pie_data[pie_data['Totale'] > 0]
+    if pie_data.empty:
+        return None, f"Nessun ingresso > 0 per {title}"
+    fig = px.pie(pie_data, values='Totale', names='Tipologia', title=title)
+    fig.update_traces(textposition='auto', textinfo='label+percent')
+    return fig, None
+
+def render_pie_chart_helper(data_df, chart_type, title, active_filter=None, dataset='main'):
+    if data_df is None or data_df.empty:
+        st.info(f"Nessun dato per {title}")
+        return
+
+    key = (st.session_state.dataset_version, dataset, chart_type, title, active_filter if chart_type == "tickets" else None)
+    figures = st.session_state.pie_figures
+    if key not in figures:
+        figures[key] = build_pie_figure(data_df, chart_type, title, active_filter)
+    fig, message = figures[key]
+    if fig is None:
+        st.info(message)
+    else:
+        st.plotly_chart(fig, use_container_width=True)
+
+def render_single_charts(df_main, detail_df_main, active_filter):
+    # Original Layout: Side by Side (Nat | Tickets)
+    c_single1, c_single2 = st.columns(2)
+    with c_single1:
+        if not df_main.empty and 'Nazionalità' in df_main.columns:
+            render_pie_chart_helper(df_main, "nationality", "Ripartizione Incassi per Nazionalità")
+        else:
+            st.info("Dati insufficienti per Nazionalità")
+
+    with c_single2:
+        if not detail_df_main.empty and 'interi' in detail_df_main.columns:
+            render_pie_chart_helper(detail_df_main, "tickets", "Distribuzione Ingressi", active_filter)
+        else:
+            st.info("Dati insufficienti per Ingressi")
+
+def render_comparison_charts():
+    df_main, detail_df_main = period_pie_frames('main')
+    df_compare, detail_df_compare = period_pie_frames('compare')
+    st.markdown("### Analisi Dettagliata")
+
+    # 1. Nazionalità
+    st.subheader("Ripartizione Incassi per Nazionalità")
+    c1, c2 = st.columns(2)
+    with c1:
+        # STRICT ISOLATION: P1 uses df_main
+        if not df_main.empty and 'Nazionalità' in df_main.columns:
+            render_pie_chart_helper(df_main, "nationality", "Periodo 1")
+        else:
+            st.info("Dati insufficienti per Nazionalità (P1)")
+    with c2:
+        # STRICT ISOLATION: P2 uses df_compare
+        if df_compare is not None and not df_compare.empty and 'Nazionalità' in df_compare.columns:
+            render_pie_chart_helper(df_compare, "nationality", "Periodo 2", dataset='compare')
+        else:
+            st.info("Dati insufficienti per Nazionalità (P2)")
+
+    # 2. Tickets
+    st.markdown("---")
+    st.subheader("Distribuzione Ingressi")
+    c3, c4 = st.columns(2)
+    with c3:
+        # STRICT ISOLATION: P1 uses detail_df_main
+        if not detail_df_main.empty and 'interi' in detail_df_main.columns:
+            render_pie_chart_helper(detail_df_main, "tickets", "Ingressi (Periodo 1)")
+        else:
+            st.info("Dati insufficienti per Ingressi (P1)")
+    with c4:
+        # STRICT ISOLATION: P2 uses detail_df_compare
+        if detail_df_compare is not None and not detail_df_compare.empty and 'interi' in detail_df_compare.columns:
+            render_pie_chart_helper(detail_df_compare, "tickets", "Ingressi (Periodo 2)", dataset='compare')
+        else:
+            st.info("Dati insufficienti per Ingressi (P2)")
+
 # Funzione per la pagina di Consultazione
 def render_consulta_page():
     # CSS Injection per stile globale e fix layout
@@ -959,20 +1352,20 @@ def render_consulta_page():
         st.error("Errore: Client Supabase non inizializzato. Configura le credenziali nella pagina 'Importa Dati' o in `secrets.toml`.")
         return
 
-    # Helper per formattazione Euro
-    def format_euro(amount):
-        return f"€ {amount:,.0f}".replace(",", ".") 
-
-    def format_euro_precise(amount):
-        return f"€ {amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
     # --- Top Control Bar ---
     with st.container():
         # Toggle Comparison
-        col_toggle, _ = st.columns([1, 3])
+        col_toggle, col_multi, _ = st.columns([1, 1, 2])
         with col_toggle:
             comparison_mode = st.toggle("Confronta con altro periodo")
+        with col_multi:
+            multi_season_mode = st.toggle("Confronta più stagioni", disabled=comparison_mode)
+
+    if multi_season_mode and not comparison_mode:
+        render_multi_season_comparison()
+        return
 
+    with st.container():
         start_date_p2 = None
         end_date_p2 = None
 
@@ -1028,6 +1421,16 @@ def render_consulta_page():
         st.session_state.active_filter = 'TOTALE'
     if 'is_comparison' not in st.session_state:
         st.session_state.is_comparison = False
+    if 'kpi_main' not in st.session_state:
+        st.session_state.kpi_main = None
+    if 'kpi_compare' not in st.session_state:
+        st.session_state.kpi_compare = None
+    if 'periods' not in st.session_state:
+        st.session_state.periods = {}
+    if 'dataset_version' not in st.session_state:
+        st.session_state.dataset_version = 0
+    if 'pie_figures' not in st.session_state:
+        st.session_state.pie_figures = {}
 
     # Sidebar settings
     st.sidebar.subheader("Impostazioni")
@@ -1035,397 +1438,68 @@ def render_consulta_page():
     # Logica Elaborazione
     if elabora_btn:
         st.session_state.is_comparison = comparison_mode
-        try:
-            # ==============================================================================
-            # STEP 1: FETCH PERIOD 1 (MAIN)
-            # ==============================================================================
-            # A. Main Events Table
-            response_main = supabase.table(DB_TABLE_NAME) \
-                .select("*") \
-                .gte("data_inizio", start_date.strftime('%Y-%m-%d')) \
-                .lte("data_inizio", end_date.strftime('%Y-%m-%d')) \
-                .execute()
-            
-            if response_main.data:
-                _df = pd.DataFrame(response_main.data)
-                if 'Incasso' in _df.columns:
-                    _df['Incasso'] = pd.to_numeric(_df['Incasso'], errors='coerce').fillna(0)
-                st.session_state.df_main = _df
-            else:
-                st.session_state.df_main = pd.DataFrame()
-            
-            # Safe Initialization Main
-            if st.session_state.df_main.empty:
-                st.session_state.df_main = pd.DataFrame(columns=["data_inizio", "Titolo Evento", "Incasso", "Presenze", "Nazionalità", "evento", "Nr. Eventi"])
-
-            # B. Detail Table (dettaglio_ingressi)
-            try:
-                response_detail_main = supabase.table("dettaglio_ingressi") \
-                    .select("*") \
-                    .gte("data", start_date.strftime('%Y-%m-%d')) \
-                    .lte("data", end_date.strftime('%Y-%m-%d')) \
-                    .execute()
-                
-                if response_detail_main.data:
-                    st.session_state.detail_df_main = pd.DataFrame(response_detail_main.data)
-                else:
-                    st.session_state.detail_df_main = pd.DataFrame()
-            except Exception as e:
-                print(f"Errore dettaglio_ingressi P1: {e}")
-                st.session_state.detail_df_main = pd.DataFrame()
-
-            # Safe Initialization Detail Main
-            if st.session_state.detail_df_main.empty:
-                st.session_state.detail_df_main = pd.DataFrame(columns=["interi", "ridotti", "soci", "omaggio", "nc", "evento"])
-
-            # ==============================================================================
-            # STEP 2: FETCH PERIOD 2 (COMPARISON) - ONLY IF TOGGLE IS ON
-            # ==============================================================================
-            # Pre-initialize to avoid UnboundLocalError or previous state leaks
-            detail_df_compare = pd.DataFrame() 
-
-            if comparison_mode and start_date_p2 and end_date_p2:
-                # A. Main Events Table (Comparison)
-                try:
-                    response_compare = supabase.table(DB_TABLE_NAME) \
-                        .select("*") \
-                        .gte("data_inizio", start_date_p2.strftime('%Y-%m-%d')) \
-                        .lte("data_inizio", end_date_p2.strftime('%Y-%m-%d')) \
-                        .execute()
-                    
-                    if response_compare.data:
-                        _df_cmp = pd.DataFrame(response_compare.data)
-                        if 'Incasso' in _df_cmp.columns:
-                            _df_cmp['Incasso'] = pd.to_numeric(_df_cmp['Incasso'], errors='coerce').fillna(0)
-                        st.session_state.df_compare = _df_cmp
-                    else:
-                        st.session_state.df_compare = pd.DataFrame()
-                    
-                    # Safe Initialization Compare
-                    if st.session_state.df_compare.empty:
-                        st.session_state.df_compare = pd.DataFrame(columns=["data_inizio", "Titolo Evento", "Incasso", "Presenze", "Nazionalità", "evento", "Nr. Eventi"])
-
-                except Exception as e:
-                     st.error(f"Errore recupero dati Periodo 2: {e}")
-                     st.session_state.df_compare = pd.DataFrame(columns=["data_inizio", "Titolo Evento", "Incasso", "Presenze", "Nazionalità", "evento", "Nr. Eventi"])
-
-                # B. Detail Table (Comparison)
-                try:
-                    response_detail_cmp = supabase.table("dettaglio_ingressi") \
-                        .select("*") \
-                        .gte("data", start_date_p2.strftime('%Y-%m-%d')) \
-                        .lte("data", end_date_p2.strftime('%Y-%m-%d')) \
-                        .execute()
-                    
-                    if response_detail_cmp.data:
-                         st.session_state.detail_df_compare = pd.DataFrame(response_detail_cmp.data)
-                    else:
-                         st.session_state.detail_df_compare = pd.DataFrame()
-                except Exception as e:
-                    print(f"Errore dettaglio_ingressi P2: {e}")
-                    st.session_state.detail_df_compare = pd.DataFrame()
-
-                # Safe Initialization Detail Compare
-                if st.session_state.detail_df_compare.empty:
-                    st.session_state.detail_df_compare = pd.DataFrame(columns=["interi", "ridotti", "soci", "omaggio", "nc", "evento"])
-
-            else:
+        periods = {'main': (start_date, end_date)}
+        if comparison_mode and start_date_p2 and end_date_p2:
+            periods['compare'] = (start_date_p2, end_date_p2)
+        st.session_state.periods = periods
+
+        # Only the KPIs of both periods, concurrently; the raw rows are loaded
+        # by the blocks that show them (load_period_rows)
+        data, errors, timings = fetch_dashboard_data(periods, ('kpi',))
+        st.session_state.fetch_timings = None
+        record_fetch_timings(timings)
+        # New datasets: previous figures are stale
+        st.session_state.dataset_version += 1
+        st.session_state.pie_figures = {}
+
+        for dataset in ('main', 'compare'):
+            # Rows sliced from the cache for the local KPIs, otherwise loaded on first use
+            st.session_state[f'df_{dataset}'] = data.get((dataset, 'df'))
+            st.session_state[f'detail_df_{dataset}'] = None
+            st.session_state[f'kpi_{dataset}'] = None
+            st.session_state[f'pies_{dataset}'] = None
+            if dataset not in periods:
                 # Reset Comparison Data if mode is off
-                st.session_state.df_compare = None
-                st.session_state.detail_df_compare = None
-                
-            st.session_state.active_filter = 'TOTALE'
-            
-        except Exception as e:
-            st.error(f"Errore durante il recupero dei dati: {e}")
-            st.session_state.df_main = pd.DataFrame(columns=["data_inizio", "Titolo Evento", "Incasso", "Presenze", "Nazionalità", "evento", "Nr. Eventi"])
-            st.session_state.df_compare = None
-
-    # --- KPI Section ---
-    if st.session_state.df_main is not None and not st.session_state.df_main.empty:
-        # STRICT ISOLATION: Local variables for calculation
-        df_main = st.session_state.df_main
-        metrics_p1 = calculate_metrics(df_main)
-        
-        metrics_p2 = None
-        if st.session_state.is_comparison and st.session_state.df_compare is not None:
-            df_compare = st.session_state.df_compare
-            metrics_p2 = calculate_metrics(df_compare)
-
-        # Render KPI Cards
-        st.markdown("###") # Spacer
-        cols = st.columns(4)
-        
-        order = ['TOTALE', 'ADULTI', 'VENERDÌ', 'BAMBINI']
-        
-        for i, key in enumerate(order):
-            m1 = metrics_p1[key]
-            
-            comparison_html = "&nbsp;"
-            prev_value_formatted = None
-
-            if metrics_p2:
-                m2 = metrics_p2[key]
-                val1 = m1['incasso']
-                val2 = m2['incasso']
-                
-                prev_value_formatted = format_euro(val2)
+                continue
+            # Metric table (one row per card), computed once per dataset:
+            # from the database aggregate, or a single groupby on the raw rows
+            kpi, rollup = data[(dataset, 'kpi')], data[(dataset, 'rollup')]
+            if rollup is not None:
+                # Pies from the rollup too: dettaglio_ingressi is not read for this period
+                st.session_state[f'pies_{dataset}'] = pie_frames_from_rollup(rollup)
+            if kpi is None:
+                kpi = calculate_metrics(load_period_rows(dataset, 'df')[0])
+            st.session_state[f'kpi_{dataset}'] = kpi
 
-                if val2 != 0:
-                    delta_percent = ((val1 - val2) / val2) * 100
-                elif val1 != 0:
-                    delta_percent = 100.0 
-                else:
-                    delta_percent = 0.0
-                
-                if delta_percent > 0:
-                    color = "#28a745"
-                    arrow = "▲"
-                elif delta_percent < 0:
-                    color = "#dc3545"
-                    arrow = "▼"
-                else:
-                    color = "#6c757d"
-                    arrow = "•"
-                
-                comparison_html = f'<span style="color: {color}; font-weight: bold;">{arrow} {delta_percent:+.1f}%</span>'
-
-            presenze_formatted = f"{int(m1['presenze']):,}".replace(",", ".")
-            avg_ticket_formatted = format_euro_precise(m1['avg_ticket'])
-            details = f"<strong>{presenze_formatted}</strong> Presenze<br>Biglietto medio: <strong>{avg_ticket_formatted}</strong> • {m1['count']} Eventi"
-
-            with cols[i]:
-                render_kpi_card(
-                    title=key,
-                    value=format_euro(m1['incasso']),
-                    comparison_html=comparison_html,
-                    details=details,
-                    border_color=m1['color'],
-                    prev_value=prev_value_formatted
-                )
-
-        # --- Filter Selection & Data Table (Only if NOT comparison) ---
-        if not st.session_state.is_comparison:
-            st.markdown("###")
-            st.markdown("### Dettaglio Analitico")
-            
-            # Filtro visivo
-            col_filter, col_metric = st.columns([3, 1])
-            
-            with col_filter:
-                st.radio(
-                    "Filtra Tabella:",
-                    options=order,
-                    horizontal=True,
-                    label_visibility="collapsed",
-                    key="active_filter"
-                )
-
-            # Metrica Dinamica
-            kpi_configs_metric = { 
-                'TOTALE': {'filter': None},
-                'ADULTI': {'filter': 'adu'},
-                'VENERDÌ': {'filter': 'ven'},
-                'BAMBINI': {'filter': 'bam'}
-            }
-            
-            current_config_metric = kpi_configs_metric[st.session_state.active_filter]
-            if current_config_metric['filter']:
-                subset_metric = df_main[df_main['Evento'] == current_config_metric['filter']]
-            else:
-                subset_metric = df_main
-            
-            sum_presenze = 0
-            if 'Tot. Presenze' in subset_metric.columns:
-                sum_presenze = pd.to_numeric(subset_metric['Tot. Presenze'], errors='coerce').fillna(0).sum()
-            elif 'Presenze' in subset_metric.columns:
-                sum_presenze = pd.to_numeric(subset_metric['Presenze'], errors='coerce').fillna(0).sum()
-                
-            sum_eventi = 0
-            if 'Nr. Eventi' in subset_metric.columns:
-                 sum_eventi = pd.to_numeric(subset_metric['Nr. Eventi'], errors='coerce').fillna(0).sum()
-            else:
-                 sum_eventi = len(subset_metric)
-
-            media_ingressi = sum_presenze / sum_eventi if sum_eventi > 0 else 0
-
-            with col_metric:
-                st.metric(label="Media Ingressi", value=f"{media_ingressi:.2f}")
-            
-            # Dataframe Display
-            # Define styling configurations for the filters
-            kpi_configs = {
-                "TOTALE": {"label": "TOTALE", "color": "#0d6efd", "filter": None},   # Blue
-                "ADULTI": {"label": "ADULTI", "color": "#198754", "filter": "adu"},   # Green
-                "VENERDÌ": {"label": "VENERDÌ", "color": "#dc3545", "filter": "ven"}, # Red
-                "BAMBINI": {"label": "BAMBINI", "color": "#fd7e14", "filter": "bam"}  # Orange
-            }
-            
-            current_config = kpi_configs[st.session_state.active_filter]
-            if current_config['filter']:
-                display_df = df_main[df_main['Evento'] == current_config['filter']].copy()
-            else:
-                display_df = df_main.copy()
-
-            if 'VOS' in display_df.columns and display_df['VOS'].any():
-                if st.checkbox("Mostra solo Versione Originale (VOS)", value=False):
-                    display_df = display_df[display_df['VOS'] == True]
-
-            # 1. Hide unwanted columns
-            cols_to_drop = ['id', 'Evento', 'VOS', 'temp_datetime', 'RASSEGNA', 'tmdb_processed']
-            display_df = display_df.drop(columns=[c for c in cols_to_drop if c in display_df.columns])
-
-            # 2. Reorder Columns (Autore after Title)
-            desired_order = ['Titolo Evento', 'autore', 'Nr. Eventi', 'Nazionalità', 'Tot. Presenze', 'Incasso', 'data_inizio', 'data_fine']
-            # Select only existing columns from desired_order + any others not mentioned
-            final_cols = [c for c in desired_order if c in display_df.columns] + [c for c in display_df.columns if c not in desired_order]
-            display_df = display_df[final_cols]
-
-            # 3. Rename & Format
-            column_config = {
-                "data_inizio": st.column_config.DateColumn("Data inizio", format="DD/MM/YYYY"),
-                "data_fine": st.column_config.DateColumn("Data fine", format="DD/MM/YYYY"),
-                "Incasso": st.column_config.NumberColumn("Incasso", format="%.2f €"),
-            }
-            
-            st.dataframe(
-                display_df,
-                use_container_width=True,
-                hide_index=True,
-                column_config=column_config
-            )
-
-        # --- PIE CHARTS SECTION (Refactored) ---
-        # Helper interno per i grafici
-        def render_pie_chart_helper(data_df, chart_type, title, active_filter=None):
-            if data_df is None or data_df.empty:
-                st.info(f"Nessun dato per {title}")
-                return
-
-            if chart_type == "nationality":
-                if 'Nazionalità' not in data_df.columns or 'Incasso' not in data_df.columns:
-                    st.info("Colonne mancanti per Nazionalità.")
-                    return
-                # Data Prep
-                pie_df = data_df.copy()
-                pie_df['Incasso'] = pd.to_numeric(pie_df['Incasso'], errors='coerce').fillna(0)
-                pie_grouped = pie_df.groupby('Nazionalità', as_index=False)['Incasso'].sum()
-                total_incasso = pie_grouped['Incasso'].sum()
-                
-                if total_incasso <= 0:
-                    st.info(f"Totale incassi 0 per {title}.")
-                    return
-
-                # Altri < 5%
-                pie_grouped['Nazionalità'] = pie_grouped.apply(
-                    lambda x: x['Nazionalità'] if (x['Incasso'] / total_incasso) >= 0.05 else 'Altri', 
-                    axis=1
-                )
-                pie_final = pie_grouped.groupby('Nazionalità', as_index=False)['Incasso'].sum()
-                pie_final = pie_final.sort_values(by='Incasso', ascending=False).head(10)
-                
-                fig = px.pie(pie_final, values='Incasso', names='Nazionalità', title=title)
-                fig.update_traces(textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
-
-            elif chart_type == "tickets":
-                # Filter Logic
-                current_filter = active_filter if active_filter else 'TOTALE'
-                kpi_configs = { 
-                    'TOTALE': {'filter': None},
-                    'ADULTI': {'filter': 'adu'},
-                    'VENERDÌ': {'filter': 'ven'},
-                    'BAMBINI': {'filter': 'bam'}
-                }
-                filter_val = kpi_configs.get(current_filter, {}).get('filter')
+        st.session_state.active_filter = 'TOTALE'
 
-                df_filtered = data_df.copy()
-                if filter_val and 'evento' in df_filtered.columns:
-                    df_filtered = df_filtered[df_filtered['evento'] == filter_val]
-                
-                if df_filtered.empty:
-                    st.info(f"Nessun dato ingressi per {title}")
-                    return
-
-                cols_to_sum = ['interi', 'ridotti', 'soci', 'omaggio']
-                for c in cols_to_sum:
-                    if c in df_filtered.columns:
-                        df_filtered[c] = pd.to_numeric(df_filtered[c], errors='coerce').fillna(0)
-                
-                totals = df_filtered[cols_to_sum].sum()
-                pie_data = pd.DataFrame({'Tipologia': totals.index.str.capitalize(), 'Totale': totals.values})
-                pie_data = pie_data[pie_data['Totale'] > 0]
-                
-                if not pie_data.empty:
-                    fig = px.pie(pie_data, values='Totale', names='Tipologia', title=title)
-                    fig.update_traces(textposition='auto', textinfo='label+percent')
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info(f"Nessun ingresso > 0 per {title}")
+    # --- KPI Section ---
+    # Filter, VOS, sort and page clicks rerun only their fragment
+    # (render_detail_section / render_detail_table), ELABORA reruns the page.
+    metrics_p1 = st.session_state.kpi_main
+    if metrics_p1 is not None and metrics_p1.loc['TOTALE', 'count'] > 0:
+        metrics_p2 = st.session_state.kpi_compare if st.session_state.is_comparison else None
 
-
-        # Rendering Charts
-        st.markdown("### Analisi Dettagliata")
-        
-        # 1. Nazionalità
-        if st.session_state.is_comparison:
-            st.subheader("Ripartizione Incassi per Nazionalità")
-            c1, c2 = st.columns(2)
-            with c1:
-                # STRICT ISOLATION: P1 uses df_main
-                if not st.session_state.df_main.empty and 'Nazionalità' in st.session_state.df_main.columns:
-                    render_pie_chart_helper(st.session_state.df_main, "nationality", "Periodo 1")
-                else:
-                    st.info("Dati insufficienti per Nazionalità (P1)")
-            with c2:
-                # STRICT ISOLATION: P2 uses df_compare
-                if st.session_state.df_compare is not None and not st.session_state.df_compare.empty and 'Nazionalità' in st.session_state.df_compare.columns:
-                    render_pie_chart_helper(st.session_state.df_compare, "nationality", "Periodo 2")
-                else:
-                    st.info("Dati insufficienti per Nazionalità (P2)")
-        else:
-            # Single Mode - Nazionalità
-             pass
+        render_kpi_row(metrics_p1, metrics_p2)
 
         if not st.session_state.is_comparison:
-             # Original Layout: Side by Side (Nat | Tickets)
-             c_single1, c_single2 = st.columns(2)
-             with c_single1:
-                 if not st.session_state.df_main.empty and 'Nazionalità' in st.session_state.df_main.columns:
-                    render_pie_chart_helper(st.session_state.df_main, "nationality", "Ripartizione Incassi per Nazionalità")
-                 else:
-                    st.info("Dati insufficienti per Nazionalità")
-
-             with c_single2:
-                 # Pass active_filter from session state
-                 if not st.session_state.detail_df_main.empty and 'interi' in st.session_state.detail_df_main.columns:
-                     render_pie_chart_helper(st.session_state.detail_df_main, "tickets", "Distribuzione Ingressi", st.session_state.active_filter)
-                 else:
-                     st.info("Dati insufficienti per Ingressi")
-        
+            render_detail_section(metrics_p1)
         else:
-            # Comparison Mode - Tickets
-            st.markdown("---")
-            st.subheader("Distribuzione Ingressi")
-            c3, c4 = st.columns(2)
-            with c3:
-                # STRICT ISOLATION: P1 uses detail_df_main
-                if not st.session_state.detail_df_main.empty and 'interi' in st.session_state.detail_df_main.columns:
-                    render_pie_chart_helper(st.session_state.detail_df_main, "tickets", "Ingressi (Periodo 1)")
-                else:
-                    st.info("Dati insufficienti per Ingressi (P1)")
-            with c4:
-                # STRICT ISOLATION: P2 uses detail_df_compare
-                if st.session_state.detail_df_compare is not None and not st.session_state.detail_df_compare.empty and 'interi' in st.session_state.detail_df_compare.columns:
-                    render_pie_chart_helper(st.session_state.detail_df_compare, "tickets", "Ingressi (Periodo 2)")
-                else:
-                     st.info("Dati insufficienti per Ingressi (P2)")
+            render_comparison_charts()
             
-    elif st.session_state.df_main is not None and st.session_state.df_main.empty:
+    elif metrics_p1 is not None:
         st.info("Nessun dato disponibile.")
     else:
         st.info("Seleziona le date e clicca 'ELABORA' per iniziare.")
 
+    # After the blocks: includes the rows they loaded in this run
+    if st.sidebar.checkbox("Mostra tempi di caricamento", key="debug_fetch_timings") and st.session_state.get('fetch_timings'):
+        timings = st.session_state.fetch_timings
+        queries = {k: v for k, v in timings.items() if k != 'wall'}
+        sequential = sum(queries.values())
+        st.sidebar.caption("⏱️ " + " • ".join(f"{label}/{query}: {v:.2f}s" for (label, query), v in queries.items()))
+        st.sidebar.caption(f"Totale in parallelo: {timings['wall']:.2f}s (in sequenza: {sequential:.2f}s, risparmio {sequential - timings['wall']:.2f}s)")
+
 # Funzione per la pagina Utenti (RBAC Manager)
 def get_entra_users():
     """
@@ -1573,6 +1647,48 @@ def render_users_page():
 
 # Main App Navigation
 # Funzione per la pagina Riepiloghi
+def fetch_riepiloghi_frame():
+    """
+    data / evento / presenze / incasso of the eventi rows with presenze, for the
+    local Riepiloghi fallback (same rows as riepiloghi_stagioni: the daily rollup
+    sums incasso over every row, so it can't give the summer price).
+    """
+    # Fetch data: New column name "Tot. Presenze" (paginated: no max-rows truncation)
+    rows = fetch_paginated(
+        lambda count=None: supabase.table(DB_TABLE_NAME)
+        .select('data_inizio, "Tot. Presenze", Evento, Incasso', count=count)
+        .neq('"Tot. Presenze"', 0).not_.is_('"Tot. Presenze"', "null")
+        .order("id")
+    )
+    df = typed_frame(rows, EVENTI_SCHEMA, ['data_inizio', 'Tot. Presenze', 'Evento', 'Incasso'])
+    # Standardize column names for easier processing
+    # Map "data_inizio" -> "data" AND "Tot. Presenze" -> "presenze"
+    return df.rename(columns={
+        'data_inizio': 'data', 
+        'Tot. Presenze': 'presenze',
+        'Evento': 'evento',
+        'Incasso': 'incasso'
+    })
+
+def fetch_riepiloghi_totals():
+    """
+    (presenze per anno sociale x evento, summer totals per year): from the persistent
+    season cache (only missing / import-flagged periods recomputed); without the cache
+    table, one small response from riepiloghi_stagioni, or the rows grouped here.
+    """
+    try:
+        totals, _ = load_season_totals(supabase, DB_TABLE_NAME, fetch_riepiloghi_frame)
+        return totals
+    except Exception as e:
+        print(f"Cache dei Riepiloghi non disponibile: {e}")
+
+    totals = fetch_season_totals(supabase, DB_TABLE_NAME)
+    if totals is None:
+        # Vectorized on the rows; price and labels only on the grouped frames
+        df = fetch_riepiloghi_frame()
+        totals = season_totals(df), summer_totals(df)
+    return totals
+
 def render_riepiloghi_page():
     st.title("📈 Riepiloghi")
     
@@ -1584,111 +1700,25 @@ def render_riepiloghi_page():
     # 1. Fetch Data
     try:
         with st.spinner("Elaborazione riepiloghi in corso..."):
-            # Fetch data: New column name "Tot. Presenze"
-            # Note: Filter in Python if simple filter prevents proper sums, but SQL filter is better for performance
-            response = supabase.table(DB_TABLE_NAME).select('data_inizio, "Tot. Presenze", Evento, Incasso').neq('"Tot. Presenze"', 0).not_.is_('"Tot. Presenze"', "null").execute()
-            
-            if not response.data:
+            # 2. Anno Sociale & summer window (season_rules), grouped by the database
+            df_grouped, df_summer_grouped = fetch_riepiloghi_totals()
+            if df_grouped.empty and df_summer_grouped.empty:
                 st.warning("Nessun dato disponibile.")
                 return
 
-            df = pd.DataFrame(response.data)
-            if not df.empty:
-                # Standardize column names for easier processing
-                # Map "data_inizio" -> "data" AND "Tot. Presenze" -> "presenze"
-                df.rename(columns={
-                    'data_inizio': 'data', 
-                    'Tot. Presenze': 'presenze',
-                    'Evento': 'evento',
-                    'Incasso': 'incasso'
-                }, inplace=True)
-            
-            # Convert presenze to numeric just in case
-            df['presenze'] = pd.to_numeric(df['presenze'], errors='coerce').fillna(0)
-            df['incasso'] = pd.to_numeric(df['incasso'], errors='coerce').fillna(0)
-            
-            # 2. Anno Sociale Logic
-            df['data'] = pd.to_datetime(df['data'])
-            
-            # Keep a copy for Summer Chart (since Anno Sociale logic drops summer months)
-            df_full = df.copy()
-            
-            def get_anno_sociale(dt):
-                if pd.isna(dt):
-                    return None
-                year = dt.year
-                month = dt.month
-                
-                # Settembre (9) - Dicembre (12) -> E.g. 2023 -> "2023-24"
-                if 9 <= month <= 12:
-                    return f"{year}-{str(year+1)[-2:]}"
-                # Gennaio (1) - Maggio (5) -> E.g. 2024 -> "2023-24" (Year-1)
-                elif 1 <= month <= 5:
-                    return f"{year-1}-{str(year)[-2:]}"
-                # Giugno (6) - Agosto (8) -> Exclude
-                else:
-                    return None
-
-            df['anno_sociale'] = df['data'].apply(get_anno_sociale)
-            
-            # --- PROCESS SUMMER DATA (Logic moved up for Spinner scope) ---
-            # Filter: Month 7, 8 OR (Month 9 AND Day <= 10)
-            mask_summer = (
-                (df_full['data'].dt.month == 7) |
-                (df_full['data'].dt.month == 8) |
-                ((df_full['data'].dt.month == 9) & (df_full['data'].dt.day <= 10))
-            )
-            df_summer = df_full[mask_summer].copy()
-            
-            df_summer_grouped = pd.DataFrame() # Initialize
-            if not df_summer.empty:
-                # Create 'anno_solare' (YYYY)
-                df_summer['anno_solare'] = df_summer['data'].dt.year
-                
-                # Group by Year ONLY (No event distinction)
-                df_summer_grouped = df_summer.groupby(['anno_solare'])[['presenze', 'incasso']].sum().reset_index()
-                df_summer_grouped = df_summer_grouped.sort_values('anno_solare')
-                
-                # Calculate Average Price
-                df_summer_grouped['media_prezzo'] = df_summer_grouped.apply(
-                    lambda x: x['incasso'] / x['presenze'] if x['presenze'] > 0 else 0, axis=1
-                )
-                
-                # Formatter helpers
-                def format_it_currency(val):
-                    return f"€ {val:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-
-                def format_it_thousands(val):
-                    return f"€ {val:,.0f}".replace(',', '.')
-                
+            if not df_summer_grouped.empty:
                 # Create Custom Labels
-                df_summer_grouped['x_label'] = df_summer_grouped.apply(
-                    lambda x: f"{int(x['anno_solare'])}<br>(Biglietto: {format_it_currency(x['media_prezzo'])})", 
-                    axis=1
-                )
-                df_summer_grouped['bar_text'] = df_summer_grouped.apply(
-                    lambda x: format_it_thousands(x['incasso']), 
-                    axis=1
-                )
+                df_summer_grouped['x_label'] = [
+                    f"{year}<br>(Biglietto: {format_euro_precise(price)})"
+                    for year, price in zip(df_summer_grouped['anno_solare'], df_summer_grouped['media_prezzo'])
+                ]
+                df_summer_grouped['bar_text'] = df_summer_grouped['incasso'].map(format_euro)
 
-            # Filter out summer months (None) for Main Chart
-            df = df.dropna(subset=['anno_sociale'])
-            
-            if df.empty:
+            if df_grouped.empty:
                  st.warning("Nessun dato valido per gli Anni Sociali (Esclusi mesi 6-8).")
                  return
-
-            # 3. Grouping Main
-            # Rename Events for Display
-            df['evento'] = df['evento'].replace({'adu': 'Adulti', 'bam': 'Bambini', 'ven': 'Venerdì'})
-
-            # Sum presenze by anno_sociale and evento
-            df_grouped = df.groupby(['anno_sociale', 'evento'])['presenze'].sum().reset_index()
-            
-            # Sort chronologically by anno_sociale
-            df_grouped = df_grouped.sort_values('anno_sociale')
             
-        # 4. Visualization (Executes after spinner)
+        # 3. Visualization (Executes after spinner)
         # Consistent colors
         color_map = {
             'Adulti': '#198754', 
@@ -1719,7 +1749,7 @@ def render_riepiloghi_page():
         # --- SECOND CHART: Summer Season (July 1 - Sept 10) ---
         st.divider()
         
-        if not df_summer.empty and not df_summer_grouped.empty:
+        if not df_summer_grouped.empty:
             fig_summer = px.bar(
                 df_summer_grouped,
                 x="x_label",
@@ -2400,14 +2430,8 @@ def render_proiezioni_page():
             st.info("Nessun dato disponibile nel report (eventi_highlights vuoto).")
             return
             
-        df = pd.DataFrame(data_rows)
-        
-        # Ensure Numeric Types
-        df['ingressi'] = pd.to_numeric(df['ingressi'], errors='coerce').fillna(0).astype(int)
-        df['incasso'] = pd.to_numeric(df['incasso'], errors='coerce').fillna(0.0)
-        
-        # Ensure Date Type
-        df['data'] = pd.to_datetime(df['data'])
+        # Numeric / date / category types set once by the schema
+        df = typed_frame(data_rows, HIGHLIGHTS_SCHEMA)
 
     except Exception as e:
         st.error(f"Errore nel recupero dati: {e}")
@@ -0,0 +1,151 @@
+"""
+Benchmark degli importatori (memoria di picco e throughput).
+
+Uso: python bench_import.py [righe ...]   (default: 20000 100000)
+"""
+import io
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from import_engine import (
+    aggregate_fiscali, aggregate_fiscali_rows, iter_fiscali_rows, iter_fiscali_rows_pandas,
+    parse_top_flop, build_highlights_payload
+)
+
+TICKETS = ['I1', 'R7', 'R8', 'O7', 'X1']
+TITLES = [f"Film {i}" for i in range(60)]
+
+
+def make_fiscali_workbook(n_rows, seed=0):
+    """Synthetic ExportTitoliFiscali: one row per ticket, 25 columns, header on row 1."""
+    rng = np.random.default_rng(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([f"Col{i}" for i in range(25)])
+    base = datetime(2023, 9, 1, 15, 0)
+    # ~3 screenings a day over a season, one title per screening
+    screenings = rng.integers(0, 270 * 3, n_rows)
+    tickets = rng.integers(0, len(TICKETS), n_rows)
+    for i in range(n_rows):
+        row = [None] * 25
+        day, slot = divmod(int(screenings[i]), 3)
+        dt = base + timedelta(days=day, hours=3 * slot)
+        row[0] = i
+        row[2] = dt.strftime("%d/%m/%Y %H.%M.%S")
+        row[7] = TITLES[screenings[i] % len(TITLES)]
+        row[21] = TICKETS[tickets[i]]
+        row[10] = "Sala 1"
+        row[15] = 7.5
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def measure(label, fn):
+    # Timing and memory in separate runs: tracemalloc slows allocations down a lot
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return label, elapsed, peak, result
+
+
+def report(runs, n_rows):
+    for label, elapsed, peak, _ in runs:
+        print(f"  {label:<15} {elapsed:7.2f}s  {n_rows / elapsed:10,.0f} righe/s  picco {peak / 1e6:8.1f} MB")
+
+
+def bench_fiscali(n_rows):
+    data = make_fiscali_workbook(n_rows)
+    runs = [
+        measure("pd.read_excel", lambda: aggregate_fiscali_rows(iter_fiscali_rows_pandas(io.BytesIO(data)))),
+        measure("streaming", lambda: aggregate_fiscali_rows(iter_fiscali_rows(io.BytesIO(data)))),
+    ]
+    assert runs[0][3] == runs[1][3], "Gli aggregati non coincidono"
+    print(f"\nExportTitoliFiscali - {n_rows} righe ({len(data) / 1e6:.1f} MB)")
+    report(runs, n_rows)
+
+    # Aggregation only (rows already read): row-by-row dict vs vectorized groupby
+    rows = list(iter_fiscali_rows(io.BytesIO(data)))
+    agg_runs = [
+        measure("agg. per riga", lambda: aggregate_fiscali_rows(rows)),
+        measure("agg. vettoriale", lambda: aggregate_fiscali(rows)),
+    ]
+    assert len(agg_runs[0][3]) == len(agg_runs[1][3]), "Gli aggregati non coincidono"
+    report(agg_runs, n_rows)
+
+
+def make_top_flop_frame(n_rows, seed=0):
+    """Synthetic 'export_eventi' sheet: one row per projection, 13 columns."""
+    rng = np.random.default_rng(seed)
+    base = datetime(2023, 1, 1, 15, 0)
+    dates = [base + timedelta(days=int(d), hours=int(h)) for d, h in zip(rng.integers(0, 365, n_rows), rng.choice([0, 3, 6], n_rows))]
+    frame = pd.DataFrame({i: [None] * n_rows for i in range(13)})
+    frame[0] = [d.strftime("%d/%m/%Y %H:%M") for d in dates]
+    frame[1] = [f" {TITLES[i % len(TITLES)]} " for i in range(n_rows)]
+    frame[2] = "Regista"
+    frame[3] = "ITA"
+    frame[10] = rng.integers(-1, 200, n_rows)
+    frame[12] = rng.uniform(0, 1500, n_rows).round(2)
+    return frame
+
+
+def top_flop_rowwise(df_tf):
+    """Previous implementation (iterrows + per-row pd.to_datetime), kept as the baseline."""
+    top_flop_data = []
+    for idx, row in df_tf.iterrows():
+        r_data, r_titolo, r_autore, r_nazione = row.iloc[0], row.iloc[1], row.iloc[2], row.iloc[3]
+        r_ingressi, r_incasso = row.iloc[10], row.iloc[12]
+        try:
+            ing_val = float(r_ingressi)
+            if pd.isna(ing_val) or ing_val <= 0: continue
+            try:
+                inc_val = float(r_incasso)
+            except Exception:
+                inc_val = 0.0
+        except Exception: continue
+        try:
+            d_parsed = pd.to_datetime(r_data, dayfirst=True)
+            if pd.isna(d_parsed): continue
+            time_str = d_parsed.strftime('%H:%M')
+            if (6, 15) <= (d_parsed.month, d_parsed.day) <= (9, 15): continue
+        except Exception: continue
+        top_flop_data.append({
+            "data": d_parsed.strftime('%Y-%m-%d'), "orario": time_str,
+            "titolo_evento": str(r_titolo).strip(),
+            "autore": str(r_autore).strip() if pd.notna(r_autore) else "",
+            "nazione": str(r_nazione).strip() if pd.notna(r_nazione) else "",
+            "ingressi": int(ing_val), "incasso": float(inc_val)
+        })
+    df_clean = pd.DataFrame(top_flop_data)
+    return [dict(r, categoria="DATA", proiezioni_count=1) for r in df_clean.to_dict('records')]
+
+
+def bench_top_flop(n_rows):
+    frame = make_top_flop_frame(n_rows)
+    runs = [
+        measure("iterrows", lambda: top_flop_rowwise(frame)),
+        measure("colonnare", lambda: build_highlights_payload(parse_top_flop(frame))),
+    ]
+    assert runs[0][3] == runs[1][3], "I payload non coincidono"
+    print(f"\nTop/Flop (eventi_highlights) - {n_rows} righe")
+    report(runs, n_rows)
+    print(f"  speedup x{runs[0][1] / runs[1][1]:.0f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [20000, 100000]
+    for n in sizes:
+        bench_fiscali(n)
+    # A full year of projections is a few thousand rows
+    bench_top_flop(5000)
@@ -0,0 +1,189 @@
+import uuid
+
+import pandas as pd
+
+from supabase_io import MAX_WORKERS, bulk_write, fetch_paginated, fetch_range, fetch_rows_by_keys
+from table_schema import DETTAGLIO_INGRESSI_SCHEMA, EVENTI_SCHEMA, ROLLUP_SCHEMA, select_list, typed_frame
+
+# Riepilogo giornaliero (tabella rollup_giornaliero, vedi sql/004_rollup_giornaliero.sql):
+# una riga per giorno ed Evento con incasso, presenze, numero di righe/eventi,
+# biglietti per tipologia e incasso per nazionalità.
+# Gli importatori ricalcolano solo i giorni che toccano: prima della scrittura li
+# segnano in sospeso (mark_rollup_pending), dopo li riscrivono e tolgono il segno
+# in un'unica transazione (refresh_daily_rollup, sql/009_rollup_atomico.sql);
+# I KPI e i grafici a torta della dashboard sommano queste righe invece dei dati
+# grezzi (dettaglio_ingressi non si legge se il riepilogo copre il periodo).
+# I Riepiloghi no: l'incasso del giorno comprende anche le righe senza presenze,
+# che lì non contano.
+# eventi_highlights (classifiche per titolo) non entra nel riepilogo.
+
+ROLLUP_TABLE = "rollup_giornaliero"
+# Tabella eventi riassunta (sql/004 la legge per nome): con un'altra DB_TABLE_NAME
+# il riepilogo non si aggiorna né si legge, i KPI vengono dalla RPC sulla tabella scelta.
+ROLLUP_EVENTI_TABLE = "eventi_importati"
+ROLLUP_PENDING_TABLE = "rollup_in_sospeso"
+ROLLUP_REPLACE_RPC = "sostituisci_rollup_giornaliero"
+ROLLUP_TICKET_COLUMNS = ['interi', 'ridotti', 'soci', 'omaggio', 'nc']
+ROLLUP_COLUMNS = ['data', 'evento', 'incasso', 'presenze', 'n_righe', 'nr_eventi', *ROLLUP_TICKET_COLUMNS, 'nazionalita']
+ROLLUP_EVENTI_COLUMNS = ['data_inizio', 'Evento', 'Nazionalità', 'Incasso', 'Tot. Presenze', 'Nr. Eventi']
+ROLLUP_DETAIL_COLUMNS = ['data', 'evento', *ROLLUP_TICKET_COLUMNS]
+NO_EVENTO = ''   # Evento non classificato (la colonna fa parte della chiave: niente NULL)
+
+_KEYS = ['data', 'evento']
+
+
+def _day_keys(dates, evento):
+    return pd.DataFrame({
+        'data': pd.to_datetime(dates, errors='coerce').dt.normalize(),
+        'evento': evento.astype(object).where(evento.notna(), NO_EVENTO),
+    })
+
+
+def build_daily_rollup(eventi_df, detail_df):
+    """
+    Raw eventi / dettaglio_ingressi rows -> one row per (data, evento) with the
+    ROLLUP_COLUMNS; a day/evento present in only one of the two gets zeros for the other.
+    """
+    ev = _day_keys(eventi_df['data_inizio'], eventi_df['Evento']).assign(
+        nazione=eventi_df['Nazionalità'].astype(object),
+        incasso=pd.to_numeric(eventi_df['Incasso'], errors='coerce').fillna(0),
+        presenze=pd.to_numeric(eventi_df['Tot. Presenze'], errors='coerce').fillna(0),
+        nr_eventi=pd.to_numeric(eventi_df['Nr. Eventi'], errors='coerce').fillna(0),
+    ).dropna(subset=['data'])
+    totals = ev.groupby(_KEYS).agg(
+        incasso=('incasso', 'sum'),
+        presenze=('presenze', 'sum'),
+        n_righe=('incasso', 'size'),
+        nr_eventi=('nr_eventi', 'sum'),
+    )
+
+    tickets = _day_keys(detail_df['data'], detail_df['evento']).assign(**{
+        col: pd.to_numeric(detail_df[col], errors='coerce').fillna(0) for col in ROLLUP_TICKET_COLUMNS
+    }).dropna(subset=['data']).groupby(_KEYS)[ROLLUP_TICKET_COLUMNS].sum()
+
+    rollup = totals.join(tickets, how='outer').fillna(0)
+    int_columns = ['presenze', 'n_righe', 'nr_eventi', *ROLLUP_TICKET_COLUMNS]
+    rollup[int_columns] = rollup[int_columns].astype('int64')
+
+    # Incasso per nazionalità: one dict per (data, evento)
+    nations = {}
+    per_nation = ev.dropna(subset=['nazione']).groupby(_KEYS + ['nazione'])['incasso'].sum()
+    for (day, evento, nazione), incasso in per_nation.items():
+        nations.setdefault((day, evento), {})[str(nazione)] = float(incasso)
+    rollup['nazionalita'] = [nations.get(key, {}) for key in rollup.index]
+    return rollup.reset_index()[ROLLUP_COLUMNS]
+
+
+def rollup_records(rollup):
+    """Rollup frame -> JSON-safe dicts for upsert (dates as 'YYYY-MM-DD')."""
+    return rollup.assign(data=rollup['data'].dt.strftime('%Y-%m-%d')).to_dict('records')
+
+
+def plan_days(plan, date_col):
+    """Days touched by an ImportPlan: inserted / updated rows, plus the old date of moved rows."""
+    frames = [plan.inserts, plan.updates]
+    values = [frame[col] for frame in frames for col in (date_col, f"{date_col} (prima)") if col in frame.columns]
+    if not values:
+        return []
+    days = pd.to_datetime(pd.concat(values, ignore_index=True), errors='coerce').dropna()
+    return sorted(days.dt.strftime('%Y-%m-%d').unique())
+
+
+def mark_rollup_pending(client, days):
+    """
+    Flag `days` ('YYYY-MM-DD') as not summarized yet, before the raw rows are written.
+
+    Returns the token refresh_daily_rollup clears once the days are rewritten: if
+    the refresh never succeeds, the days stay flagged and fetch_period_rollup
+    returns None for the ranges that include them.
+    """
+    token = uuid.uuid4().hex
+    records = [{'data': day, 'import_id': token} for day in sorted(set(days))]
+
+    def write_chunk(chunk):
+        client.table(ROLLUP_PENDING_TABLE).insert(chunk).execute()
+    bulk_write(write_chunk, records, idempotent=False)
+    return token
+
+
+def refresh_daily_rollup(client, days, token=None, eventi_table=ROLLUP_EVENTI_TABLE, detail_table="dettaglio_ingressi"):
+    """
+    Recompute the rollup rows of `days` ('YYYY-MM-DD') from the raw tables.
+
+    The days are rewritten by one RPC (delete + insert, and the `token` flags of
+    mark_rollup_pending cleared, in a single transaction), so an Evento that
+    disappeared from a day does not linger and a failure leaves the old rows.
+    Returns the number of rollup rows written.
+    """
+    days = sorted(set(days))
+    eventi = typed_frame(
+        fetch_rows_by_keys(client, eventi_table, select_list(ROLLUP_EVENTI_COLUMNS), "data_inizio", days),
+        EVENTI_SCHEMA, ROLLUP_EVENTI_COLUMNS)
+    detail = typed_frame(
+        fetch_rows_by_keys(client, detail_table, select_list(ROLLUP_DETAIL_COLUMNS), "data", days),
+        DETTAGLIO_INGRESSI_SCHEMA, ROLLUP_DETAIL_COLUMNS)
+    records = rollup_records(build_daily_rollup(eventi, detail))
+    client.rpc(ROLLUP_REPLACE_RPC, {'p_import': token, 'p_giorni': days, 'p_righe': records}).execute()
+    return len(records)
+
+
+def fetch_rollup(client, start_date=None, end_date=None, columns=ROLLUP_COLUMNS, max_workers=MAX_WORKERS):
+    """
+    Typed rollup rows between the two dates (all of them without dates); unclassified evento -> NaN.
+    max_workers: concurrent page requests of the date-range read.
+    """
+    projection = select_list(columns)
+    if start_date is None:
+        rows = fetch_paginated(lambda count=None: client.table(ROLLUP_TABLE).select(projection, count=count).order("id"))
+    else:
+        rows = fetch_range(client, ROLLUP_TABLE, "data", start_date, end_date, columns=projection, max_workers=max_workers)
+    rollup = typed_frame(rows, ROLLUP_SCHEMA, columns)
+    if 'evento' in rollup.columns:
+        rollup['evento'] = rollup['evento'].where(rollup['evento'] != NO_EVENTO)
+    return rollup
+
+
+def groups_from_rollup(rollup):
+    """Rollup rows -> per-Evento totals (same shape as groups_from_frame)."""
+    return rollup.groupby('evento', dropna=False, observed=True).agg(
+        incasso=('incasso', 'sum'),
+        presenze=('presenze', 'sum'),
+        count=('n_righe', 'sum'),
+        nr_eventi=('nr_eventi', 'sum'),
+    )
+
+
+def fetch_period_rollup(client, table, start_date, end_date, columns=ROLLUP_COLUMNS, max_workers=MAX_WORKERS):
+    """
+    Rollup rows of the period, or None if the rollup is not available, has no
+    rows for it, has days still pending in it or does not summarize `table`
+    (callers fall back to kpi_per_evento and the raw rows).
+    """
+    if table != ROLLUP_EVENTI_TABLE:
+        return None
+    try:
+        # Days written by an import whose refresh has not completed: the rollup is behind
+        pending = (client.table(ROLLUP_PENDING_TABLE).select("data")
+                   .gte("data", pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+                   .lte("data", pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+                   .limit(1).execute())
+        if pending.data:
+            return None
+        rollup = fetch_rollup(client, start_date, end_date, columns=columns, max_workers=max_workers)
+    except Exception as e:
+        print(f"Rollup giornaliero non disponibile: {e}")
+        return None
+    return None if rollup.empty else rollup
+
+
+def pie_frames_from_rollup(rollup):
+    """
+    Rollup rows -> (nationality, tickets) frames shaped like the raw rows the
+    pies read: 'Nazionalità' / 'Incasso' per nation and day (nationality_shares),
+    the ticket columns per day and evento with tickets (ticket_totals).
+    """
+    nations = pd.DataFrame(
+        [(nazione, incasso) for per_nation in rollup['nazionalita'] for nazione, incasso in (per_nation or {}).items()],
+        columns=['Nazionalità', 'Incasso'])
+    with_tickets = rollup[ROLLUP_TICKET_COLUMNS].sum(axis=1) > 0
+    return nations, rollup.loc[with_tickets, ['data', 'evento', *ROLLUP_TICKET_COLUMNS]].reset_index(drop=True)
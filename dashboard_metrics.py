@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+
+# KPI della dashboard Statistiche (card TOTALE / ADULTI / VENERDÌ / BAMBINI,
+# "Media Ingressi" del Dettaglio Analitico, delta del confronto tra periodi).
+# Tutto parte da una tabella "per Evento" (incasso, presenze, count, nr_eventi):
+# calcolata dal database (RPC kpi_per_evento) o, in fallback, con un solo
+# groupby sul DataFrame del periodo. La tabella delle metriche ha una riga per
+# card e si calcola una volta per dataset: il filtro attivo è un lookup.
+# In fondo: preparazione dei dati per i grafici a torta (nazionalità, ingressi).
+
+KPI_CONFIGS = {
+    'TOTALE': {'filter': None, 'color': 'blue'},
+    'ADULTI': {'filter': 'adu', 'color': 'green'},
+    'VENERDÌ': {'filter': 'ven', 'color': 'red'},
+    'BAMBINI': {'filter': 'bam', 'color': 'orange'}
+}
+KPI_ORDER = list(KPI_CONFIGS)
+KPI_RPC = "kpi_per_evento"
+GROUP_COLUMNS = ['incasso', 'presenze', 'count', 'nr_eventi']
+
+
+def metric_table(groups):
+    """
+    Per-Evento totals -> one row per KPI card (index KPI_ORDER).
+
+    groups: DataFrame indexed by Evento (NaN allowed: counted only in TOTALE)
+    with the GROUP_COLUMNS. Adds avg_ticket, media_ingressi and color.
+    """
+    totals = groups[GROUP_COLUMNS].sum().to_frame('TOTALE').T
+    filters = [KPI_CONFIGS[k]['filter'] for k in KPI_ORDER[1:]]
+    per_evento = groups[GROUP_COLUMNS].reindex(filters).fillna(0)
+    per_evento.index = KPI_ORDER[1:]
+
+    table = pd.concat([totals, per_evento]).astype(float)
+    table['count'] = table['count'].astype(int)
+    table['avg_ticket'] = (table['incasso'] / table['presenze'].where(table['presenze'] > 0)).fillna(0)
+    table['media_ingressi'] = (table['presenze'] / table['nr_eventi'].where(table['nr_eventi'] > 0)).fillna(0)
+    table['color'] = [KPI_CONFIGS[k]['color'] for k in KPI_ORDER]
+    return table
+
+
+def groups_from_frame(df, period=None):
+    """
+    Per-Evento totals from the period rows (pandas fallback of kpi_per_evento).
+
+    period: optional labels aligned with df (see assign_periods): the result is
+    then indexed by (period, Evento).
+    """
+    incasso = pd.to_numeric(df['Incasso'], errors='coerce').fillna(0) if 'Incasso' in df.columns else pd.Series(0.0, index=df.index)
+    if 'Tot. Presenze' in df.columns:
+        presenze = pd.to_numeric(df['Tot. Presenze'], errors='coerce').fillna(0)
+    elif 'Presenze' in df.columns:
+        presenze = pd.to_numeric(df['Presenze'], errors='coerce').fillna(0)
+    else:
+        presenze = pd.Series(1, index=df.index)   # no attendance column: one per row
+    if 'Nr. Eventi' in df.columns:
+        nr_eventi = pd.to_numeric(df['Nr. Eventi'], errors='coerce').fillna(0)
+    else:
+        nr_eventi = pd.Series(1, index=df.index)  # one screening per row
+    evento = df['Evento'] if 'Evento' in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+    frame = pd.DataFrame({'evento': evento, 'incasso': incasso, 'presenze': presenze, 'nr_eventi': nr_eventi})
+    keys = 'evento'
+    if period is not None:
+        frame['periodo'] = period
+        keys = ['periodo', 'evento']
+    return frame.groupby(keys, dropna=False, observed=True).agg(
+        incasso=('incasso', 'sum'),
+        presenze=('presenze', 'sum'),
+        count=('incasso', 'size'),
+        nr_eventi=('nr_eventi', 'sum'),
+    )
+
+
+def groups_from_rpc(rows):
+    """kpi_per_evento rows -> per-Evento totals (same shape as groups_from_frame)."""
+    frame = pd.DataFrame(rows, columns=['evento', 'incasso', 'presenze', 'n_eventi', 'tot_nr_eventi'])
+    count = pd.to_numeric(frame['n_eventi'], errors='coerce').fillna(0).astype(int)
+    # Functions installed before sql/003 have no tot_nr_eventi: one screening per row
+    nr_eventi = pd.to_numeric(frame['tot_nr_eventi'], errors='coerce').fillna(count)
+    return pd.DataFrame({
+        'incasso': pd.to_numeric(frame['incasso'], errors='coerce').fillna(0).to_numpy(),
+        'presenze': pd.to_numeric(frame['presenze'], errors='coerce').fillna(0).to_numpy(),
+        'count': count.to_numpy(),
+        'nr_eventi': nr_eventi.to_numpy(),
+    }, index=pd.Index(frame['evento'], name='evento'))
+
+
+def calculate_metrics(df):
+    return metric_table(groups_from_frame(df))
+
+
+def incasso_deltas(current, previous):
+    """Percent change of incasso for every card (+100% from zero, 0% if both are zero)."""
+    cur, prev = current['incasso'], previous['incasso'].reindex(current.index).fillna(0)
+    delta = np.select(
+        [prev != 0, cur != 0],
+        [(cur - prev) / prev.where(prev != 0, 1) * 100, 100.0],
+        default=0.0
+    )
+    return pd.Series(delta, index=current.index)
+
+
+def fetch_kpi_metrics(client, table, start_date, end_date):
+    """
+    Metric table computed by the database, or None if the RPC is not available
+    (function not installed, old schema...): callers fall back to calculate_metrics.
+    """
+    try:
+        res = client.rpc(KPI_RPC, {
+            "p_start": start_date.strftime('%Y-%m-%d'),
+            "p_end": end_date.strftime('%Y-%m-%d'),
+            "p_table": table,
+        }).execute()
+    except Exception as e:
+        print(f"RPC {KPI_RPC} non disponibile, calcolo locale: {e}")
+        return None
+    return metric_table(groups_from_rpc(res.data or []))
+
+
+# --- Grafici a torta (Analisi Dettagliata) ---
+TICKET_COLUMNS = ['interi', 'ridotti', 'soci', 'omaggio']
+OTHERS_SHARE = 0.05   # nazionalità sotto il 5% dell'incasso -> "Altri"
+PIE_TOP = 10
+
+
+def nationality_shares(df, threshold=OTHERS_SHARE, top=PIE_TOP):
+    """Incasso per Nazionalità with the small slices merged into 'Altri' (largest first)."""
+    grouped = df.groupby('Nazionalità', observed=True)['Incasso'].sum()
+    total = grouped.sum()
+    if total <= 0:
+        return pd.DataFrame(columns=['Nazionalità', 'Incasso'])
+    names = grouped.index.astype(object).where(grouped.to_numpy() / total >= threshold, 'Altri')
+    final = grouped.groupby(names).sum().rename_axis('Nazionalità').reset_index()
+    return final.sort_values(by='Incasso', ascending=False).head(top)
+
+
+def ticket_totals(detail_df):
+    """Ticket type totals for every KPI filter (index KPI_ORDER) plus the row count."""
+    columns = [c for c in TICKET_COLUMNS if c in detail_df.columns]
+    if 'evento' not in detail_df.columns:
+        # No evento column: every filter shows the whole period
+        totals = detail_df[columns].sum()
+        table = pd.DataFrame([totals] * len(KPI_ORDER), index=KPI_ORDER)
+        table['rows'] = len(detail_df)
+        return table
+
+    grouped = detail_df.groupby('evento', dropna=False, observed=True)[columns].sum()
+    grouped['rows'] = detail_df.groupby('evento', dropna=False, observed=True).size()
+    return _kpi_rows(grouped)
+
+
+def _kpi_rows(grouped):
+    # Per-evento sums -> TOTALE + one row per KPI filter (missing evento -> zeros)
+    per_evento = grouped.reindex([KPI_CONFIGS[k]['filter'] for k in KPI_ORDER[1:]]).fillna(0)
+    per_evento.index = KPI_ORDER[1:]
+    return pd.concat([grouped.sum().to_frame('TOTALE').T, per_evento])
+
+
+# --- Confronto multi-stagione ---
+# Lo stesso intervallo di date ripetuto su N stagioni: una sola lettura
+# dell'intervallo complessivo, righe etichettate per periodo e un groupby.
+MAX_SEASONS = 10
+
+
+def season_periods(start_date, end_date, n_seasons):
+    """
+    The [start_date, end_date] window repeated over the previous seasons, oldest first:
+    [(label, start, end), ...] with Timestamps. The window must be shorter than a year.
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if end < start or end >= start + pd.DateOffset(years=1):
+        raise ValueError("L'intervallo deve essere più breve di un anno.")
+    periods = []
+    for k in range(n_seasons - 1, -1, -1):
+        p_start, p_end = start - pd.DateOffset(years=k), end - pd.DateOffset(years=k)
+        label = str(p_start.year) if p_start.year == p_end.year else f"{p_start.year}-{str(p_end.year)[-2:]}"
+        periods.append((label, p_start, p_end))
+    return periods
+
+
+def assign_periods(dates, periods):
+    """Period label of every date (Categorical in period order, NaN outside every period)."""
+    dates = pd.to_datetime(pd.Series(dates), errors='coerce').dt.normalize()
+    unit = dates.dt.unit   # bounds and dates must share the datetime resolution
+    intervals = pd.IntervalIndex.from_arrays(
+        pd.DatetimeIndex([p[1] for p in periods]).as_unit(unit),
+        pd.DatetimeIndex([p[2] for p in periods]).as_unit(unit),
+        closed='both'
+    )
+    codes = intervals.get_indexer(dates)
+    return pd.Categorical.from_codes(codes, categories=[p[0] for p in periods])
+
+
+def period_metric_tables(df, periods, date_col='data_inizio'):
+    """{label: metric table} for every period, from a single groupby (period, Evento)."""
+    grouped = groups_from_frame(df, period=assign_periods(df[date_col], periods))
+    empty = pd.DataFrame(columns=GROUP_COLUMNS, dtype=float)
+    labels = grouped.index.get_level_values('periodo')
+    return {
+        label: metric_table(grouped[labels == label].droplevel('periodo') if (labels == label).any() else empty)
+        for label, _, _ in periods
+    }
+
+
+def period_summary(tables, key):
+    """One row per period for a KPI card, with the incasso change vs the previous period."""
+    summary = pd.DataFrame({label: table.loc[key] for label, table in tables.items()}).T
+    summary = summary.drop(columns=['color']).astype(float)
+    previous = summary['incasso'].shift(1)
+    delta = np.select(
+        [previous.isna(), previous != 0, summary['incasso'] != 0],
+        [np.nan, (summary['incasso'] - previous) / previous.where(previous != 0, 1) * 100, 100.0],
+        default=0.0
+    )
+    summary['delta_incasso'] = delta
+    return summary
+
+
+def period_nationality_shares(df, periods, date_col='data_inizio', threshold=OTHERS_SHARE, top=PIE_TOP):
+    """Incasso per (period, Nazionalità), slices under the threshold of their period -> 'Altri' (top per period)."""
+    frame = pd.DataFrame({
+        'periodo': assign_periods(df[date_col], periods),
+        'Nazionalità': df['Nazionalità'],
+        'Incasso': df['Incasso'],
+    })
+    grouped = frame.groupby(['periodo', 'Nazionalità'], observed=True)['Incasso'].sum().reset_index()
+    share = grouped['Incasso'] / grouped.groupby('periodo', observed=True)['Incasso'].transform('sum')
+    grouped['Nazionalità'] = grouped['Nazionalità'].astype(object).where(share >= threshold, 'Altri')
+    final = grouped.groupby(['periodo', 'Nazionalità'], observed=True, sort=False)['Incasso'].sum().reset_index()
+    final = final[final['Incasso'] > 0].sort_values(['periodo', 'Incasso'], ascending=[True, False])
+    return final.groupby('periodo', observed=True, sort=False).head(top)
+
+
+def period_ticket_totals(detail_df, periods, date_col='data'):
+    """{label: ticket_totals table} for every period, from a single groupby (period, evento)."""
+    columns = [c for c in TICKET_COLUMNS if c in detail_df.columns]
+    labels = assign_periods(detail_df[date_col], periods)
+    evento = detail_df['evento'] if 'evento' in detail_df.columns else pd.Series(None, index=detail_df.index, dtype=object)
+    frame = detail_df[columns].assign(periodo=labels, evento=evento, rows=1)
+    grouped = frame.groupby(['periodo', 'evento'], dropna=False, observed=True)[columns + ['rows']].sum()
+    grouped = grouped[grouped.index.get_level_values('periodo').notna()]
+
+    tables = {}
+    for label, _, _ in periods:
+        mask = grouped.index.get_level_values('periodo') == label
+        part = grouped[mask].droplevel('periodo') if mask.any() else pd.DataFrame(columns=columns + ['rows'], dtype=float)
+        if 'evento' not in detail_df.columns:
+            # No evento column: every filter shows the whole period
+            part = pd.DataFrame([part.sum()] * len(KPI_ORDER), index=KPI_ORDER)
+            tables[label] = part
+        else:
+            tables[label] = _kpi_rows(part)
+    return tables
@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Regole di classificazione degli eventi condivise dagli importatori.
+# Le funzioni vettoriali lavorano su intere colonne (Series) e producono
+# lo stesso output delle vecchie funzioni riga-per-riga (get_evento & co.).
+
+# Evento: venerdì -> "ven", 14:00-16:00 (inclusi) -> "bam", altrimenti "adu"
+BAMBINI_START = pd.Timedelta(hours=14)
+BAMBINI_END = pd.Timedelta(hours=16)
+
+# RASSEGNA: SCUOLE 06:00-13:30 (inclusi), CASTELLO dal 1/7 al 15/9 (inclusi)
+SCUOLE_START = pd.Timedelta(hours=6)
+SCUOLE_END = pd.Timedelta(hours=13, minutes=30)
+CASTELLO_START_MD = 7 * 100 + 1
+CASTELLO_END_MD = 9 * 100 + 15
+
+# VOS: titoli in versione originale
+VOS_KEYWORDS = ["(eng)", "(en)", "(originale)", "(vos)"]
+VOS_PATTERN = re.compile("|".join(re.escape(k) for k in VOS_KEYWORDS), re.IGNORECASE)
+
+
+def get_evento(dt):
+    """Scalar version of the Evento rule (used for single timestamps)."""
+    if pd.isna(dt):
+        return None
+    if dt.weekday() == 4:
+        return "ven"
+    current_time = dt.time()
+    start_time = pd.Timestamp("14:00:00").time()
+    end_time = pd.Timestamp("16:00:00").time()
+    if start_time <= current_time <= end_time:
+        return "bam"
+    return "adu"
+
+
+def _as_datetime(values):
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values)
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors="coerce")
+    return values
+
+
+def _time_of_day(dt):
+    # Offset from midnight: exact comparison down to the (micro)second,
+    # like datetime.time() comparisons in the scalar rules.
+    return dt - dt.dt.normalize()
+
+
+def classify_evento(dt):
+    """Vectorized Evento ('ven' / 'bam' / 'adu', NaN for missing dates)."""
+    dt = _as_datetime(dt)
+    tod = _time_of_day(dt)
+    valid = dt.notna().to_numpy()
+    is_ven = (dt.dt.weekday == 4).to_numpy()
+    is_bam = ((tod >= BAMBINI_START) & (tod <= BAMBINI_END)).to_numpy()
+
+    out = np.select([is_ven, is_bam], ["ven", "bam"], default="adu")
+    return pd.Series(out, index=dt.index).where(valid)
+
+
+def classify_rassegna(dt):
+    """Vectorized RASSEGNA ('SCUOLE' / 'CASTELLO' / 'STANDARD')."""
+    dt = _as_datetime(dt)
+    tod = _time_of_day(dt)
+    md = dt.dt.month * 100 + dt.dt.day
+    is_scuole = ((tod >= SCUOLE_START) & (tod <= SCUOLE_END)).to_numpy()
+    is_castello = ((md >= CASTELLO_START_MD) & (md <= CASTELLO_END_MD)).to_numpy()
+
+    # NaT -> every comparison is False -> STANDARD
+    out = np.select([is_scuole, is_castello], ["SCUOLE", "CASTELLO"], default="STANDARD")
+    return pd.Series(out, index=dt.index)
+
+
+def classify_vos(titles):
+    """Vectorized VOS flag: True if the title carries an original-language tag."""
+    if not isinstance(titles, pd.Series):
+        titles = pd.Series(titles)
+    try:
+        # Non-string cells (NaN, numbers) yield NA -> False
+        return titles.str.contains(VOS_PATTERN, na=False).astype(bool)
+    except AttributeError:
+        # Column without any string value
+        return pd.Series(False, index=titles.index)
+
+
+def classify_events(df, datetime_col="temp_datetime", title_col="Titolo Evento"):
+    """Add Evento, RASSEGNA and VOS columns to df (in place) and return it."""
+    df['Evento'] = classify_evento(df[datetime_col])
+    df['RASSEGNA'] = classify_rassegna(df[datetime_col])
+    df['VOS'] = classify_vos(df[title_col])
+    return df
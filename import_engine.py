@@ -0,0 +1,581 @@
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+
+import openpyxl
+import pandas as pd
+
+from event_rules import classify_evento
+from supabase_io import WRITE_CHUNK_SIZE, WRITE_WORKERS, BulkWriteError, WriteReport, bulk_write
+
+# Logica di importazione "set-based": i calcoli si fanno sui DataFrame,
+# le scritture verso Supabase partono a blocchi (chunk) invece che riga per riga.
+
+def to_records(df):
+    """DataFrame -> list of JSON-safe dicts (NaN/NaT -> None, native Python scalars)."""
+    if df.empty:
+        return []
+    clean = df.astype(object).where(df.notna(), None)
+    return clean.to_dict('records')
+
+
+def _same_value(a, b):
+    # Both present and equal once rendered as strings (DB returns text dates)
+    return a.notna() & b.notna() & (a.astype(object).map(str) == b.astype(object).map(str))
+
+
+@dataclass(frozen=True)
+class ImportPlan:
+    """
+    Result of the planning stage of an importer (read-only).
+
+    - inserts: rows to insert;
+    - updates: rows to update, keyed on `id`: `update_columns` are the new values,
+      the matching "<col> (prima)" columns hold the values currently in the DB;
+    - skipped: rows already present in the DB.
+    """
+    table: str
+    inserts: pd.DataFrame
+    updates: pd.DataFrame
+    skipped: pd.DataFrame
+    update_columns: tuple = ()
+    insert_conflict: str = ""   # on_conflict for inserts ("" -> plain insert)
+
+    def insert_records(self):
+        return to_records(self.inserts)
+
+    def update_records(self):
+        return to_records(self.updates[['id', *self.update_columns]]) if not self.updates.empty else []
+
+    def is_empty(self):
+        return self.inserts.empty and self.updates.empty
+
+
+def _empty_frame(columns=()):
+    return pd.DataFrame(columns=list(columns))
+
+
+def execute_plan(client, plan, progress=None, chunk_size=WRITE_CHUNK_SIZE, max_workers=WRITE_WORKERS):
+    """
+    Write a plan with bulk_write: updates as upserts on `id`, then inserts.
+
+    progress(written_rows, total_rows) is called after every chunk.
+    Returns the WriteReport of both phases. The inserts run even if some update
+    chunks failed: BulkWriteError is raised at the end with the failures of
+    both phases and the merged report.
+    """
+    updates, inserts = plan.update_records(), plan.insert_records()
+    total_rows = len(updates) + len(inserts)
+
+    def phase_progress(offset):
+        return (lambda done, _total: progress(offset + done, total_rows)) if progress else None
+
+    def write_update(chunk):
+        client.table(plan.table).upsert(chunk, on_conflict="id").execute()
+
+    def write_insert(chunk):
+        if plan.insert_conflict:
+            client.table(plan.table).upsert(chunk, on_conflict=plan.insert_conflict, ignore_duplicates=True).execute()
+        else:
+            client.table(plan.table).insert(chunk).execute()
+
+    phases = [
+        ("aggiornamenti", write_update, updates, True, 0),
+        # A plain insert is not idempotent: retried only if it surely did not reach the DB
+        ("inserimenti", write_insert, inserts, bool(plan.insert_conflict), len(updates)),
+    ]
+    report, errors = WriteReport(), []
+    for label, write, records, idempotent, offset in phases:
+        try:
+            report = report.merge(bulk_write(write, records, chunk_size=chunk_size, max_workers=max_workers,
+                                             idempotent=idempotent, progress=phase_progress(offset)))
+        except BulkWriteError as e:
+            report = report.merge(e.report)
+            errors.append(f"{label}: {e}")
+    if errors:
+        raise BulkWriteError(f"Scritte {report.rows} righe su {total_rows}. " + " | ".join(errors), report)
+    return report
+
+
+EVENTI_UPDATE_COLUMNS = ('Tot. Presenze', 'Incasso', 'Nr. Eventi', 'data_inizio', 'data_fine', 'autore')
+EVENTI_NUMERIC_COLUMNS = ('Tot. Presenze', 'Incasso', 'Nr. Eventi')
+EVENTI_DATE_COLUMNS = ('data_inizio', 'data_fine')
+
+
+class StalePlanError(RuntimeError):
+    """Raised when the DB rows changed after the plan was prepared; `titles` lists the affected ones."""
+
+    def __init__(self, message, titles):
+        super().__init__(message)
+        self.titles = titles
+
+
+def plan_eventi_merge(df_uploaded, existing_rows, table, title_col='Titolo Evento'):
+    """
+    Join the uploaded ExportEventi rows against the existing DB rows.
+
+    Returns an ImportPlan:
+    - updates: one per existing title, with summed Tot. Presenze / Incasso / Nr. Eventi
+      and the merged data_inizio/data_fine range;
+    - inserts: rows whose title is not in the DB yet;
+    - skipped: rows identical to the DB record (same dates and presenze).
+
+    Duplicate titles inside the same upload are summed together before being
+    added to the DB values; the skip rule is evaluated against the DB state.
+    """
+    update_cols = ['id', title_col, *EVENTI_UPDATE_COLUMNS] + [f"{c} (prima)" for c in EVENTI_UPDATE_COLUMNS]
+
+    def make_plan(inserts, updates=None, skipped=None):
+        return ImportPlan(
+            table=table,
+            inserts=inserts,
+            updates=updates if updates is not None else _empty_frame(update_cols),
+            skipped=skipped if skipped is not None else _empty_frame(df_uploaded.columns),
+            update_columns=(title_col, *EVENTI_UPDATE_COLUMNS),
+        )
+
+    existing = pd.DataFrame(existing_rows)
+    if existing.empty or title_col not in existing.columns:
+        return make_plan(df_uploaded)
+
+    existing = existing.dropna(subset=[title_col]).drop_duplicates(subset=[title_col], keep='last')
+    existing = pd.DataFrame({
+        title_col: existing[title_col],
+        'id': existing['id'],
+        'db_presenze': pd.to_numeric(existing.get('Tot. Presenze'), errors='coerce').fillna(0),
+        'db_incasso': pd.to_numeric(existing.get('Incasso'), errors='coerce').fillna(0.0),
+        'db_nr_eventi': pd.to_numeric(existing.get('Nr. Eventi'), errors='coerce').fillna(0),
+        'db_data_inizio': existing.get('data_inizio'),
+        'db_data_fine': existing.get('data_fine'),
+        'db_autore': existing.get('autore'),
+    })
+
+    merged = df_uploaded.merge(existing, on=title_col, how='left', sort=False)
+    merged.index = df_uploaded.index
+    is_existing = merged['id'].notna()
+
+    inserts = df_uploaded[~is_existing.to_numpy()]
+
+    matched = merged[is_existing]
+    if matched.empty:
+        return make_plan(inserts)
+
+    row_presenze = pd.to_numeric(matched['Tot. Presenze'], errors='coerce').fillna(0)
+    is_duplicate = (
+        _same_value(matched['db_data_inizio'], matched['data_inizio'])
+        & _same_value(matched['db_data_fine'], matched['data_fine'])
+        & (matched['db_presenze'].astype(int) == row_presenze.astype(int))
+    )
+    skipped = df_uploaded.loc[is_duplicate[is_duplicate].index]
+
+    to_update = matched[~is_duplicate].copy()
+    if to_update.empty:
+        return make_plan(inserts, skipped=skipped)
+
+    to_update['Tot. Presenze'] = pd.to_numeric(to_update['Tot. Presenze'], errors='coerce').fillna(0)
+    to_update['Incasso'] = pd.to_numeric(to_update['Incasso'], errors='coerce').fillna(0.0)
+    to_update['Nr. Eventi'] = pd.to_numeric(to_update['Nr. Eventi'], errors='coerce').fillna(0)
+    to_update['row_start'] = pd.to_datetime(to_update['data_inizio'], errors='coerce')
+    to_update['row_end'] = pd.to_datetime(to_update['data_fine'], errors='coerce')
+
+    grouped = to_update.groupby(title_col, sort=False).agg(
+        id=('id', 'first'),
+        presenze=('Tot. Presenze', 'sum'),
+        incasso=('Incasso', 'sum'),
+        nr_eventi=('Nr. Eventi', 'sum'),
+        row_start=('row_start', 'min'),
+        row_end=('row_end', 'max'),
+        autore=('autore', 'last'),  # Keeping latest author logic
+        db_presenze=('db_presenze', 'first'),
+        db_incasso=('db_incasso', 'first'),
+        db_nr_eventi=('db_nr_eventi', 'first'),
+        db_data_inizio=('db_data_inizio', 'first'),
+        db_data_fine=('db_data_fine', 'first'),
+        db_autore=('db_autore', 'first'),
+    ).reset_index()
+
+    # Date range merge: min(start), max(end); a missing DB date is ignored
+    db_start = pd.to_datetime(grouped['db_data_inizio'], errors='coerce')
+    db_end = pd.to_datetime(grouped['db_data_fine'], errors='coerce')
+    final_start = pd.concat([db_start, grouped['row_start']], axis=1).min(axis=1)
+    final_end = pd.concat([db_end, grouped['row_end']], axis=1).max(axis=1)
+
+    updates = pd.DataFrame({
+        'id': grouped['id'].astype(int),
+        title_col: grouped[title_col],
+        'Tot. Presenze': (grouped['db_presenze'] + grouped['presenze']).astype(int),
+        'Incasso': (grouped['db_incasso'] + grouped['incasso']).astype(float),
+        'Nr. Eventi': (grouped['db_nr_eventi'] + grouped['nr_eventi']).astype(int),
+        'data_inizio': final_start.dt.strftime('%Y-%m-%d'),
+        'data_fine': final_end.dt.strftime('%Y-%m-%d'),
+        'autore': grouped['autore'],
+        'Tot. Presenze (prima)': grouped['db_presenze'].astype(int),
+        'Incasso (prima)': grouped['db_incasso'].astype(float),
+        'Nr. Eventi (prima)': grouped['db_nr_eventi'].astype(int),
+        'data_inizio (prima)': grouped['db_data_inizio'],
+        'data_fine (prima)': grouped['db_data_fine'],
+        'autore (prima)': grouped['db_autore'],
+    })
+    return make_plan(inserts, updates=updates, skipped=skipped)
+
+
+def verify_eventi_plan(plan, current_rows, title_col='Titolo Evento'):
+    """
+    Check a plan_eventi_merge plan against the DB rows read again just before writing.
+
+    The updates hold absolute sums computed from the "<col> (prima)" values: if
+    another import changed those rows since, or inserted one of the new titles,
+    writing the plan would overwrite it. Raises StalePlanError in that case.
+    """
+    current = pd.DataFrame(current_rows, columns=['id', title_col, *EVENTI_NUMERIC_COLUMNS, *EVENTI_DATE_COLUMNS])
+    stale = set(plan.inserts[title_col].dropna()) & set(current[title_col].dropna()) if title_col in plan.inserts else set()
+
+    if not plan.updates.empty:
+        before = plan.updates.set_index(plan.updates['id'].astype(int))
+        now = current.dropna(subset=['id']).drop_duplicates(subset=['id'])
+        now = now.set_index(now['id'].astype(int)).reindex(before.index)
+        changed = now['id'].isna()
+        for col in EVENTI_NUMERIC_COLUMNS:
+            old = pd.to_numeric(before[f"{col} (prima)"], errors='coerce').fillna(0).round(2)
+            new = pd.to_numeric(now[col], errors='coerce').fillna(0).round(2)
+            changed |= old != new
+        for col in EVENTI_DATE_COLUMNS:
+            old = pd.to_datetime(before[f"{col} (prima)"], errors='coerce')
+            new = pd.to_datetime(now[col], errors='coerce')
+            changed |= (old != new) & ~(old.isna() & new.isna())
+        stale |= set(before.loc[changed.to_numpy(), title_col])
+
+    if stale:
+        titles = sorted(stale)
+        raise StalePlanError(
+            f"{len(titles)} titoli modificati nel database dopo la preparazione "
+            f"({', '.join(titles[:5])}{'...' if len(titles) > 5 else ''}): "
+            "nessun dato scritto, premere di nuovo \"Prepara Importazione\".",
+            titles,
+        )
+
+
+# --- ExportTitoliFiscali (una riga per biglietto) ---
+# Col C=2 (data/ora), H=7 (titolo), V=21 (tipo biglietto)
+FISCALI_COLUMNS = (2, 7, 21)
+FISCALI_MIN_COLUMNS = 22
+
+
+def iter_fiscali_rows(file, columns=FISCALI_COLUMNS):
+    """
+    Stream (data, titolo, biglietto) tuples from the first sheet of an .xlsx file.
+
+    Uses openpyxl in read-only mode: rows are parsed one at a time and only the
+    requested columns are kept, so memory does not grow with the file size.
+    """
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        # The <dimension> element is often missing or wrong in exported files:
+        # measure the width on the first non-empty row actually read instead.
+        ws.reset_dimensions()
+        width_checked = False
+        for row in ws.iter_rows(values_only=True):
+            if not width_checked and any(v is not None for v in row):
+                if len(row) < FISCALI_MIN_COLUMNS:
+                    raise ValueError("Il file non ha abbastanza colonne (richiesta almeno Colonna V / Indice 21).")
+                width_checked = True
+            yield tuple(row[i] if i < len(row) else None for i in columns)
+    finally:
+        wb.close()
+
+
+def iter_fiscali_rows_pandas(file, columns=FISCALI_COLUMNS):
+    """Same tuples as iter_fiscali_rows, via pd.read_excel (needed for legacy .xls)."""
+    df = pd.read_excel(file, header=None)
+    if df.shape[1] < FISCALI_MIN_COLUMNS:
+        raise ValueError("Il file non ha abbastanza colonne (richiesta almeno Colonna V / Indice 21).")
+    return df.iloc[:, list(columns)].itertuples(index=False, name=None)
+
+
+def parse_fiscale_datetime(raw_val):
+    """Parse a Col C value ('dd/mm/yyyy H.M.S' or a real datetime). None if unparseable."""
+    try:
+        if pd.isnull(raw_val):
+            return None
+        # Case 1: Already a datetime/timestamp object (Excel date cell)
+        if isinstance(raw_val, (datetime, pd.Timestamp)):
+            return raw_val
+        # Case 2: String - try specific format first, then generic
+        if isinstance(raw_val, str):
+            raw_val = raw_val.strip()
+            try:
+                return datetime.strptime(raw_val, "%d/%m/%Y %H.%M.%S")
+            except ValueError:
+                dt_obj = pd.to_datetime(raw_val, dayfirst=True)
+                return None if pd.isna(dt_obj) else dt_obj
+    except Exception:
+        return None
+    return None
+
+
+def aggregate_fiscali_rows(rows, agg_map=None):
+    """
+    Fold (data, titolo, biglietto) tuples into per-(titolo, data, orario) ticket counts.
+
+    Row-by-row reference implementation of aggregate_fiscali (kept for checks/benchmarks).
+    """
+    if agg_map is None:
+        agg_map = {}
+
+    for raw_val, title, ticket in rows:
+        dt_obj = parse_fiscale_datetime(raw_val)
+        if dt_obj is None:
+            continue
+        if pd.isna(title):
+            continue
+
+        ticket_val = str(ticket).strip()
+        time_str = dt_obj.strftime('%H:%M')
+        key = (title, dt_obj.date(), time_str)
+
+        if key not in agg_map:
+            agg_map[key] = {
+                "titolo_evento": title,
+                "data": dt_obj.date(),
+                "orario": time_str,
+                "first_dt": dt_obj,  # for get_evento
+                "interi": 0, "ridotti": 0, "soci": 0, "omaggio": 0, "nc": 0
+            }
+
+        stats = agg_map[key]
+        if ticket_val == 'R7':
+            stats['ridotti'] += 1
+        elif ticket_val == 'I1':
+            stats['interi'] += 1
+        elif ticket_val == 'O7':
+            stats['omaggio'] += 1
+        elif ticket_val == 'R8':
+            stats['soci'] += 1
+        else:
+            stats['nc'] += 1
+
+    return agg_map
+
+
+# Vectorized path
+FISCALI_DATE_FORMAT = "%d/%m/%Y %H.%M.%S"
+FISCALI_CHUNK_ROWS = 50000
+TICKET_KINDS = {'I1': 'interi', 'R7': 'ridotti', 'R8': 'soci', 'O7': 'omaggio'}
+TICKET_COLUMNS = ['interi', 'ridotti', 'soci', 'omaggio', 'nc']
+FISCALI_AGG_COLUMNS = ['titolo_evento', 'data', 'orario', 'first_dt'] + TICKET_COLUMNS
+
+
+def parse_fiscali_datetimes(values):
+    """Parse a whole Col C at once: datetimes pass through, strings use FISCALI_DATE_FORMAT first."""
+    values = pd.Series(values, dtype=object)
+    # One row per ticket: the same screening timestamp repeats many times, parse it once
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    try:
+        stripped = uniques.str.strip()
+        is_str = stripped.notna()
+        uniques = stripped.where(is_str, uniques)
+    except AttributeError:
+        # No string at all in the column
+        is_str = pd.Series(False, index=uniques.index)
+
+    parsed = pd.to_datetime(uniques, format=FISCALI_DATE_FORMAT, errors='coerce')
+
+    # Fallback for standard formats (strings only, like the row-by-row parser)
+    retry = parsed.isna() & is_str
+    if retry.any():
+        parsed[retry] = pd.to_datetime(uniques[retry], dayfirst=True, errors='coerce', format='mixed')
+
+    # codes == -1 for missing cells -> NaT
+    parsed = pd.concat([parsed, pd.Series([pd.NaT], dtype=parsed.dtype)], ignore_index=True)
+    return pd.Series(parsed.to_numpy()[codes], index=values.index)
+
+
+def _count_fiscali_chunk(chunk):
+    dt = parse_fiscali_datetimes(chunk['raw_dt'])
+    valid = dt.notna() & chunk['title'].notna()
+    if not valid.any():
+        return None
+
+    dt = dt[valid]
+    kind = chunk.loc[valid, 'ticket'].astype(object).map(str).str.strip().map(TICKET_KINDS).fillna('nc')
+    frame = pd.DataFrame({
+        'titolo_evento': chunk.loc[valid, 'title'],
+        'minute': dt.dt.floor('min'),  # == (data, orario HH:MM)
+        'first_dt': dt,
+        'kind': pd.Categorical(kind, categories=TICKET_COLUMNS),
+    })
+    keys = ['titolo_evento', 'minute']
+    counts = (
+        frame.groupby(keys + ['kind'], sort=False, observed=True).size()
+        .unstack('kind', fill_value=0)
+        .reindex(columns=TICKET_COLUMNS, fill_value=0)
+    )
+    first = frame.groupby(keys, sort=False)['first_dt'].first()
+    # Keep first-appearance order of the screenings
+    return counts.reindex(first.index).assign(first_dt=first)
+
+
+def aggregate_fiscali(rows, chunk_rows=FISCALI_CHUNK_ROWS):
+    """
+    Vectorized per-(titolo, data, orario) ticket counts from (data, titolo, biglietto) tuples.
+
+    Rows are consumed in chunks of `chunk_rows` (so a streamed file never sits in
+    memory as a whole); each chunk is parsed in one pass and counted with a single groupby.
+    Returns a DataFrame with FISCALI_AGG_COLUMNS, in first-appearance order.
+    """
+    rows = iter(rows)
+    partials = []
+    while True:
+        block = list(islice(rows, chunk_rows))
+        if not block:
+            break
+        partial = _count_fiscali_chunk(pd.DataFrame(block, columns=['raw_dt', 'title', 'ticket']))
+        if partial is not None:
+            partials.append(partial)
+
+    if not partials:
+        return pd.DataFrame(columns=FISCALI_AGG_COLUMNS)
+
+    combined = pd.concat(partials)
+    if len(partials) > 1:
+        grouped = combined.groupby(level=[0, 1], sort=False)
+        combined = grouped[TICKET_COLUMNS].sum().assign(first_dt=grouped['first_dt'].first())
+
+    # Date / time labels only on the (small) aggregated frame
+    result = combined.reset_index()
+    result['data'] = result['minute'].dt.date
+    result['orario'] = result['minute'].dt.strftime('%H:%M')
+    result[TICKET_COLUMNS] = result[TICKET_COLUMNS].astype(int)
+    return result[FISCALI_AGG_COLUMNS]
+
+
+FISCALI_TABLE = "dettaglio_ingressi"
+FISCALI_CONFLICT = "data,orario,evento,titolo_evento"
+FISCALI_KEY_COLUMNS = ['data', 'orario', 'evento', 'titolo_evento']
+
+
+def plan_fiscali_insert(df_agg, existing_rows):
+    """
+    Build the dettaglio_ingressi plan from aggregate_fiscali output.
+
+    Rows whose (data, orario, evento, titolo_evento) key -- the insert conflict
+    target -- is already in `existing_rows` are skipped; existing rows without a
+    title (imported before sql/007) match any title at the same data, orario and
+    evento. Inserts carry no `id` (assigned by the DB).
+    """
+    payload = pd.DataFrame({
+        'data': pd.to_datetime(df_agg['data']).dt.strftime('%Y-%m-%d'),
+        'orario': df_agg['orario'],
+        'evento': classify_evento(df_agg['first_dt']).fillna("adu"),
+        'titolo_evento': _clean_str(df_agg['titolo_evento']),
+    })
+    for col in TICKET_COLUMNS:
+        payload[col] = df_agg[col].astype(int)
+
+    existing = pd.DataFrame(existing_rows, columns=FISCALI_KEY_COLUMNS)
+    existing = existing.assign(
+        data=existing['data'].astype(str),
+        orario=existing['orario'].astype(str).str[:5],
+        evento=existing['evento'].astype(str),
+        titolo_evento=_clean_str(existing['titolo_evento']),
+    )
+    is_duplicate = pd.MultiIndex.from_frame(payload[FISCALI_KEY_COLUMNS]).isin(
+        pd.MultiIndex.from_frame(existing[FISCALI_KEY_COLUMNS]))
+    untitled = existing[existing['titolo_evento'] == ""]
+    is_duplicate |= pd.MultiIndex.from_frame(payload[['data', 'orario', 'evento']]).isin(
+        pd.MultiIndex.from_frame(untitled[['data', 'orario', 'evento']]))
+
+    return ImportPlan(
+        table=FISCALI_TABLE,
+        inserts=payload[~is_duplicate],
+        updates=_empty_frame(['id']),
+        skipped=payload[is_duplicate],
+        insert_conflict=FISCALI_CONFLICT,
+    )
+
+
+# --- ExportEventi (Top/Flop -> eventi_highlights) ---
+# Col A=Data (0), B=Titolo (1), C=Autore (2), D=Nazione (3), K=Ingressi (10), M=Incasso (12)
+TOP_FLOP_MIN_COLUMNS = 11
+# Proiezioni estive escluse dalle classifiche (15/06 - 15/09)
+TOP_FLOP_SUMMER_START_MD = 6 * 100 + 15
+TOP_FLOP_SUMMER_END_MD = 9 * 100 + 15
+
+
+def _parse_dayfirst(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    # Common path: one inferred format for the whole column; odd cells retried one by one
+    parsed = pd.to_datetime(values, dayfirst=True, errors='coerce')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], dayfirst=True, errors='coerce', format='mixed')
+    return parsed
+
+
+def _clean_str(values):
+    return values.where(values.notna(), "").astype(str).str.strip()
+
+
+def parse_top_flop(df_tf):
+    """
+    Columnar parse of the 'export_eventi' sheet into eventi_highlights rows.
+
+    Drops rows with ingressi missing/<= 0, unparseable dates, missing titles and
+    summer dates (15/06 - 15/09). Incasso defaults to 0.0 when not numeric.
+    """
+    ingressi = pd.to_numeric(df_tf.iloc[:, 10], errors='coerce')
+    if df_tf.shape[1] > 12:
+        incasso = pd.to_numeric(df_tf.iloc[:, 12], errors='coerce').fillna(0.0)
+    else:
+        incasso = pd.Series(0.0, index=df_tf.index)
+    dt = _parse_dayfirst(df_tf.iloc[:, 0])
+    titolo = df_tf.iloc[:, 1]
+
+    md = dt.dt.month * 100 + dt.dt.day
+    is_summer = (md >= TOP_FLOP_SUMMER_START_MD) & (md <= TOP_FLOP_SUMMER_END_MD)
+    keep = (ingressi > 0) & dt.notna() & ~is_summer & titolo.notna()
+
+    dt = dt[keep]
+    return pd.DataFrame({
+        "data": dt.dt.strftime('%Y-%m-%d'),
+        "orario": dt.dt.strftime('%H:%M'),
+        "titolo_evento": _clean_str(titolo[keep]),
+        "autore": _clean_str(df_tf.iloc[:, 2][keep]),
+        "nazione": _clean_str(df_tf.iloc[:, 3][keep]),
+        "ingressi": ingressi[keep].astype(int),
+        "incasso": incasso[keep].astype(float),
+    }).reset_index(drop=True)
+
+
+def build_highlights_payload(df_clean):
+    """eventi_highlights upsert payload: one record per projection."""
+    return to_records(df_clean.assign(categoria="DATA", proiezioni_count=1))
+
+
+HIGHLIGHTS_TABLE = "eventi_highlights"
+HIGHLIGHTS_CONFLICT = "data, titolo_evento, orario"
+
+
+def plan_highlights_insert(df_clean, existing_rows):
+    """
+    Build the eventi_highlights plan: projections already stored, keyed on
+    (data, titolo_evento, orario), are skipped.
+    """
+    payload = df_clean.assign(categoria="DATA", proiezioni_count=1)
+    keys = ['data', 'titolo_evento', 'orario']
+
+    existing = pd.DataFrame(existing_rows, columns=keys)
+    existing['orario'] = existing['orario'].astype(str).str[:5]  # time columns come back as HH:MM:SS
+    existing_keys = pd.MultiIndex.from_frame(existing.astype(str))
+    is_duplicate = pd.MultiIndex.from_frame(payload[keys].astype(str)).isin(existing_keys)
+
+    return ImportPlan(
+        table=HIGHLIGHTS_TABLE,
+        inserts=payload[~is_duplicate],
+        updates=_empty_frame(['id']),
+        skipped=payload[is_duplicate],
+        insert_conflict=HIGHLIGHTS_CONFLICT,
+    )
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Cache dei risultati delle query della dashboard, condivisa tra le sessioni
+# (un'istanza per processo, vedi get_result_cache in app.py).
+# Chiave: (tabella, proiezione, intervallo di date); scadenza a tempo (TTL),
+# tetto di memoria con eviction LRU e invalidazione per tabella dopo gli import.
+# get_range riusa gli intervalli già caricati: una richiesta contenuta in un
+# intervallo in cache si risolve filtrando in locale, una più ampia scarica
+# solo i giorni che nessun intervallo copre e li unisce in uno solo.
+
+RESULT_CACHE_TTL = 15 * 60                   # secondi
+RESULT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+SMALL_RESULT_BYTES = 1024                    # stima per risultati che non sono DataFrame
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+
+def result_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return SMALL_RESULT_BYTES
+
+
+class ResultCache:
+    """Thread-safe TTL + LRU cache; keys are tuples whose first item is the table name."""
+
+    def __init__(self, ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_BYTES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, expires_at, nbytes), oldest first
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= self._clock():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+        return _shared(value)
+
+    def put(self, key, value, expires_at=None):
+        nbytes = result_size(value)
+        if nbytes > self.max_bytes:
+            return   # never evict everything for a single oversized result
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at or self._clock() + self.ttl, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def get_or_fetch(self, key, fetch):
+        """Cached value for key, or fetch() stored under it (None results are not cached)."""
+        value = self.get(key)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                self.put(key, value)
+                value = _shared(value)
+        return value
+
+    def get_range(self, table, projection, date_col, start, end, fetch):
+        """
+        Rows of `table` with start <= date_col <= end ('YYYY-MM-DD' strings).
+
+        Cached ranges are keyed (table, projection, date_col, first_day, last_day).
+        A request inside a cached range is sliced locally; one overlapping (or
+        touching) cached ranges fetches only the days none of them covers through
+        fetch(gap_start, gap_end) and replaces all of them with the merged range.
+        """
+        prefix = (table, projection, date_col)
+        with self._lock:
+            inside = self._covering(prefix, start, end)
+            if inside is not None:
+                self._entries.move_to_end(inside)
+                cached = self._entries[inside][0]
+                return _slice_dates(cached, date_col, start, end)
+            now = self._clock()
+            touching = sorted(
+                (k for k, (_, expires_at, _) in self._entries.items()
+                 if k[:3] == prefix and expires_at > now and k[3] <= _shift(end, 1) and start <= _shift(k[4], 1)),
+                key=lambda k: k[3])
+            segments = [(k, self._entries[k][0], self._entries[k][1]) for k in touching]
+
+        if not segments:
+            frame = fetch(start, end)
+            self.put(prefix + (start, end), frame)
+            return _shared(frame)
+
+        # Walk the segments in date order: fetch the gaps, keep each cached day once
+        parts = []
+        covered = _shift(min(start, segments[0][0][3]), -1)   # last day already in `parts`
+        for key, frame, _ in segments:
+            lo, hi = key[3], key[4]
+            if lo > _shift(covered, 1):
+                parts.append(fetch(_shift(covered, 1), _shift(lo, -1)))
+            if hi > covered:
+                parts.append(frame if lo > covered else _slice_dates(frame, date_col, _shift(covered, 1), hi))
+                covered = hi
+        if end > covered:
+            parts.append(fetch(_shift(covered, 1), end))
+        non_empty = [p for p in parts if not p.empty]
+        merged = _concat_typed(non_empty) if non_empty else segments[0][1]
+
+        # The merged range keeps the oldest expiry of its parts
+        with self._lock:
+            for key in touching:
+                if key in self._entries:
+                    self._drop(key)
+        self.put(prefix + (min(start, segments[0][0][3]), max(end, covered)), merged,
+                 expires_at=min(expires_at for _, _, expires_at in segments))
+        return _slice_dates(merged, date_col, start, end)
+
+    def covers(self, table, projection, date_col, start, end):
+        """True if one cached range contains start..end (get_range answers without a query)."""
+        with self._lock:
+            return self._covering((table, projection, date_col), start, end) is not None
+
+    def _covering(self, prefix, start, end):
+        now = self._clock()
+        return next((k for k, (_, expires_at, _) in self._entries.items()
+                     if k[:3] == prefix and expires_at > now and k[3] <= start and end <= k[4]), None)
+
+    def invalidate(self, table=None):
+        """Drop every entry of `table` (all entries if None)."""
+        with self._lock:
+            for key in [k for k in self._entries if table is None or k[0] == table]:
+                self._drop(key)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+
+def _concat_typed(frames):
+    # concat turns categories that differ between the parts into object: restore them
+    merged = pd.concat(frames, ignore_index=True)
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(merged[col].dtype, pd.CategoricalDtype):
+            merged[col] = merged[col].astype('category')
+    return merged
+
+
+def _shift(day, days):
+    return (pd.Timestamp(day) + pd.Timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _slice_dates(frame, date_col, start, end):
+    if frame.empty or date_col not in frame.columns:
+        return _shared(frame)
+    dates = frame[date_col]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    dates = dates.dt.normalize()
+    mask = (dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))
+    return frame[mask.to_numpy()].reset_index(drop=True)
+
+
+def _shared(value):
+    # Shallow copy: with copy-on-write (pandas >= 3, see requirements.txt) a caller
+    # adding/changing columns never touches the cached frame. Older pandas edit the
+    # shared data in place: deep copy there.
+    return value.copy(deep=not _COPY_ON_WRITE) if isinstance(value, pd.DataFrame) else value
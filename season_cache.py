@@ -0,0 +1,106 @@
+from datetime import date
+
+import pandas as pd
+
+from season_rules import (
+    PERIODS, SEASON_FIRST_MONTH, fetch_season_rows, is_summer, period_bounds,
+    period_rows, season_start_year, totals_from_rpc,
+)
+from supabase_io import fetch_paginated
+
+# Cache persistente dei Riepiloghi (tabella riepiloghi_cache, vedi sql/006_riepiloghi_cache.sql).
+# Una voce per anno sociale e per estate con i totali per Evento, nello stesso
+# formato delle righe di riepiloghi_stagioni. Le voci calcolate restano valide
+# finché un import eventi non scrive giorni del loro periodo (mark_stale):
+# le stagioni chiuse di fatto non si ricalcolano più, quella in corso solo dopo
+# un import. La pagina legge la cache e ricalcola soltanto le voci mancanti o
+# segnate, con una sola chiamata sull'intervallo che le contiene.
+# Ogni segnalazione incrementa la versione della voce: il ricalcolo si salva solo
+# se la versione è ancora quella letta (sql/010_riepiloghi_cache_versione.sql),
+# così un import arrivato nel frattempo non viene coperto da totali precedenti.
+
+SEASON_CACHE_TABLE = "riepiloghi_cache"
+SEASON_CACHE_EVENTI_TABLE = "eventi_importati"   # le voci riassumono solo questa tabella eventi
+SEASON_CACHE_MARK_RPC = "segna_riepiloghi_da_ricalcolare"
+SEASON_CACHE_SAVE_RPC = "salva_riepiloghi"
+
+
+def touched_periods(days):
+    """(periodo, anno) of every anno sociale / summer window containing one of `days`."""
+    dates = pd.to_datetime(pd.Series(list(days), dtype=object), errors='coerce').dropna()
+    seasons = {('stagione', int(y)) for y in season_start_year(dates).dropna()}
+    summers = {('estate', int(y)) for y in dates[is_summer(dates).to_numpy()].dt.year}
+    return sorted(seasons | summers)
+
+
+def mark_stale(client, table, days):
+    """Flag the cached periods containing `days` for recomputation (after an import into eventi `table`)."""
+    if table != SEASON_CACHE_EVENTI_TABLE:
+        return 0
+    periods = [{'periodo': p, 'anno': a} for p, a in touched_periods(days)]
+    if periods:
+        client.rpc(SEASON_CACHE_MARK_RPC, {'p_periodi': periods}).execute()
+    return len(periods)
+
+
+def current_years(today):
+    """Year of the current (or last closed, in June-August) anno sociale and of the current summer."""
+    return {'stagione': today.year if today.month >= SEASON_FIRST_MONTH else today.year - 1, 'estate': today.year}
+
+
+def _all_years(keys, last):
+    # Every period from the oldest one known to the current one (years without data included)
+    first = {p: min([a for q, a in keys if q == p], default=last[p]) for p in PERIODS}
+    return {(p, a) for p in PERIODS for a in range(first[p], last[p] + 1)}
+
+
+def load_season_totals(client, table, local_frame, today=None):
+    """
+    ((season_totals, summer_totals), recomputed periods) from the cache.
+
+    Missing or flagged periods are recomputed with one riepiloghi_stagioni call over
+    their span (local_frame() grouped here if the RPC is not installed) and written
+    back, unless flagged again meanwhile; while no period has been computed yet
+    (first run), every period is. Raises if the cache table is not available or
+    does not summarize `table`.
+    """
+    if table != SEASON_CACHE_EVENTI_TABLE:
+        raise ValueError(f"{SEASON_CACHE_TABLE} riassume solo {SEASON_CACHE_EVENTI_TABLE}, non {table}")
+    today = pd.Timestamp(today or date.today()).normalize()
+    last = current_years(today)
+    cached = fetch_paginated(
+        lambda count=None: client.table(SEASON_CACHE_TABLE).select("periodo, anno, totali, versione", count=count).order("id")
+    )
+    entries = {(r['periodo'], r['anno']): r['totali'] for r in cached}
+    versions = {(r['periodo'], r['anno']): r['versione'] for r in cached}
+
+    # Only flags (an import before the first visit): the oldest periods are not known yet
+    if any(totali is not None for totali in entries.values()):
+        stale = sorted(k for k in _all_years(entries, last) | set(entries) if entries.get(k) is None)
+        rows = None
+        if stale:
+            bounds = [period_bounds(p, a) for p, a in stale]
+            rows = fetch_season_rows(client, table, min(b[0] for b in bounds), max(b[1] for b in bounds))
+    else:
+        stale = None
+        rows = fetch_season_rows(client, table)
+
+    if stale is None or stale:
+        if rows is None:
+            rows = period_rows(local_frame())
+        fresh = {}
+        for row in rows:
+            fresh.setdefault((row['periodo'], int(row['anno'])), []).append(
+                {'evento': row['evento'], 'presenze': row['presenze'], 'incasso': row['incasso']})
+        if stale is None:
+            stale = sorted(_all_years(fresh, last) | set(fresh))
+        updated = {key: fresh.get(key, []) for key in stale}
+        # Saved only where the version is still the one read above (absent entries: None)
+        client.rpc(SEASON_CACHE_SAVE_RPC, {'p_voci': [
+            {'periodo': p, 'anno': a, 'totali': totali, 'versione': versions.get((p, a))}
+            for (p, a), totali in updated.items()
+        ]}).execute()
+        entries.update(updated)
+
+    flat = [dict(item, periodo=p, anno=a) for (p, a), items in sorted(entries.items()) for item in items or []]
+    return totals_from_rpc(flat), stale
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+# Regole delle stagioni dei Riepiloghi, in un unico posto.
+# - Anno sociale: da settembre dell'anno N a maggio di N+1 -> "N-(N+1)" ("2023-24");
+#   giugno-agosto non appartengono a nessun anno sociale.
+# - Estate ("Cinema al Castello"): dal 1/7 al 10/9 (inclusi), per anno solare.
+# Le funzioni lavorano su intere colonne: il costo per riga è aritmetica su
+# mese/anno, etichette e prezzi si calcolano sul risultato raggruppato.
+# Le stesse costanti sono i parametri della RPC riepiloghi_stagioni
+# (sql/005_riepiloghi_stagioni.sql), che raggruppa lato database.
+
+SEASON_FIRST_MONTH = 9    # settembre
+SEASON_LAST_MONTH = 5     # maggio
+SUMMER_START_MD = 7 * 100 + 1
+SUMMER_END_MD = 9 * 100 + 10
+
+EVENTO_LABELS = {'adu': 'Adulti', 'bam': 'Bambini', 'ven': 'Venerdì'}
+SEASON_RPC = "riepiloghi_stagioni"
+PERIODS = ('stagione', 'estate')   # righe della RPC: anno sociale / estate per anno solare
+
+
+def season_label(start_year):
+    """2023 -> '2023-24'."""
+    return f"{start_year}-{str(start_year + 1)[-2:]}"
+
+
+def _as_datetime(values):
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values)
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors="coerce")
+    return values
+
+
+def season_start_year(dates):
+    """Vectorized first calendar year of the anno sociale (<NA> for Jun-Aug and missing dates)."""
+    dates = _as_datetime(dates)
+    month, year = dates.dt.month, dates.dt.year
+    start = year.where(month >= SEASON_FIRST_MONTH, year - 1)
+    in_season = (month >= SEASON_FIRST_MONTH) | (month <= SEASON_LAST_MONTH)
+    return start.where(in_season).astype('Int64')
+
+
+def anno_sociale(dates):
+    """Vectorized anno sociale as an ordered Categorical ('2023-24', ...; NaN outside the seasons)."""
+    start = season_start_year(dates)
+    years = np.sort(start.dropna().unique()).tolist()
+    season = pd.Categorical(start, categories=years, ordered=True)
+    return pd.Series(season.rename_categories([season_label(y) for y in years]), index=start.index)
+
+
+def is_summer(dates):
+    """Vectorized summer window flag (1 July - 10 September)."""
+    dates = _as_datetime(dates)
+    md = dates.dt.month * 100 + dates.dt.day
+    return ((md >= SUMMER_START_MD) & (md <= SUMMER_END_MD)).fillna(False).astype(bool)
+
+
+def period_bounds(periodo, anno):
+    """First and last day of an anno sociale (periodo 'stagione', anno = first year) or of a summer window."""
+    if periodo == 'stagione':
+        start = pd.Timestamp(anno, SEASON_FIRST_MONTH, 1)
+        end = pd.Timestamp(anno + 1, SEASON_LAST_MONTH, 1) + pd.offsets.MonthEnd(0)
+    else:
+        start = pd.Timestamp(anno, SUMMER_START_MD // 100, SUMMER_START_MD % 100)
+        end = pd.Timestamp(anno, SUMMER_END_MD // 100, SUMMER_END_MD % 100)
+    return start, end
+
+
+def season_totals(df):
+    """
+    Presenze per (anno_sociale, evento), chronological; df has data, evento, presenze.
+    Rows outside the seasons or without evento are left out; evento gets its display label.
+    """
+    grouped = (
+        df.assign(anno=season_start_year(df['data']).to_numpy(), evento=df['evento'].astype('category'))
+        .groupby(['anno', 'evento'], observed=True)['presenze'].sum()
+        .reset_index()
+    )
+    return _label_seasons(grouped)
+
+
+def summer_totals(df):
+    """Presenze, incasso and average price per calendar year of the summer window (every evento)."""
+    summer = df[is_summer(df['data']).to_numpy()]
+    grouped = summer.groupby(summer['data'].dt.year.rename('anno_solare'))[['presenze', 'incasso']].sum().reset_index()
+    return _summer_prices(grouped)
+
+
+def fetch_season_totals(client, table):
+    """
+    (season_totals, summer_totals) grouped by the database, or None if the RPC is
+    not available: callers fall back to grouping the rows themselves.
+    """
+    rows = fetch_season_rows(client, table)
+    return None if rows is None else totals_from_rpc(rows)
+
+
+def fetch_season_rows(client, table, start_date=None, end_date=None):
+    """riepiloghi_stagioni rows (optionally only for the days between the two dates), or None if not available."""
+    params = {
+        "p_table": table,
+        "p_season_first_month": SEASON_FIRST_MONTH,
+        "p_season_last_month": SEASON_LAST_MONTH,
+        "p_summer_start_md": SUMMER_START_MD,
+        "p_summer_end_md": SUMMER_END_MD,
+    }
+    if start_date is not None:
+        # Range parameters: sql/006_riepiloghi_cache.sql
+        params.update(p_start=start_date.strftime('%Y-%m-%d'), p_end=end_date.strftime('%Y-%m-%d'))
+    try:
+        res = client.rpc(SEASON_RPC, params).execute()
+    except Exception as e:
+        print(f"RPC {SEASON_RPC} non disponibile, calcolo locale: {e}")
+        return None
+    return res.data or []
+
+
+def period_rows(df):
+    """Local equivalent of the riepiloghi_stagioni rows (data, evento, presenze, incasso -> periodo/anno/evento rows)."""
+    values = ['presenze', 'incasso']
+    seasons = (
+        df.assign(anno=season_start_year(df['data']).to_numpy(), evento=df['evento'].astype(object))
+        .groupby(['anno', 'evento'], dropna=False)[values].sum()
+        .reset_index().dropna(subset=['anno'])
+        .assign(periodo='stagione')
+    )
+    summer = df[is_summer(df['data']).to_numpy()]
+    summer = (
+        summer.groupby(summer['data'].dt.year.rename('anno'))[values].sum()
+        .reset_index()
+        .assign(periodo='estate', evento=None)
+    )
+    rows = pd.concat([seasons, summer], ignore_index=True)
+    rows['anno'] = rows['anno'].astype(int)
+    rows['evento'] = rows['evento'].astype(object).where(rows['evento'].notna(), None)
+    return rows[['periodo', 'anno', 'evento', 'presenze', 'incasso']].to_dict('records')
+
+
+def totals_from_rpc(rows):
+    """riepiloghi_stagioni rows -> (season_totals, summer_totals), same shapes as the local ones."""
+    frame = pd.DataFrame(rows, columns=['periodo', 'anno', 'evento', 'presenze', 'incasso'])
+    frame['anno'] = pd.to_numeric(frame['anno'], errors='coerce').astype('Int64')
+    frame['presenze'] = pd.to_numeric(frame['presenze'], errors='coerce').fillna(0).astype('int64')
+    frame['incasso'] = pd.to_numeric(frame['incasso'], errors='coerce').fillna(0.0)
+
+    seasons = frame.loc[frame['periodo'] == 'stagione', ['anno', 'evento', 'presenze']].dropna(subset=['evento'])
+    seasons = seasons.assign(evento=seasons['evento'].astype('category'))
+    summer = frame.loc[frame['periodo'] == 'estate', ['anno', 'presenze', 'incasso']].rename(columns={'anno': 'anno_solare'})
+    return _label_seasons(seasons), _summer_prices(summer)
+
+
+def _label_seasons(grouped):
+    # (anno, evento, presenze) -> (anno_sociale, evento, presenze): labels on the grouped rows only
+    grouped = grouped.dropna(subset=['anno']).sort_values(['anno', 'evento'], kind='stable')
+    years = grouped['anno'].astype(int).to_numpy()
+    labels = [season_label(y) for y in np.unique(years)]
+    evento = grouped['evento'].cat.remove_unused_categories().cat.rename_categories(lambda c: EVENTO_LABELS.get(c, c))
+    return pd.DataFrame({
+        'anno_sociale': pd.Categorical([season_label(y) for y in years], categories=labels, ordered=True),
+        'evento': evento.array,
+        'presenze': grouped['presenze'].to_numpy(),
+    })
+
+
+def _summer_prices(grouped):
+    grouped = grouped.sort_values('anno_solare').reset_index(drop=True)
+    grouped['anno_solare'] = grouped['anno_solare'].astype(int)
+    grouped['media_prezzo'] = (grouped['incasso'] / grouped['presenze'].where(grouped['presenze'] > 0)).fillna(0)
+    return grouped
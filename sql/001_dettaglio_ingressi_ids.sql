@@ -0,0 +1,16 @@
+-- dettaglio_ingressi: id assegnato dal database e chiave univoca per l'importatore fiscale.
+-- Da eseguire una volta nell'SQL Editor di Supabase.
+
+-- 1. id generato da una sequenza (niente più max(id) + 1 lato app)
+create sequence if not exists dettaglio_ingressi_id_seq owned by dettaglio_ingressi.id;
+select setval('dettaglio_ingressi_id_seq', coalesce((select max(id) from dettaglio_ingressi), 0) + 1, false);
+alter table dettaglio_ingressi alter column id set default nextval('dettaglio_ingressi_id_seq');
+
+-- 2. Chiave univoca (data, orario, evento): sostituita da 007_dettaglio_ingressi_titolo.sql, che aggiunge
+--    il titolo. Film diversi alla stessa data e ora (arena e sala) NON sono duplicati: se la creazione
+--    fallisce non rimuovere righe, eseguire direttamente 007.
+create unique index if not exists dettaglio_ingressi_data_orario_evento_key
+    on dettaglio_ingressi (data, orario, evento);
+
+-- 3. Lettura dei duplicati per intervallo di date
+create index if not exists dettaglio_ingressi_data_idx on dettaglio_ingressi (data);
@@ -0,0 +1,30 @@
+-- KPI della dashboard Statistiche calcolati dal database (chiamata RPC "kpi_per_evento").
+-- Una riga per Evento (adu / ven / bam / null) nel periodo: la app somma i gruppi per il TOTALE.
+-- Da eseguire una volta nell'SQL Editor di Supabase.
+-- p_table: tabella eventi configurata nell'app (DB_TABLE_NAME).
+
+create or replace function kpi_per_evento(p_start date, p_end date, p_table text default 'eventi_importati')
+returns table (evento text, incasso numeric, presenze numeric, n_eventi bigint, avg_ticket numeric)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format(
+        'select "Evento"::text,
+                coalesce(sum("Incasso"::numeric), 0),
+                coalesce(sum("Tot. Presenze"::numeric), 0),
+                count(*),
+                coalesce(sum("Incasso"::numeric) / nullif(sum("Tot. Presenze"::numeric), 0), 0)
+           from %I
+          where data_inizio::date between $1 and $2
+          group by "Evento"',
+        p_table)
+    using p_start, p_end;
+end;
+$$;
+
+grant execute on function kpi_per_evento(date, date, text) to anon, authenticated;
+
+-- Filtro per intervallo di date. L'indice va creato sulla tabella eventi configurata (DB_TABLE_NAME):
+-- se non è eventi_importati, ripetere il comando con il suo nome (vedi 008_tabelle_eventi_consentite.sql).
+create index if not exists eventi_importati_data_inizio_idx on eventi_importati (data_inizio);
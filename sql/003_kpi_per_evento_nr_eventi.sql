@@ -0,0 +1,28 @@
+-- kpi_per_evento: aggiunge tot_nr_eventi (somma di "Nr. Eventi") per la "Media Ingressi".
+-- Il tipo restituito cambia: la funzione va ricreata.
+-- Da eseguire una volta nell'SQL Editor di Supabase (dopo 002_kpi_per_evento.sql).
+
+drop function if exists kpi_per_evento(date, date, text);
+
+create function kpi_per_evento(p_start date, p_end date, p_table text default 'eventi_importati')
+returns table (evento text, incasso numeric, presenze numeric, n_eventi bigint, avg_ticket numeric, tot_nr_eventi numeric)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format(
+        'select "Evento"::text,
+                coalesce(sum("Incasso"::numeric), 0),
+                coalesce(sum("Tot. Presenze"::numeric), 0),
+                count(*),
+                coalesce(sum("Incasso"::numeric) / nullif(sum("Tot. Presenze"::numeric), 0), 0),
+                coalesce(sum("Nr. Eventi"::numeric), 0)
+           from %I
+          where data_inizio::date between $1 and $2
+          group by "Evento"',
+        p_table)
+    using p_start, p_end;
+end;
+$$;
+
+grant execute on function kpi_per_evento(date, date, text) to anon, authenticated;
@@ -0,0 +1,56 @@
+-- rollup_giornaliero: totali per giorno ed Evento (adu / ven / bam, '' se non classificato).
+-- Aggiornato dagli importatori per i giorni che toccano (daily_rollup.refresh_daily_rollup):
+-- i KPI e le torte della dashboard sommano poche righe invece di rileggere eventi e ingressi.
+-- Da eseguire nell'SQL Editor di Supabase. Riassume solo 'eventi_importati' (daily_rollup.ROLLUP_EVENTI_TABLE):
+-- con un'altra DB_TABLE_NAME l'app non lo legge né lo aggiorna.
+-- Si può rieseguire: ricalcola tutte le righe dai dati grezzi.
+
+create table if not exists rollup_giornaliero (
+    id bigint generated always as identity primary key,
+    data date not null,
+    evento text not null default '',
+    incasso numeric not null default 0,
+    presenze integer not null default 0,
+    n_righe integer not null default 0,        -- righe eventi (card: "Eventi")
+    nr_eventi integer not null default 0,      -- somma "Nr. Eventi" (Media Ingressi)
+    interi integer not null default 0,
+    ridotti integer not null default 0,
+    soci integer not null default 0,
+    omaggio integer not null default 0,
+    nc integer not null default 0,
+    nazionalita jsonb not null default '{}',   -- {"Nazionalità": incasso}
+    unique (data, evento)
+);
+
+grant select, insert, update, delete on rollup_giornaliero to anon, authenticated;
+
+-- Popolamento iniziale dagli eventi esistenti...
+insert into rollup_giornaliero (data, evento, incasso, presenze, n_righe, nr_eventi, nazionalita)
+select data, evento, sum(incasso), sum(presenze), sum(n_righe), sum(nr_eventi),
+       coalesce(jsonb_object_agg(nazione, incasso) filter (where nazione <> ''), '{}')
+  from (select data_inizio::date as data,
+               coalesce("Evento", '') as evento,
+               coalesce("Nazionalità", '') as nazione,
+               coalesce(sum("Incasso"::numeric), 0) as incasso,
+               coalesce(sum("Tot. Presenze"::numeric), 0) as presenze,
+               count(*) as n_righe,
+               coalesce(sum("Nr. Eventi"::numeric), 0) as nr_eventi
+          from eventi_importati
+         where data_inizio is not null
+         group by 1, 2, 3) per_nazione
+ group by data, evento
+on conflict (data, evento) do update
+   set incasso = excluded.incasso, presenze = excluded.presenze, n_righe = excluded.n_righe,
+       nr_eventi = excluded.nr_eventi, nazionalita = excluded.nazionalita;
+
+-- ...e dagli ingressi fiscali
+insert into rollup_giornaliero (data, evento, interi, ridotti, soci, omaggio, nc)
+select data::date, coalesce(evento, ''),
+       coalesce(sum(interi), 0), coalesce(sum(ridotti), 0), coalesce(sum(soci), 0),
+       coalesce(sum(omaggio), 0), coalesce(sum(nc), 0)
+  from dettaglio_ingressi
+ where data is not null
+ group by 1, 2
+on conflict (data, evento) do update
+   set interi = excluded.interi, ridotti = excluded.ridotti, soci = excluded.soci,
+       omaggio = excluded.omaggio, nc = excluded.nc;
@@ -0,0 +1,49 @@
+-- Riepiloghi calcolati dal database (chiamata RPC "riepiloghi_stagioni"): una risposta di poche righe
+-- invece dell'intero storico degli eventi.
+--   periodo = 'stagione': presenze e incasso per anno sociale (anno = primo anno, 2023 -> "2023-24") ed Evento
+--   periodo = 'estate':   presenze e incasso della finestra estiva per anno solare (evento null)
+-- I confini delle stagioni NON sono scritti qui: l'app li passa come parametri da season_rules.py,
+-- l'unica definizione delle regole (i default sotto servono solo per provare la funzione a mano).
+-- Da eseguire una volta nell'SQL Editor di Supabase.
+-- p_table: tabella eventi configurata nell'app (DB_TABLE_NAME).
+
+create or replace function riepiloghi_stagioni(
+    p_table text default 'eventi_importati',
+    p_season_first_month int default 9,
+    p_season_last_month int default 5,
+    p_summer_start_md int default 701,
+    p_summer_end_md int default 910)
+returns table (periodo text, anno int, evento text, presenze numeric, incasso numeric)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format(
+        'with righe as (
+             select data_inizio::date as d,
+                    "Evento"::text as evento,
+                    "Tot. Presenze"::numeric as presenze,
+                    coalesce("Incasso"::numeric, 0) as incasso
+               from %I
+              where data_inizio is not null
+                and "Tot. Presenze" is not null
+                and "Tot. Presenze" <> 0)
+         select ''stagione''::text,
+                (extract(year from d) - case when extract(month from d) >= $1 then 0 else 1 end)::int,
+                evento,
+                sum(presenze),
+                sum(incasso)
+           from righe
+          where extract(month from d) >= $1 or extract(month from d) <= $2
+          group by 2, 3
+         union all
+         select ''estate''::text, extract(year from d)::int, null::text, sum(presenze), sum(incasso)
+           from righe
+          where extract(month from d) * 100 + extract(day from d) between $3 and $4
+          group by 2',
+        p_table)
+    using p_season_first_month, p_season_last_month, p_summer_start_md, p_summer_end_md;
+end;
+$$;
+
+grant execute on function riepiloghi_stagioni(text, int, int, int, int) to anon, authenticated;
@@ -0,0 +1,68 @@
+-- Cache persistente dei Riepiloghi: una riga per anno sociale (periodo 'stagione') e per estate
+-- (periodo 'estate'), con i totali per Evento in "totali" (stesso formato delle righe di riepiloghi_stagioni).
+-- totali null = da ricalcolare: l'importatore eventi lo imposta per i periodi dei giorni che scrive,
+-- la pagina ricalcola solo quei periodi (season_cache.py). Le stagioni chiuse restano congelate.
+-- Per forzare un ricalcolo completo: delete from riepiloghi_cache;
+-- Le voci riassumono solo 'eventi_importati' (season_cache.SEASON_CACHE_EVENTI_TABLE): con un'altra
+-- DB_TABLE_NAME l'app non usa la cache.
+-- Da eseguire una volta nell'SQL Editor di Supabase (dopo 005_riepiloghi_stagioni.sql).
+
+create table if not exists riepiloghi_cache (
+    id bigint generated always as identity primary key,
+    periodo text not null,              -- 'stagione' | 'estate'
+    anno integer not null,              -- primo anno dell'anno sociale / anno solare
+    totali jsonb,                       -- [{"evento": ..., "presenze": ..., "incasso": ...}]
+    aggiornato timestamptz not null default now(),
+    unique (periodo, anno)
+);
+
+grant select, insert, update, delete on riepiloghi_cache to anon, authenticated;
+
+-- riepiloghi_stagioni limitata a un intervallo di date (i periodi da ricalcolare).
+-- Il tipo dei parametri cambia: la funzione va ricreata.
+drop function if exists riepiloghi_stagioni(text, int, int, int, int);
+
+create function riepiloghi_stagioni(
+    p_table text default 'eventi_importati',
+    p_season_first_month int default 9,
+    p_season_last_month int default 5,
+    p_summer_start_md int default 701,
+    p_summer_end_md int default 910,
+    p_start date default null,
+    p_end date default null)
+returns table (periodo text, anno int, evento text, presenze numeric, incasso numeric)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format(
+        'with righe as (
+             select data_inizio::date as d,
+                    "Evento"::text as evento,
+                    "Tot. Presenze"::numeric as presenze,
+                    coalesce("Incasso"::numeric, 0) as incasso
+               from %I
+              where data_inizio is not null
+                and "Tot. Presenze" is not null
+                and "Tot. Presenze" <> 0
+                and ($5::date is null or data_inizio::date >= $5)
+                and ($6::date is null or data_inizio::date <= $6))
+         select ''stagione''::text,
+                (extract(year from d) - case when extract(month from d) >= $1 then 0 else 1 end)::int,
+                evento,
+                sum(presenze),
+                sum(incasso)
+           from righe
+          where extract(month from d) >= $1 or extract(month from d) <= $2
+          group by 2, 3
+         union all
+         select ''estate''::text, extract(year from d)::int, null::text, sum(presenze), sum(incasso)
+           from righe
+          where extract(month from d) * 100 + extract(day from d) between $3 and $4
+          group by 2',
+        p_table)
+    using p_season_first_month, p_season_last_month, p_summer_start_md, p_summer_end_md, p_start, p_end;
+end;
+$$;
+
+grant execute on function riepiloghi_stagioni(text, int, int, int, int, date, date) to anon, authenticated;
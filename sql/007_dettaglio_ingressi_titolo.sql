@@ -0,0 +1,16 @@
+-- dettaglio_ingressi: il titolo entra nella riga e nella chiave univoca dell'importatore fiscale.
+-- Le righe sono aggregate per (titolo, data, ora): con la sola chiave (data, orario, evento) due film
+-- alla stessa data e ora (arena estiva e sala) collidevano e il secondo veniva scartato.
+-- Da eseguire una volta nell'SQL Editor di Supabase (dopo 001_dettaglio_ingressi_ids.sql).
+
+-- 1. Titolo dell'evento ('' per le righe importate prima di questa migrazione: niente NULL nella chiave)
+alter table dettaglio_ingressi add column if not exists titolo_evento text not null default '';
+
+-- 2. Una riga per proiezione: usata da upsert(on_conflict="data,orario,evento,titolo_evento").
+drop index if exists dettaglio_ingressi_data_orario_evento_key;
+create unique index if not exists dettaglio_ingressi_data_orario_evento_titolo_key
+    on dettaglio_ingressi (data, orario, evento, titolo_evento);
+
+-- Le righe senza titolo valgono per qualunque titolo alla stessa data, ora ed Evento: reimportare un file
+-- già caricato non le duplica. Per recuperare i film scartati in passato, cancellare le righe dei giorni
+-- interessati e reimportare il file fiscale.
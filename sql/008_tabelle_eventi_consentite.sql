@@ -0,0 +1,97 @@
+-- Le funzioni RPC che ricevono il nome della tabella eventi (p_table) accettano solo le tabelle
+-- elencate in tabelle_eventi: sono eseguibili da anon, e senza elenco chiunque potrebbe aggregare
+-- qualunque tabella con gli stessi nomi di colonna. Una tabella non elencata -> errore, e l'app
+-- ripiega sul calcolo locale.
+-- Da eseguire una volta nell'SQL Editor di Supabase (dopo 006_riepiloghi_cache.sql).
+--
+-- Se nell'app è configurata un'altra tabella eventi (DB_TABLE_NAME), aggiungerla qui:
+--     insert into tabelle_eventi (nome) values ('<tabella>');
+-- e creare anche su di essa l'indice per intervallo di date usato da kpi_per_evento:
+--     create index if not exists <tabella>_data_inizio_idx on <tabella> (data_inizio);
+
+create table if not exists tabelle_eventi (
+    nome text primary key
+);
+
+insert into tabelle_eventi (nome) values ('eventi_importati') on conflict do nothing;
+
+grant select on tabelle_eventi to anon, authenticated;
+
+-- p_table se è nell'elenco, altrimenti errore
+create or replace function tabella_eventi_consentita(p_table text)
+returns text
+language plpgsql
+stable
+as $$
+begin
+    if not exists (select 1 from tabelle_eventi where nome = p_table) then
+        raise exception 'Tabella eventi non consentita: %', p_table
+            using hint = 'Aggiungerla a tabelle_eventi (sql/008_tabelle_eventi_consentite.sql).';
+    end if;
+    return p_table;
+end;
+$$;
+
+create or replace function kpi_per_evento(p_start date, p_end date, p_table text default 'eventi_importati')
+returns table (evento text, incasso numeric, presenze numeric, n_eventi bigint, avg_ticket numeric, tot_nr_eventi numeric)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format(
+        'select "Evento"::text,
+                coalesce(sum("Incasso"::numeric), 0),
+                coalesce(sum("Tot. Presenze"::numeric), 0),
+                count(*),
+                coalesce(sum("Incasso"::numeric) / nullif(sum("Tot. Presenze"::numeric), 0), 0),
+                coalesce(sum("Nr. Eventi"::numeric), 0)
+           from %I
+          where data_inizio::date between $1 and $2
+          group by "Evento"',
+        tabella_eventi_consentita(p_table))
+    using p_start, p_end;
+end;
+$$;
+
+create or replace function riepiloghi_stagioni(
+    p_table text default 'eventi_importati',
+    p_season_first_month int default 9,
+    p_season_last_month int default 5,
+    p_summer_start_md int default 701,
+    p_summer_end_md int default 910,
+    p_start date default null,
+    p_end date default null)
+returns table (periodo text, anno int, evento text, presenze numeric, incasso numeric)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format(
+        'with righe as (
+             select data_inizio::date as d,
+                    "Evento"::text as evento,
+                    "Tot. Presenze"::numeric as presenze,
+                    coalesce("Incasso"::numeric, 0) as incasso
+               from %I
+              where data_inizio is not null
+                and "Tot. Presenze" is not null
+                and "Tot. Presenze" <> 0
+                and ($5::date is null or data_inizio::date >= $5)
+                and ($6::date is null or data_inizio::date <= $6))
+         select ''stagione''::text,
+                (extract(year from d) - case when extract(month from d) >= $1 then 0 else 1 end)::int,
+                evento,
+                sum(presenze),
+                sum(incasso)
+           from righe
+          where extract(month from d) >= $1 or extract(month from d) <= $2
+          group by 2, 3
+         union all
+         select ''estate''::text, extract(year from d)::int, null::text, sum(presenze), sum(incasso)
+           from righe
+          where extract(month from d) * 100 + extract(day from d) between $3 and $4
+          group by 2',
+        tabella_eventi_consentita(p_table))
+    using p_season_first_month, p_season_last_month, p_summer_start_md, p_summer_end_md, p_start, p_end;
+end;
+$$;
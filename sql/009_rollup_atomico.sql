@@ -0,0 +1,37 @@
+-- rollup_giornaliero: riscrittura atomica dei giorni importati e giorni in sospeso.
+-- Prima di scrivere i dati grezzi l'importatore segna i giorni in rollup_in_sospeso (con un token per
+-- import); dopo la scrittura sostituisci_rollup_giornaliero cancella e reinserisce le righe di quei
+-- giorni e toglie i segni del token, tutto in una transazione. Se il ricalcolo fallisce restano le
+-- righe precedenti e i segni: per gli intervalli con giorni in sospeso la dashboard non usa il
+-- riepilogo ma kpi_per_evento e i dati grezzi (daily_rollup.fetch_period_rollup).
+-- Da eseguire una volta nell'SQL Editor di Supabase (dopo 004_rollup_giornaliero.sql).
+-- Dopo aver rieseguito 004 (ricalcolo completo) i segni non servono più: delete from rollup_in_sospeso;
+
+create table if not exists rollup_in_sospeso (
+    id bigint generated always as identity primary key,
+    data date not null,
+    import_id text not null,
+    creato timestamptz not null default now()
+);
+
+create index if not exists rollup_in_sospeso_data_idx on rollup_in_sospeso (data);
+
+grant select, insert on rollup_in_sospeso to anon, authenticated;
+
+create or replace function sostituisci_rollup_giornaliero(p_import text, p_giorni date[], p_righe jsonb)
+returns void
+language plpgsql
+as $$
+begin
+    delete from rollup_giornaliero where data = any(p_giorni);
+
+    insert into rollup_giornaliero (data, evento, incasso, presenze, n_righe, nr_eventi,
+                                    interi, ridotti, soci, omaggio, nc, nazionalita)
+    select data, evento, incasso, presenze, n_righe, nr_eventi, interi, ridotti, soci, omaggio, nc, nazionalita
+      from jsonb_populate_recordset(null::rollup_giornaliero, p_righe);
+
+    delete from rollup_in_sospeso where import_id = p_import;
+end;
+$$;
+
+grant execute on function sostituisci_rollup_giornaliero(text, date[], jsonb) to anon, authenticated;
@@ -0,0 +1,43 @@
+-- riepiloghi_cache: versione per voce, per non perdere le segnalazioni arrivate durante un ricalcolo.
+-- segna_riepiloghi_da_ricalcolare (importatore eventi) azzera i totali e incrementa la versione;
+-- salva_riepiloghi (pagina Riepiloghi) scrive i totali ricalcolati solo dove la versione è ancora
+-- quella letta prima del ricalcolo: una voce segnata nel frattempo resta da ricalcolare.
+-- Da eseguire una volta nell'SQL Editor di Supabase (dopo 006_riepiloghi_cache.sql).
+
+alter table riepiloghi_cache add column if not exists versione integer not null default 0;
+
+-- p_periodi: [{"periodo": ..., "anno": ...}]. Una voce nuova nasce con versione 1: una pagina che
+-- l'aveva letta assente (versione 0) non la sovrascrive.
+create or replace function segna_riepiloghi_da_ricalcolare(p_periodi jsonb)
+returns void
+language sql
+as $$
+    insert into riepiloghi_cache (periodo, anno, totali, versione)
+    select periodo, anno, null, 1
+      from jsonb_to_recordset(p_periodi) as v(periodo text, anno int)
+    on conflict (periodo, anno) do update
+       set totali = null, versione = riepiloghi_cache.versione + 1, aggiornato = now();
+$$;
+
+-- p_voci: [{"periodo": ..., "anno": ..., "totali": [...], "versione": letta (null se la voce mancava)}].
+-- Restituisce il numero di voci scritte.
+create or replace function salva_riepiloghi(p_voci jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    scritte integer;
+begin
+    insert into riepiloghi_cache as c (periodo, anno, totali, versione)
+    select periodo, anno, totali, coalesce(versione, 0)
+      from jsonb_to_recordset(p_voci) as v(periodo text, anno int, totali jsonb, versione int)
+    on conflict (periodo, anno) do update
+       set totali = excluded.totali, aggiornato = now()
+     where c.versione = excluded.versione;
+    get diagnostics scritte = row_count;
+    return scritte;
+end;
+$$;
+
+grant execute on function segna_riepiloghi_da_ricalcolare(jsonb) to anon, authenticated;
+grant execute on function salva_riepiloghi(jsonb) to anon, authenticated;
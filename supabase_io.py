@@ -0,0 +1,224 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+import httpx
+from postgrest.exceptions import APIError
+
+# Helper di lettura/scrittura per Supabase/PostgREST.
+# PostgREST limita ogni risposta a "max-rows" righe (1000 di default):
+# senza range() i risultati vengono troncati in silenzio.
+# In scrittura un unico payload enorme supera i limiti di dimensione/timeout:
+# le scritture bulk vanno spezzate in blocchi (bulk_write).
+
+PAGE_SIZE = 1000
+IN_FILTER_CHUNK = 100   # valori per ogni filtro in_() (limite lunghezza URL)
+MAX_WORKERS = 4
+
+WRITE_CHUNK_SIZE = 500
+WRITE_WORKERS = 4
+WRITE_RETRIES = 3
+WRITE_BACKOFF = 0.5     # secondi, raddoppiati ad ogni tentativo
+
+# Errors after which the request was certainly not applied: safe to retry any write.
+# SQLSTATE: statement timeout, serialization failure, deadlock, too many connections;
+# PGRST000-003: PostgREST could not reach / get a connection to the database.
+TRANSIENT_API_CODES = {"57014", "40001", "40P01", "53300", "PGRST000", "PGRST001", "PGRST002", "PGRST003", "429", "503"}
+# Gateway errors: the write may have been applied, retried only for idempotent writes
+GATEWAY_API_CODES = {"500", "502", "504", "520", "522", "524"}
+
+
+class IncompleteFetchError(RuntimeError):
+    """Raised when the rows received do not match the exact count reported by the DB."""
+
+
+class BulkWriteError(RuntimeError):
+    """Raised when some chunks still fail after the retries; `report` tells what was written."""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+@dataclass
+class WriteReport:
+    rows: int = 0
+    chunks: int = 0
+    retries: int = 0
+    failed_rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def merge(self, other):
+        return WriteReport(
+            rows=self.rows + other.rows,
+            chunks=self.chunks + other.chunks,
+            retries=self.retries + other.retries,
+            failed_rows=self.failed_rows + other.failed_rows,
+            seconds=self.seconds + other.seconds,
+        )
+
+
+def is_transient_error(exc, idempotent=True):
+    """True if a failed write can be retried (see TRANSIENT_API_CODES)."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True   # the request never reached the server
+    if isinstance(exc, httpx.TransportError):
+        return idempotent   # read timeout / dropped connection: outcome unknown
+    if isinstance(exc, APIError):
+        code = str(exc.code)
+        return code in TRANSIENT_API_CODES or (idempotent and code in GATEWAY_API_CODES)
+    return False
+
+
+def fetch_paginated(build_query, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    """
+    Fetch every row of a query, page by page.
+
+    build_query(count) must return a fresh select builder (filters + order applied),
+    passing `count` to select(). The first page also asks for count="exact";
+    the remaining pages are requested concurrently.
+    """
+    first = build_query(count="exact").range(0, page_size - 1).execute()
+    rows = list(first.data or [])
+    total = first.count if first.count is not None else len(rows)
+
+    # The server may cap pages below page_size (max-rows): follow its page length
+    if rows and len(rows) < page_size and total > len(rows):
+        page_size = len(rows)
+
+    starts = list(range(len(rows), total, page_size)) if rows else []
+
+    def fetch_page(start):
+        return build_query(count=None).range(start, start + page_size - 1).execute().data or []
+
+    if starts:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(starts)))) as pool:
+            for page in pool.map(fetch_page, starts):
+                rows.extend(page)
+
+    if len(rows) != total:
+        raise IncompleteFetchError(f"Lettura incompleta: ricevute {len(rows)} righe su {total}.")
+    return rows
+
+
+def fetch_rows_by_keys(client, table, columns, key_col, keys, order_col="id",
+                       chunk_size=IN_FILTER_CHUNK, max_workers=MAX_WORKERS):
+    """
+    Fetch only the rows whose `key_col` is in `keys`, using chunked in_() filters.
+
+    Each chunk is paginated and checked for completeness (see fetch_paginated);
+    chunks run concurrently.
+    """
+    unique_keys = list(dict.fromkeys(k for k in keys if k is not None and k == k))
+    if not unique_keys:
+        return []
+
+    chunks = [unique_keys[i:i + chunk_size] for i in range(0, len(unique_keys), chunk_size)]
+
+    def fetch_chunk(chunk):
+        def build_query(count=None):
+            return client.table(table).select(columns, count=count).in_(key_col, chunk).order(order_col)
+        return fetch_paginated(build_query, max_workers=1)
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        for chunk_rows in pool.map(fetch_chunk, chunks):
+            rows.extend(chunk_rows)
+    return rows
+
+
+def fetch_range(client, table, date_col, start_date, end_date, columns="*", order_col="id",
+                max_workers=MAX_WORKERS):
+    """Every row of `table` with start_date <= date_col <= end_date (dates or 'YYYY-MM-DD')."""
+    start = start_date if isinstance(start_date, str) else start_date.strftime('%Y-%m-%d')
+    end = end_date if isinstance(end_date, str) else end_date.strftime('%Y-%m-%d')
+
+    def build_query(count=None):
+        return client.table(table).select(columns, count=count).gte(date_col, start).lte(date_col, end).order(order_col)
+    return fetch_paginated(build_query, max_workers=max_workers)
+
+
+def fetch_windows(client, table, date_col, windows, columns="*", order_col="id", max_workers=MAX_WORKERS):
+    """
+    Every row of `table` whose date_col falls in one of the (start_date, end_date)
+    windows: one paginated query with an or=(and(gte, lte), ...) filter.
+    """
+    def day(value):
+        return value if isinstance(value, str) else value.strftime('%Y-%m-%d')
+    condition = ",".join(f"and({date_col}.gte.{day(start)},{date_col}.lte.{day(end)})" for start, end in windows)
+
+    def build_query(count=None):
+        return client.table(table).select(columns, count=count).or_(condition).order(order_col)
+    return fetch_paginated(build_query, max_workers=max_workers)
+
+
+def bulk_write(write_chunk, records, chunk_size=WRITE_CHUNK_SIZE, max_workers=WRITE_WORKERS,
+               retries=WRITE_RETRIES, backoff=WRITE_BACKOFF, idempotent=True, progress=None):
+    """
+    Send `records` in chunks through write_chunk(chunk) (one request per chunk).
+
+    At most `max_workers` chunks are in flight; transient errors are retried with
+    exponential backoff (non-idempotent writes only when the request surely was
+    not applied). progress(written_rows, total_rows) is called from the calling
+    thread after every chunk, so it can drive st.progress.
+    A chunk that keeps failing does not stop the others: BulkWriteError is raised
+    at the end with the report of what was written.
+    """
+    records = list(records)
+    report = WriteReport()
+    errors = []
+    t0 = time.perf_counter()
+
+    def send(chunk):
+        attempt = 0
+        while True:
+            try:
+                write_chunk(chunk)
+                return attempt
+            except Exception as e:
+                if attempt >= retries or not is_transient_error(e, idempotent):
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+                attempt += 1
+
+    chunks = (records[i:i + chunk_size] for i in range(0, len(records), chunk_size))
+    pending = {}
+
+    def collect_one():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            _collect(future, pending.pop(future), report, errors)
+            if progress:
+                progress(report.rows, len(records))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for chunk in chunks:
+            # Backpressure: never queue more chunks than there are workers
+            if len(pending) >= max_workers:
+                collect_one()
+            pending[pool.submit(send, chunk)] = chunk
+        while pending:
+            collect_one()
+
+    report.seconds = time.perf_counter() - t0
+    if errors:
+        raise BulkWriteError(
+            f"Scrittura parziale: {report.rows} righe su {len(records)} "
+            f"({len(errors)} blocchi falliti). Primo errore: {errors[0]}",
+            report,
+        )
+    return report
+
+
+def _collect(future, chunk, report, errors):
+    try:
+        report.retries += future.result()
+        report.rows += len(chunk)
+        report.chunks += 1
+    except Exception as e:
+        report.failed_rows += len(chunk)
+        errors.append(e)
@@ -0,0 +1,94 @@
+import re
+
+import pandas as pd
+
+# Tipi delle colonne lette da Supabase, applicati una volta sola quando le
+# righe diventano un DataFrame (le risposte JSON arrivano come object/str).
+# - category: colonne a pochi valori ripetuti (Evento, Nazionalità, ...)
+# - int32: conteggi (presenze, numero eventi, biglietti)
+# - float64: importi
+# - date: datetime64 (giorno), le colonne orario restano stringhe "HH:MM"
+
+EVENTI_SCHEMA = {
+    'data_inizio': 'date',
+    'data_fine': 'date',
+    'Evento': 'category',
+    'RASSEGNA': 'category',
+    'Nazionalità': 'category',
+    'VOS': 'bool',
+    'Nr. Eventi': 'int32',
+    'Tot. Presenze': 'int32',
+    'Incasso': 'float64',
+}
+
+DETTAGLIO_INGRESSI_SCHEMA = {
+    'data': 'date',
+    'evento': 'category',
+    'interi': 'int32',
+    'ridotti': 'int32',
+    'soci': 'int32',
+    'omaggio': 'int32',
+    'nc': 'int32',
+}
+
+HIGHLIGHTS_SCHEMA = {
+    'data': 'date',
+    'nazione': 'category',
+    'categoria': 'category',
+    'ingressi': 'int32',
+    'proiezioni_count': 'int32',
+    'incasso': 'float64',
+}
+
+ROLLUP_SCHEMA = {
+    'data': 'date',
+    'evento': 'category',
+    'incasso': 'float64',
+    'presenze': 'int32',
+    'n_righe': 'int32',
+    'nr_eventi': 'int32',
+    'interi': 'int32',
+    'ridotti': 'int32',
+    'soci': 'int32',
+    'omaggio': 'int32',
+    'nc': 'int32',
+}
+
+# Colonne lette da ogni vista (select esplicita invece di "*"): solo quelle
+# mostrate o usate nei calcoli, niente id, tmdb_processed, RASSEGNA, ...
+DASHBOARD_EVENTI_COLUMNS = [
+    'data_inizio', 'data_fine', 'Titolo Evento', 'autore', 'Nazionalità',
+    'Nr. Eventi', 'Tot. Presenze', 'Incasso', 'Evento', 'VOS',
+]
+DASHBOARD_DETAIL_COLUMNS = ['data', 'evento', 'interi', 'ridotti', 'soci', 'omaggio', 'nc']
+
+
+def select_list(columns):
+    """PostgREST select string for columns; names with spaces or accents are double-quoted."""
+    return ', '.join(c if re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', c) else f'"{c}"' for c in columns)
+
+
+def apply_schema(df, schema):
+    """Convert the schema columns present in df (others are left as they are)."""
+    converted = {}
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if kind == 'date':
+            converted[col] = values if pd.api.types.is_datetime64_any_dtype(values) else pd.to_datetime(values, errors='coerce')
+        elif kind == 'category':
+            converted[col] = values.astype('category')
+        elif kind == 'bool':
+            converted[col] = values.fillna(False).astype(bool)
+        elif kind == 'float64':
+            converted[col] = pd.to_numeric(values, errors='coerce').fillna(0.0).astype('float64')
+        else:
+            converted[col] = pd.to_numeric(values, errors='coerce').fillna(0).astype(kind)
+    return df.assign(**converted) if converted else df
+
+
+def typed_frame(rows, schema, columns=None):
+    """rows (list of dicts from Supabase) -> typed DataFrame; `columns` for the empty case."""
+    df = pd.DataFrame(rows) if rows else pd.DataFrame(columns=columns)
+    return apply_schema(df, schema)
@@ -178,6 +178,980 @@ def test_fiscali_logic():
     print("✅ Fiscali Grouping by Time Passed")
 
 
+def test_event_rules_vectorized():
+    print("\n--- Starting Event Rules Verification ---")
+    from event_rules import get_evento, classify_evento, classify_rassegna, classify_vos
+
+    # Reference row-by-row RASSEGNA logic (as it was in app.py)
+    def get_rassegna(dt):
+        if pd.isna(dt):
+            return "STANDARD"
+        current_time = dt.time()
+        if pd.Timestamp("06:00:00").time() <= current_time <= pd.Timestamp("13:30:00").time():
+            return "SCUOLE"
+        if (7, 1) <= (dt.month, dt.day) <= (9, 15):
+            return "CASTELLO"
+        return "STANDARD"
+
+    dts = pd.Series(pd.to_datetime([
+        '2023-03-03 21:00:00',  # Venerdì
+        '2023-03-01 14:00:00',  # Bambini (inizio)
+        '2023-03-01 16:00:00',  # Bambini (fine inclusa)
+        '2023-03-01 16:00:01',
+        '2023-03-01 06:00:00',  # Scuole
+        '2023-03-01 13:30:01',
+        '2023-07-01 21:00:00',  # Castello
+        '2023-09-15 23:59:00',
+        '2023-09-16 21:00:00',
+        None,
+    ]))
+
+    pd.testing.assert_series_equal(classify_evento(dts), dts.apply(get_evento))
+    pd.testing.assert_series_equal(classify_rassegna(dts), dts.apply(get_rassegna))
+    print("✅ Evento / RASSEGNA match row-by-row logic")
+
+    titles = pd.Series(["Film (ENG)", "Film (vos)", "Film (Originale)", "Film", None, 42], dtype=object)
+    assert classify_vos(titles).tolist() == [True, True, True, False, False, False]
+    print("✅ VOS Logic Passed")
+
+
+def test_eventi_merge_plan():
+    print("\n--- Starting Merge Plan Verification ---")
+    from import_engine import StalePlanError, plan_eventi_merge, verify_eventi_plan
+
+    df_uploaded = pd.DataFrame({
+        'data_inizio': ['2023-02-01', '2023-01-01', '2023-03-01', '2023-03-05'],
+        'data_fine': ['2023-02-10', '2023-01-05', '2023-03-02', '2023-03-06'],
+        'Titolo Evento': ['Film A', 'Film B', 'Film C', 'Film A'],
+        'autore': ['Regista A', 'Regista B', 'Regista C', 'Regista A2'],
+        'Nr. Eventi': [2, 3, 1, 1],
+        'Tot. Presenze': [50, 30, 10, 5],
+        'Incasso': [300.0, 200.0, 60.0, 25.0],
+    })
+    existing_rows = [
+        {'id': 1, 'Titolo Evento': 'Film A', 'data_inizio': '2023-01-15', 'data_fine': '2023-01-20',
+         'Nr. Eventi': 4, 'autore': 'Regista A', 'Tot. Presenze': 100, 'Incasso': 700.0},
+        # Identical to the uploaded row -> skipped
+        {'id': 2, 'Titolo Evento': 'Film B', 'data_inizio': '2023-01-01', 'data_fine': '2023-01-05',
+         'Nr. Eventi': 3, 'autore': 'Regista B', 'Tot. Presenze': 30, 'Incasso': 200.0},
+    ]
+
+    plan = plan_eventi_merge(df_uploaded, existing_rows, "eventi_importati")
+    updates, inserts = plan.update_records(), plan.insert_records()
+
+    assert len(plan.skipped) == 1
+    assert [r['Titolo Evento'] for r in inserts] == ['Film C']
+    assert len(updates) == 1
+    # Preview keeps the DB values next to the new ones
+    assert plan.updates.iloc[0]['Tot. Presenze (prima)'] == 100
+    assert 'Tot. Presenze (prima)' not in updates[0]
+    upd = updates[0]
+    assert upd['id'] == 1
+    assert upd['Tot. Presenze'] == 155
+    assert upd['Incasso'] == 1025.0
+    assert upd['Nr. Eventi'] == 7
+    assert upd['data_inizio'] == '2023-01-15'
+    assert upd['data_fine'] == '2023-03-06'
+    assert upd['autore'] == 'Regista A2'
+
+    # Unchanged DB -> the plan can be written
+    verify_eventi_plan(plan, existing_rows)
+    # Another import summed into Film A and inserted Film C after "Prepara" -> refused
+    concurrent = [dict(existing_rows[0], **{'Incasso': 750.0}), existing_rows[1],
+                  {'id': 3, 'Titolo Evento': 'Film C', 'data_inizio': '2023-03-01', 'data_fine': '2023-03-02'}]
+    try:
+        verify_eventi_plan(plan, concurrent)
+        assert False, "stale plan accepted"
+    except StalePlanError as e:
+        assert e.titles == ['Film A', 'Film C']
+    print("✅ Merge Plan Passed")
+
+
+class _FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _FakeQuery:
+    """Minimal stand-in for a PostgREST select builder (server page cap included)."""
+
+    def __init__(self, rows, count=None, max_rows=1000):
+        self.rows = rows
+        self.count = count
+        self.max_rows = max_rows
+        self.start, self.end = 0, len(rows) - 1
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def execute(self):
+        end = min(self.end, self.start + self.max_rows - 1)
+        return _FakeResponse(self.rows[self.start:end + 1], len(self.rows) if self.count else None)
+
+
+def test_paginated_fetch():
+    print("\n--- Starting Pagination Verification ---")
+    from supabase_io import fetch_paginated, IncompleteFetchError
+
+    rows = [{'id': i} for i in range(2500)]
+    # Server caps pages at 1000 rows even if we ask for more
+    fetched = fetch_paginated(lambda count=None: _FakeQuery(rows, count, max_rows=1000), page_size=2000)
+    assert [r['id'] for r in fetched] == list(range(2500))
+
+    # A page that comes back short must not go unnoticed
+    class _LossyQuery(_FakeQuery):
+        def execute(self):
+            response = super().execute()
+            if self.start > 0:
+                response.data = response.data[:-1]
+            return response
+
+    try:
+        fetch_paginated(lambda count=None: _LossyQuery(rows, count), page_size=1000)
+        assert False, "IncompleteFetchError expected"
+    except IncompleteFetchError:
+        pass
+
+    # fetch_range: date filters applied server-side, every page collected
+    from supabase_io import fetch_range
+    from datetime import date
+
+    dated = [{'id': i, 'data': f"2023-{1 + i % 12:02d}-01"} for i in range(3000)]
+
+    class _FilterQuery(_FakeQuery):
+        def __init__(self, rows):
+            super().__init__(rows)
+
+        def select(self, columns, count=None):
+            self.count = count
+            return self
+
+        def gte(self, col, value):
+            return _FilterQuery([r for r in self.rows if r[col] >= value]).select(None, self.count)
+
+        def lte(self, col, value):
+            return _FilterQuery([r for r in self.rows if r[col] <= value]).select(None, self.count)
+
+        def order(self, col):
+            return _FilterQuery(sorted(self.rows, key=lambda r: r[col])).select(None, self.count)
+
+    class _Client:
+        def table(self, name):
+            return _FilterQuery(dated)
+
+    fetched = fetch_range(_Client(), "dettaglio_ingressi", "data", date(2023, 1, 1), "2023-06-30")
+    assert len(fetched) == 1500 and all(r['data'] <= "2023-06-30" for r in fetched)
+
+    # fetch_windows: the windows go in a single or=(and(...)) filter
+    from supabase_io import fetch_windows
+    conditions = []
+
+    class _WindowsQuery(_FilterQuery):
+        def or_(self, condition):
+            conditions.append(condition)
+            return _FilterQuery([r for r in self.rows if r['data'][5:7] in ('02', '11')]).select(None, self.count)
+
+    class _WindowsClient:
+        def table(self, name):
+            return _WindowsQuery(dated)
+
+    fetched = fetch_windows(_WindowsClient(), "dettaglio_ingressi", "data",
+                            [(date(2023, 2, 1), date(2023, 2, 28)), ("2023-11-01", "2023-11-30")])
+    assert len(fetched) == 500
+    assert set(conditions) == {"and(data.gte.2023-02-01,data.lte.2023-02-28),and(data.gte.2023-11-01,data.lte.2023-11-30)"}
+    print("✅ Pagination Passed")
+
+
+def test_fiscali_streaming_reader():
+    print("\n--- Starting Fiscali Streaming Verification ---")
+    import io
+    from bench_import import make_fiscali_workbook
+    from import_engine import aggregate_fiscali_rows, iter_fiscali_rows, iter_fiscali_rows_pandas
+
+    data = make_fiscali_workbook(300)
+    streamed = aggregate_fiscali_rows(iter_fiscali_rows(io.BytesIO(data)))
+    loaded = aggregate_fiscali_rows(iter_fiscali_rows_pandas(io.BytesIO(data)))
+
+    assert streamed == loaded
+    assert sum(v['interi'] + v['ridotti'] + v['soci'] + v['omaggio'] + v['nc'] for v in streamed.values()) == 300
+
+    # A wrong <dimension> element must not hide columns or fail the width check
+    import zipfile
+    src = zipfile.ZipFile(io.BytesIO(data))
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w') as dst:
+        for name in src.namelist():
+            body = src.read(name)
+            if name == 'xl/worksheets/sheet1.xml':
+                body = body.replace(b'<sheetData>', b'<dimension ref="A1:C1" /><sheetData>', 1)
+            dst.writestr(name, body)
+    assert aggregate_fiscali_rows(iter_fiscali_rows(io.BytesIO(out.getvalue()))) == loaded
+
+    import openpyxl
+    narrow = openpyxl.Workbook()
+    narrow.active.append(['x'] * 10)
+    buf = io.BytesIO()
+    narrow.save(buf)
+    try:
+        list(iter_fiscali_rows(io.BytesIO(buf.getvalue())))
+        assert False, "narrow sheet accepted"
+    except ValueError:
+        pass
+    print("✅ Streaming Reader Passed")
+
+
+def test_fiscali_vectorized_aggregation():
+    print("\n--- Starting Fiscali Vectorized Verification ---")
+    from datetime import datetime
+    from import_engine import aggregate_fiscali, aggregate_fiscali_rows
+
+    rows = [
+        ("01/01/2023 15.00.00", "Movie A", "I1"),
+        ("01/01/2023 15.00.00", "Movie A", "R7"),
+        (datetime(2023, 1, 1, 17, 0), "Movie A", "R8"),
+        (" 01/01/2023 17.00.00 ", "Movie A", "O7"),
+        ("2023-01-01 21:00", "Movie B", "X9"),  # generic fallback format
+        ("not a date", "Movie B", "I1"),
+        ("01/01/2023 21.00.00", None, "I1"),
+    ]
+    expected = aggregate_fiscali_rows(rows)
+    # Small chunks to exercise the cross-chunk merge as well
+    df_agg = aggregate_fiscali(rows, chunk_rows=3)
+
+    assert len(df_agg) == len(expected) == 3
+    for rec, (key, stats) in zip(df_agg.to_dict('records'), expected.items()):
+        assert (rec['titolo_evento'], rec['data'], rec['orario']) == key
+        for col in ['interi', 'ridotti', 'soci', 'omaggio', 'nc']:
+            assert rec[col] == stats[col]
+    print("✅ Vectorized Aggregation Passed")
+
+
+def test_fiscali_insert_plan():
+    print("\n--- Starting Fiscali Insert Plan Verification ---")
+    from import_engine import aggregate_fiscali, plan_fiscali_insert
+
+    rows = [
+        ("01/03/2023 15.00.00", "Movie A", "I1"),  # mercoledì pomeriggio -> bam
+        ("01/03/2023 21.00.00", "Movie B", "R7"),  # adu
+        ("03/03/2023 21.00.00", "Movie C", "O7"),  # venerdì -> ven
+        ("03/03/2023 21.00.00", "Movie D", "I7"),  # same data/orario/evento, other film (arena)
+        ("04/03/2023 21.00.00", "Movie E", "I7"),
+    ]
+    existing_rows = [
+        {'data': '2023-03-01', 'orario': '21:00:00', 'evento': 'adu', 'titolo_evento': 'Movie B'},
+        {'data': '2023-03-03', 'orario': '21:00:00', 'evento': 'ven', 'titolo_evento': 'Movie D'},
+        {'data': '2023-03-04', 'orario': '21:00:00', 'evento': 'adu', 'titolo_evento': ''},  # before sql/007
+    ]
+
+    plan = plan_fiscali_insert(aggregate_fiscali(rows), existing_rows)
+    records = plan.insert_records()
+
+    assert sorted(plan.skipped['titolo_evento']) == ['Movie B', 'Movie D', 'Movie E']
+    assert plan.update_records() == []
+    assert [(r['data'], r['orario'], r['evento'], r['titolo_evento']) for r in records] == [
+        ('2023-03-01', '15:00', 'bam', 'Movie A'),
+        ('2023-03-03', '21:00', 'ven', 'Movie C'),
+    ]
+    assert all('id' not in r for r in records)
+    assert records[1]['omaggio'] == 1
+    assert plan.insert_conflict == "data,orario,evento,titolo_evento"
+    print("✅ Fiscali Insert Plan Passed")
+
+
+def test_highlights_plan_execution():
+    print("\n--- Starting Highlights Plan + Execution Verification ---")
+    from import_engine import execute_plan, plan_highlights_insert
+
+    df_clean = pd.DataFrame({
+        'data': ['2023-03-01', '2023-03-01', '2023-03-02'],
+        'orario': ['21:00', '18:00', '21:00'],
+        'titolo_evento': ['Film A', 'Film A', 'Film B'],
+        'autore': ['', '', ''], 'nazione': ['', '', ''],
+        'ingressi': [10, 20, 30], 'incasso': [50.0, 100.0, 150.0],
+    })
+    existing_rows = [{'data': '2023-03-01', 'titolo_evento': 'Film A', 'orario': '21:00:00'}]
+
+    plan = plan_highlights_insert(df_clean, existing_rows)
+    assert len(plan.skipped) == 1
+    assert [(r['orario'], r['titolo_evento']) for r in plan.insert_records()] == [('18:00', 'Film A'), ('21:00', 'Film B')]
+
+    calls = []
+
+    class _Table:
+        def upsert(self, chunk, **kwargs):
+            calls.append(('upsert', len(chunk), kwargs))
+            return self
+
+        def insert(self, chunk):
+            calls.append(('insert', len(chunk), {}))
+            return self
+
+        def execute(self):
+            return _FakeResponse([])
+
+    class _Client:
+        def table(self, name):
+            assert name == "eventi_highlights"
+            return _Table()
+
+    progress = []
+    execute_plan(_Client(), plan, progress=lambda done, total: progress.append((done, total)))
+    assert calls == [('upsert', 2, {'on_conflict': plan.insert_conflict, 'ignore_duplicates': True})]
+    assert progress == [(2, 2)]
+
+    # A failed update phase does not skip the inserts: both end up in the report
+    from import_engine import ImportPlan
+    from supabase_io import BulkWriteError
+
+    class _FailingUpdates(_Table):
+        def upsert(self, chunk, **kwargs):
+            if kwargs.get('on_conflict') == 'id':
+                raise ValueError("update rifiutato")
+            return super().upsert(chunk, **kwargs)
+
+    class _FailingClient:
+        def table(self, name):
+            return _FailingUpdates()
+
+    calls.clear()
+    mixed = ImportPlan(table="eventi_importati", inserts=pd.DataFrame({'Titolo Evento': ['Film C']}),
+                       updates=pd.DataFrame({'id': [1], 'Tot. Presenze': [5]}), skipped=pd.DataFrame(),
+                       update_columns=('Tot. Presenze',))
+    try:
+        execute_plan(_FailingClient(), mixed)
+        assert False, "BulkWriteError expected"
+    except BulkWriteError as e:
+        assert e.report.rows == 1 and e.report.failed_rows == 1
+        assert "aggiornamenti" in str(e) and "inserimenti" not in str(e)
+    assert calls == [('insert', 1, {})]
+    print("✅ Highlights Plan + Execution Passed")
+
+
+def test_bulk_write():
+    print("\n--- Starting Bulk Write Verification ---")
+    import threading
+    from postgrest.exceptions import APIError
+    from supabase_io import BulkWriteError, bulk_write
+
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'max_in_flight': 0, 'attempts': {}}
+    written = []
+
+    def write_chunk(chunk):
+        key = chunk[0]
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            state['attempts'][key] = state['attempts'].get(key, 0) + 1
+            attempt = state['attempts'][key]
+        try:
+            if key == 20 and attempt == 1:
+                raise APIError({'message': 'canceling statement due to statement timeout', 'code': '57014'})
+            if key == 40:
+                raise APIError({'message': 'violates not-null constraint', 'code': '23502'})
+            with lock:
+                written.extend(chunk)
+        finally:
+            with lock:
+                state['in_flight'] -= 1
+
+    progress = []
+    try:
+        bulk_write(write_chunk, list(range(95)), chunk_size=10, max_workers=3, backoff=0,
+                   progress=lambda done, total: progress.append((done, total)))
+        assert False, "BulkWriteError expected"
+    except BulkWriteError as e:
+        report = e.report
+
+    # Chunk 20 retried once (transient), chunk 40 fails for good, the others are written
+    assert state['attempts'][20] == 2 and state['attempts'][40] == 1
+    assert report.rows == 85 and report.failed_rows == 10 and report.retries == 1
+    assert sorted(written) == [i for i in range(95) if not 40 <= i < 50]
+    assert state['max_in_flight'] <= 3
+    assert progress[-1] == (85, 95) and len(progress) == 10
+    print("✅ Bulk Write Passed")
+
+
+def test_kpi_metrics_paths():
+    print("\n--- Starting KPI Metrics Verification ---")
+    from dashboard_metrics import calculate_metrics, groups_from_rpc, incasso_deltas, metric_table
+
+    df = pd.DataFrame({
+        'Evento': ['adu', 'adu', 'ven', 'bam', None],
+        'Incasso': [100.0, 50.0, 80.0, 30.0, 10.0],
+        'Tot. Presenze': [10, 5, '8', 6, 1],
+        'Nr. Eventi': [2, 1, 1, 3, 1],
+    })
+    local = calculate_metrics(df)
+    assert list(local.index) == ['TOTALE', 'ADULTI', 'VENERDÌ', 'BAMBINI']
+    assert local.loc['TOTALE', 'incasso'] == 270.0 and local.loc['TOTALE', 'count'] == 5
+    assert local.loc['ADULTI', 'presenze'] == 15 and local.loc['ADULTI', 'avg_ticket'] == 10.0
+    assert local.loc['VENERDÌ', 'count'] == 1 and local.loc['BAMBINI', 'avg_ticket'] == 5.0
+    # Media Ingressi = presenze / Nr. Eventi
+    assert local.loc['ADULTI', 'media_ingressi'] == 5.0 and local.loc['BAMBINI', 'media_ingressi'] == 2.0
+
+    # Same numbers from the kpi_per_evento rows (numeric columns come back as strings)
+    rpc_rows = [
+        {'evento': 'adu', 'incasso': '150.00', 'presenze': '15', 'n_eventi': 2, 'avg_ticket': '10', 'tot_nr_eventi': '3'},
+        {'evento': 'ven', 'incasso': '80', 'presenze': '8', 'n_eventi': 1, 'avg_ticket': '10', 'tot_nr_eventi': '1'},
+        {'evento': 'bam', 'incasso': '30', 'presenze': '6', 'n_eventi': 1, 'avg_ticket': '5', 'tot_nr_eventi': '3'},
+        {'evento': None, 'incasso': '10', 'presenze': '1', 'n_eventi': 1, 'avg_ticket': '10', 'tot_nr_eventi': '1'},
+    ]
+    pd.testing.assert_frame_equal(metric_table(groups_from_rpc(rpc_rows)), local)
+
+    # Empty period (e.g. no Friday screenings): zeros, no division errors
+    empty = calculate_metrics(pd.DataFrame(columns=['Evento', 'Incasso']))
+    assert empty.loc['TOTALE', 'avg_ticket'] == 0 and empty.loc['VENERDÌ', 'media_ingressi'] == 0
+
+    deltas = incasso_deltas(local, empty)
+    assert deltas['TOTALE'] == 100.0
+    assert incasso_deltas(empty, empty)['ADULTI'] == 0.0
+    half = local.copy()
+    half['incasso'] = half['incasso'] / 2
+    assert (incasso_deltas(local, half) == 100.0).all()
+    print("✅ KPI Metrics Passed")
+
+
+def test_result_cache():
+    print("\n--- Starting Result Cache Verification ---")
+    from result_cache import ResultCache, result_size
+
+    now = [0.0]
+    frame = pd.DataFrame({'Incasso': np.arange(100, dtype=float)})
+    size = result_size(frame)
+    cache = ResultCache(ttl=60, max_bytes=size * 2, clock=lambda: now[0])
+
+    calls = []
+    def fetch():
+        calls.append(1)
+        return frame
+
+    key = ("eventi_importati", "*", "2023-01-01", "2023-01-31")
+    cache.get_or_fetch(key, fetch)
+    hit = cache.get_or_fetch(key, fetch)
+    assert len(calls) == 1
+    # Callers may add columns without touching the cached frame
+    hit['extra'] = 1
+    assert 'extra' not in cache.get(key).columns
+
+    # TTL
+    now[0] = 61
+    assert cache.get(key) is None and cache.nbytes == 0
+
+    # LRU eviction by memory: the least recently used entry goes first
+    cache.put(("a", "*", "1", "1"), frame)
+    cache.put(("b", "*", "1", "1"), frame)
+    cache.get(("a", "*", "1", "1"))
+    cache.put(("c", "*", "1", "1"), frame)
+    assert cache.get(("b", "*", "1", "1")) is None
+    assert cache.get(("a", "*", "1", "1")) is not None and cache.nbytes <= size * 2
+
+    # Invalidation after an import touches only that table
+    cache.invalidate("a")
+    assert cache.get(("a", "*", "1", "1")) is None and len(cache) == 1
+
+    # Range cache: narrowing is served locally, widening fetches only the edges
+    days = pd.date_range("2023-01-01", "2023-12-31").strftime('%Y-%m-%d')
+    table_rows = pd.DataFrame({'data': days, 'Incasso': 1.0})
+    fetched = []
+
+    def fetch_range(start, end):
+        fetched.append((start, end))
+        return table_rows[(table_rows['data'] >= start) & (table_rows['data'] <= end)].reset_index(drop=True)
+
+    cache = ResultCache(ttl=60, clock=lambda: now[0])
+    get = lambda s, e: cache.get_range("dettaglio_ingressi", "*", "data", s, e, fetch_range)
+    assert len(get("2023-03-01", "2023-05-31")) == 92
+    narrow = get("2023-04-10", "2023-04-20")
+    assert narrow['data'].tolist() == list(days[99:110]) and len(fetched) == 1
+    wide = get("2023-02-01", "2023-06-30")
+    assert fetched[1:] == [("2023-02-01", "2023-02-28"), ("2023-06-01", "2023-06-30")]
+    assert wide['data'].is_unique and len(wide) == 150
+    assert len(cache) == 1   # merged into one range
+    get("2023-06-15", "2023-06-16")
+    assert len(fetched) == 3
+    assert cache.covers("dettaglio_ingressi", "*", "data", "2023-03-01", "2023-03-31")
+    # A request spanning two cached ranges fetches only the gap between them and past the end
+    get("2023-09-01", "2023-09-30")
+    assert not cache.covers("dettaglio_ingressi", "*", "data", "2023-05-01", "2023-10-15")
+    spanning = get("2023-05-01", "2023-10-15")
+    assert fetched[4:] == [("2023-07-01", "2023-08-31"), ("2023-10-01", "2023-10-15")]
+    assert spanning['data'].tolist() == list(days[120:288])
+    assert len(cache) == 1 and len(get("2023-02-01", "2023-10-15")) == 257 and len(fetched) == 6
+    print("✅ Result Cache Passed")
+
+
+def test_table_schema():
+    print("\n--- Starting Table Schema Verification ---")
+    from table_schema import DASHBOARD_DETAIL_COLUMNS, DETTAGLIO_INGRESSI_SCHEMA, EVENTI_SCHEMA, select_list, typed_frame
+    from result_cache import ResultCache
+
+    rows = [
+        {'id': 1, 'data_inizio': '2023-01-02', 'Evento': 'adu', 'Incasso': '10.50', 'Tot. Presenze': '3', 'Nr. Eventi': 1, 'VOS': None},
+        {'id': 2, 'data_inizio': '2023-01-06', 'Evento': 'ven', 'Incasso': None, 'Tot. Presenze': None, 'Nr. Eventi': '2', 'VOS': True},
+    ]
+    df = typed_frame(rows, EVENTI_SCHEMA)
+    assert pd.api.types.is_datetime64_any_dtype(df['data_inizio'])
+    assert isinstance(df['Evento'].dtype, pd.CategoricalDtype)
+    assert df['Tot. Presenze'].dtype == 'int32' and df['Tot. Presenze'].tolist() == [3, 0]
+    assert df['Incasso'].tolist() == [10.5, 0.0] and df['VOS'].tolist() == [False, True]
+
+    # Empty result: same columns, already typed
+    empty = typed_frame([], DETTAGLIO_INGRESSI_SCHEMA, DASHBOARD_DETAIL_COLUMNS)
+    assert empty.empty and empty['interi'].dtype == 'int32'
+
+    # Explicit projections: only names PostgREST can't parse as-is are quoted
+    assert select_list(['data_inizio', 'Titolo Evento', 'Nazionalità', 'Evento']) == 'data_inizio, "Titolo Evento", "Nazionalità", Evento'
+
+    # Range cache merges keep the category dtype
+    def fetch(start, end):
+        day = pd.Timestamp(start)
+        return typed_frame([{'data': start, 'evento': 'adu' if day.day % 2 else 'ven', 'interi': 1}], DETTAGLIO_INGRESSI_SCHEMA)
+
+    cache = ResultCache()
+    cache.get_range("dettaglio_ingressi", "*", "data", "2023-01-02", "2023-01-02", fetch)
+    merged = cache.get_range("dettaglio_ingressi", "*", "data", "2023-01-01", "2023-01-02", fetch)
+    assert isinstance(merged['evento'].dtype, pd.CategoricalDtype) and len(merged) == 2
+    print("✅ Table Schema Passed")
+
+
+def test_pie_preparation():
+    print("\n--- Starting Pie Preparation Verification ---")
+    from dashboard_metrics import nationality_shares, ticket_totals
+
+    df = pd.DataFrame({
+        'Nazionalità': pd.Categorical(['ITA', 'FRA', 'USA', 'ITA', 'JPN', None]),
+        'Incasso': [100.0, 20.0, 3.0, 50.0, 2.0, 10.0],
+    })
+    shares = nationality_shares(df)
+    # USA (3/175) and JPN (2/175) are below 5% -> Altri
+    assert shares['Nazionalità'].tolist() == ['ITA', 'FRA', 'Altri']
+    assert shares['Incasso'].tolist() == [150.0, 20.0, 5.0]
+    assert nationality_shares(df.assign(Incasso=0.0)).empty
+
+    detail = pd.DataFrame({
+        'evento': pd.Categorical(['adu', 'ven', 'adu', None]),
+        'interi': [1, 2, 3, 4], 'ridotti': [1, 1, 1, 1], 'soci': [0, 0, 0, 0], 'omaggio': [1, 0, 0, 0],
+    })
+    totals = ticket_totals(detail)
+    assert totals.loc['TOTALE', 'interi'] == 10 and totals.loc['TOTALE', 'rows'] == 4
+    assert totals.loc['ADULTI', 'interi'] == 4 and totals.loc['ADULTI', 'omaggio'] == 1
+    assert totals.loc['BAMBINI', 'rows'] == 0
+    print("✅ Pie Preparation Passed")
+
+
+def test_multi_season_grouping():
+    print("\n--- Starting Multi-Season Verification ---")
+    from dashboard_metrics import (
+        calculate_metrics, nationality_shares, period_metric_tables, period_nationality_shares,
+        period_summary, period_ticket_totals, season_periods, ticket_totals
+    )
+    from table_schema import DETTAGLIO_INGRESSI_SCHEMA, EVENTI_SCHEMA, typed_frame
+
+    periods = season_periods('2024-09-01', '2025-01-31', 3)
+    assert [p[0] for p in periods] == ['2022-23', '2023-24', '2024-25']
+    assert periods[0][1] == pd.Timestamp('2022-09-01') and periods[0][2] == pd.Timestamp('2023-01-31')
+    try:
+        season_periods('2024-01-01', '2025-01-01', 2)
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+
+    days = pd.date_range('2022-06-01', '2025-03-31')
+    df = typed_frame([
+        {'data_inizio': d.strftime('%Y-%m-%d'), 'Evento': ['adu', 'ven', 'bam'][i % 3],
+         'Incasso': float(i % 50), 'Tot. Presenze': i % 7, 'Nr. Eventi': 1}
+        for i, d in enumerate(days)
+    ], EVENTI_SCHEMA)
+    detail = typed_frame([
+        {'data': d.strftime('%Y-%m-%d'), 'evento': ['adu', 'ven'][i % 2], 'interi': i % 3, 'ridotti': 1, 'soci': 0, 'omaggio': 0}
+        for i, d in enumerate(days)
+    ], DETTAGLIO_INGRESSI_SCHEMA)
+
+    # One grouped pass == one calculation per period on its own slice
+    tables = period_metric_tables(df, periods)
+    tickets = period_ticket_totals(detail, periods)
+    for label, start, end in periods:
+        in_period = df[(df['data_inizio'] >= start) & (df['data_inizio'] <= end)]
+        pd.testing.assert_frame_equal(tables[label], calculate_metrics(in_period))
+        in_period = detail[(detail['data'] >= start) & (detail['data'] <= end)]
+        pd.testing.assert_frame_equal(tickets[label].astype(float), ticket_totals(in_period).astype(float))
+
+    summary = period_summary(tables, 'TOTALE')
+    assert pd.isna(summary['delta_incasso'].iloc[0])
+    expected = (summary['incasso'].iloc[1] - summary['incasso'].iloc[0]) / summary['incasso'].iloc[0] * 100
+    assert abs(summary['delta_incasso'].iloc[1] - expected) < 1e-9
+
+    # Same top cap per period as the single-period pie (20 nations at 5% each)
+    nations = df.assign(**{'Nazionalità': [f'N{i % 20:02d}' for i in range(len(df))], 'Incasso': 1.0})
+    shares = period_nationality_shares(nations, periods)
+    for label, start, end in periods:
+        part = shares[shares['periodo'] == label]
+        in_period = nations[(nations['data_inizio'] >= start) & (nations['data_inizio'] <= end)]
+        assert len(part) == 10
+        assert part['Incasso'].tolist() == nationality_shares(in_period)['Incasso'].tolist()
+    print("✅ Multi-Season Passed")
+
+
+def test_daily_rollup():
+    print("\n--- Starting Daily Rollup Verification ---")
+    from daily_rollup import (
+        ROLLUP_PENDING_TABLE, ROLLUP_TABLE, build_daily_rollup, fetch_period_rollup, fetch_rollup,
+        groups_from_rollup, mark_rollup_pending, pie_frames_from_rollup, plan_days, refresh_daily_rollup,
+    )
+    from dashboard_metrics import calculate_metrics, metric_table, nationality_shares, ticket_totals
+    from import_engine import ImportPlan
+    from table_schema import DETTAGLIO_INGRESSI_SCHEMA, EVENTI_SCHEMA, typed_frame
+
+    eventi_rows = [
+        {'id': 1, 'data_inizio': '2023-03-01', 'Evento': 'adu', 'Nazionalità': 'ITA', 'Incasso': 100.0, 'Tot. Presenze': 10, 'Nr. Eventi': 2},
+        {'id': 2, 'data_inizio': '2023-03-01', 'Evento': 'adu', 'Nazionalità': 'FRA', 'Incasso': 50.0, 'Tot. Presenze': 5, 'Nr. Eventi': 1},
+        {'id': 3, 'data_inizio': '2023-03-03', 'Evento': 'ven', 'Nazionalità': 'ITA', 'Incasso': 80.0, 'Tot. Presenze': 8, 'Nr. Eventi': 1},
+        {'id': 4, 'data_inizio': '2023-03-03', 'Evento': None, 'Nazionalità': None, 'Incasso': 10.0, 'Tot. Presenze': 1, 'Nr. Eventi': 1},
+    ]
+    detail_rows = [
+        {'id': 1, 'data': '2023-03-01', 'evento': 'adu', 'interi': 4, 'ridotti': 3, 'soci': 2, 'omaggio': 1, 'nc': 0},
+        {'id': 2, 'data': '2023-03-02', 'evento': 'bam', 'interi': 1, 'ridotti': 5, 'soci': 0, 'omaggio': 0, 'nc': 0},
+    ]
+    tables = {'eventi_importati': eventi_rows, 'dettaglio_ingressi': detail_rows,
+              ROLLUP_TABLE: [{'id': 99, 'data': '2023-03-02', 'evento': 'ven', 'incasso': 1.0}],
+              ROLLUP_PENDING_TABLE: []}
+
+    class _Query:
+        def __init__(self, name, rows=None):
+            self.name, self.rows, self.count = name, list(tables[name]) if rows is None else rows, None
+            self.action, self.start, self.end = 'select', 0, None
+
+        def _filter(self, keep):
+            self.rows = [r for r in self.rows if keep(r)]
+            return self
+
+        def select(self, columns, count=None):
+            self.count = count
+            return self
+
+        def in_(self, col, values):
+            return self._filter(lambda r: r.get(col) in values)
+
+        def gte(self, col, value):
+            return self._filter(lambda r: r.get(col) >= value)
+
+        def lte(self, col, value):
+            return self._filter(lambda r: r.get(col) <= value)
+
+        def order(self, col):
+            return self
+
+        def range(self, start, end):
+            self.start, self.end = start, end
+            return self
+
+        def limit(self, n):
+            return self.range(0, n - 1)
+
+        def insert(self, chunk):
+            tables[self.name].extend(chunk)
+            return self
+
+        def execute(self):
+            end = len(self.rows) if self.end is None else self.end + 1
+            return _FakeResponse(self.rows[self.start:end], len(self.rows) if self.count else None)
+
+    class _Rpc:
+        def __init__(self, params, fail):
+            self.params, self.fail = params, fail
+
+        def execute(self):
+            # sostituisci_rollup_giornaliero: one transaction, nothing changes if it fails
+            if self.fail:
+                raise RuntimeError("timeout")
+            p = self.params
+            tables[ROLLUP_TABLE] = [r for r in tables[ROLLUP_TABLE] if r['data'] not in p['p_giorni']] + p['p_righe']
+            tables[ROLLUP_PENDING_TABLE] = [r for r in tables[ROLLUP_PENDING_TABLE] if r['import_id'] != p['p_import']]
+            return _FakeResponse([])
+
+    class _Client:
+        fail = False
+
+        def table(self, name):
+            return _Query(name)
+
+        def rpc(self, name, params):
+            return _Rpc(params, self.fail)
+
+    # Direct build: one row per (data, evento), tickets-only days included
+    built = build_daily_rollup(typed_frame(eventi_rows, EVENTI_SCHEMA), typed_frame(detail_rows, {}))
+    assert len(built) == 4
+    first = built[(built['data'] == '2023-03-01') & (built['evento'] == 'adu')].iloc[0]
+    assert first['incasso'] == 150.0 and first['n_righe'] == 2 and first['nr_eventi'] == 3 and first['interi'] == 4
+    assert first['nazionalita'] == {'ITA': 100.0, 'FRA': 50.0}
+    assert built[built['evento'] == 'bam'].iloc[0]['incasso'] == 0 and built[built['evento'] == 'bam'].iloc[0]['ridotti'] == 5
+
+    # Days touched by a plan: inserts, updates and the old date of a moved row
+    plan = ImportPlan(
+        table='eventi_importati',
+        inserts=pd.DataFrame({'data_inizio': ['2023-03-03']}),
+        updates=pd.DataFrame({'id': [1], 'data_inizio': ['2023-03-01'], 'data_inizio (prima)': ['2023-03-02']}),
+        skipped=pd.DataFrame(),
+    )
+    days = plan_days(plan, 'data_inizio')
+    assert days == ['2023-03-01', '2023-03-02', '2023-03-03']
+
+    # Refresh rewrites those days: the stale 2023-03-02/ven row disappears, the flags go
+    token = mark_rollup_pending(_Client(), days)
+    assert len(tables[ROLLUP_PENDING_TABLE]) == 3
+    assert refresh_daily_rollup(_Client(), days, token) == 4
+    assert not any(r['evento'] == 'ven' and r['data'] == '2023-03-02' for r in tables[ROLLUP_TABLE])
+    assert tables[ROLLUP_PENDING_TABLE] == []
+
+    # Read paths: same KPIs and pies as the raw rows, unclassified evento counted in TOTALE only
+    rollup = fetch_rollup(_Client(), '2023-03-01', '2023-03-31')
+    assert rollup['evento'].isna().sum() == 1
+    period = fetch_period_rollup(_Client(), 'eventi_importati', '2023-03-01', '2023-03-31')
+    pd.testing.assert_frame_equal(metric_table(groups_from_rollup(period)),
+                                  calculate_metrics(typed_frame(eventi_rows, EVENTI_SCHEMA)))
+    nations, tickets = pie_frames_from_rollup(period)
+    pd.testing.assert_frame_equal(nationality_shares(nations).reset_index(drop=True),
+                                  nationality_shares(typed_frame(eventi_rows, EVENTI_SCHEMA)).reset_index(drop=True),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(ticket_totals(tickets), ticket_totals(typed_frame(detail_rows, DETTAGLIO_INGRESSI_SCHEMA)),
+                                  check_dtype=False)
+    assert fetch_period_rollup(_Client(), 'eventi_importati', '2024-01-01', '2024-01-31') is None
+    # Another eventi table: the rollup does not describe it
+    assert fetch_period_rollup(_Client(), 'eventi_prova', '2023-03-01', '2023-03-31') is None
+
+    # A failed refresh keeps the old rows and the flags: those ranges fall back to the RPC
+    failing = _Client()
+    failing.fail = True
+    token = mark_rollup_pending(failing, ['2023-03-03'])
+    try:
+        refresh_daily_rollup(failing, ['2023-03-03'], token)
+        assert False, "RuntimeError expected"
+    except RuntimeError:
+        pass
+    assert len([r for r in tables[ROLLUP_TABLE] if r['data'] == '2023-03-03']) == 2
+    assert fetch_period_rollup(_Client(), 'eventi_importati', '2023-03-01', '2023-03-31') is None
+    assert fetch_period_rollup(_Client(), 'eventi_importati', '2023-03-01', '2023-03-02') is not None
+    print("✅ Daily Rollup Passed")
+
+
+def test_season_rules():
+    print("\n--- Starting Season Rules Verification ---")
+    from season_rules import anno_sociale, fetch_season_totals, is_summer, season_totals, summer_totals, totals_from_rpc
+
+    dates = pd.Series(pd.to_datetime([
+        '2023-09-01', '2023-12-31', '2024-01-01', '2024-05-31', '2024-06-01',
+        '2024-07-01', '2024-09-10', '2024-09-11', None,
+    ]))
+    seasons = anno_sociale(dates)
+    assert seasons.astype(object).where(seasons.notna(), None).tolist() == [
+        '2023-24', '2023-24', '2023-24', '2023-24', None, None, '2024-25', '2024-25', None]
+    assert list(seasons.cat.categories) == ['2023-24', '2024-25'] and seasons.cat.ordered
+    assert is_summer(dates).tolist() == [True, False, False, False, False, True, True, False, False]
+
+    df = pd.DataFrame({
+        'data': pd.to_datetime(['2022-10-01', '2023-02-01', '2023-10-01', '2023-07-15', '2023-09-05', '2024-08-01']),
+        'evento': pd.Categorical(['adu', 'ven', 'adu', None, 'adu', 'bam']),
+        'presenze': [10, 20, 30, 40, 50, 60],
+        'incasso': [100.0, 200.0, 300.0, 400.0, 350.0, 0.0],
+    })
+    grouped = season_totals(df)
+    assert grouped[['anno_sociale', 'evento', 'presenze']].astype(object).values.tolist() == [
+        ['2022-23', 'Adulti', 10], ['2022-23', 'Venerdì', 20], ['2023-24', 'Adulti', 80]]
+
+    # Summer: every evento (also unclassified), price on the grouped rows
+    summer = summer_totals(df)
+    assert summer['anno_solare'].tolist() == [2023, 2024]
+    assert summer['presenze'].tolist() == [90, 60] and summer['media_prezzo'].tolist() == [750.0 / 90, 0.0]
+
+    # riepiloghi_stagioni rows (numeric as strings, unclassified evento included) -> same frames
+    rpc_rows = [
+        {'periodo': 'stagione', 'anno': 2023, 'evento': 'adu', 'presenze': '80', 'incasso': '650'},
+        {'periodo': 'stagione', 'anno': 2022, 'evento': 'ven', 'presenze': '20', 'incasso': '200'},
+        {'periodo': 'stagione', 'anno': 2022, 'evento': 'adu', 'presenze': '10', 'incasso': '100'},
+        {'periodo': 'stagione', 'anno': 2023, 'evento': None, 'presenze': '5', 'incasso': '5'},
+        {'periodo': 'estate', 'anno': 2024, 'evento': None, 'presenze': '60', 'incasso': '0'},
+        {'periodo': 'estate', 'anno': 2023, 'evento': None, 'presenze': '90', 'incasso': '750'},
+    ]
+    rpc_seasons, rpc_summer = totals_from_rpc(rpc_rows)
+    pd.testing.assert_frame_equal(rpc_seasons, grouped, check_dtype=False)
+    pd.testing.assert_frame_equal(rpc_summer, summer, check_dtype=False)
+
+    # RPC not installed: None, the page groups the rows itself
+    class _Client:
+        def rpc(self, name, params):
+            assert params['p_season_first_month'] == 9 and params['p_summer_end_md'] == 910
+            raise RuntimeError("function not found")
+    assert fetch_season_totals(_Client(), 'eventi_importati') is None
+    print("✅ Season Rules Passed")
+
+
+def test_season_cache():
+    print("\n--- Starting Season Cache Verification ---")
+    from season_cache import (
+        SEASON_CACHE_MARK_RPC, SEASON_CACHE_SAVE_RPC, SEASON_CACHE_TABLE, load_season_totals, mark_stale, touched_periods,
+    )
+    from season_rules import period_rows, season_totals, summer_totals
+
+    df = pd.DataFrame({
+        'data': pd.to_datetime(['2022-10-01', '2023-02-01', '2023-07-15', '2023-10-01', '2024-08-01', '2024-10-05']),
+        'evento': pd.Categorical(['adu', 'ven', 'adu', 'adu', 'bam', 'ven']),
+        'presenze': [10, 20, 40, 30, 60, 5],
+        'incasso': [100.0, 200.0, 400.0, 300.0, 0.0, 50.0],
+    })
+    cache_rows, rpc_calls, during_rpc = [], [], []
+
+    class _Table:
+        def __init__(self, rows=None):
+            self.rows, self.count = rows, None
+
+        def select(self, columns, count=None):
+            self.rows, self.count = [dict(r) for r in cache_rows], count
+            return self
+
+        def order(self, col):
+            return self
+
+        def range(self, start, end):
+            self.rows = self.rows[start:end + 1]
+            return self
+
+        def execute(self):
+            return _FakeResponse(self.rows, len(cache_rows) if self.count else None)
+
+    class _Rpc:
+        def __init__(self, params):
+            self.params = params
+
+        def execute(self):
+            rpc_calls.append(self.params)
+            while during_rpc:
+                during_rpc.pop()()   # an import landing while the page recomputes
+            if 'p_start' not in self.params:
+                raise RuntimeError("function not found")   # first run: local grouping
+            start, end = pd.Timestamp(self.params['p_start']), pd.Timestamp(self.params['p_end'])
+            return _FakeResponse(period_rows(df[(df['data'] >= start) & (df['data'] <= end)]))
+
+    class _Client:
+        def table(self, name):
+            assert name == SEASON_CACHE_TABLE
+            return _Table()
+
+        def rpc(self, name, params):
+            # sql/010: flags bump the version, saves only where it is still the one read
+            if name == SEASON_CACHE_MARK_RPC:
+                for item in params['p_periodi']:
+                    entry = find(item)
+                    if entry is None:
+                        cache_rows.append(dict(item, totali=None, versione=1))
+                    else:
+                        entry.update(totali=None, versione=entry['versione'] + 1)
+                return _Done()
+            if name == SEASON_CACHE_SAVE_RPC:
+                for item in params['p_voci']:
+                    entry, version = find(item), item['versione'] or 0
+                    if entry is None:
+                        cache_rows.append(dict(item, versione=version))
+                    elif entry['versione'] == version:
+                        entry['totali'] = item['totali']
+                return _Done()
+            return _Rpc(params)
+
+    class _Done:
+        def execute(self):
+            return _FakeResponse([])
+
+    def find(item):
+        return next((r for r in cache_rows if (r['periodo'], r['anno']) == (item['periodo'], item['anno'])), None)
+
+    def assert_totals(totals):
+        pd.testing.assert_frame_equal(totals[0], season_totals(df), check_dtype=False)
+        pd.testing.assert_frame_equal(totals[1], summer_totals(df), check_dtype=False)
+
+    # First run (after an import that only flagged its period): every period up to the
+    # current one, years without data included
+    mark_stale(_Client(), 'eventi_importati', ['2024-10-05'])
+    totals, recomputed = load_season_totals(_Client(), 'eventi_importati', lambda: df, today='2024-11-20')
+    assert_totals(totals)
+    assert recomputed == [('estate', 2023), ('estate', 2024), ('stagione', 2022), ('stagione', 2023), ('stagione', 2024)]
+
+    # Next visit: served from the cache, nothing recomputed
+    def no_rows():
+        raise AssertionError("cache hit expected")
+    rpc_calls.clear()
+    totals, recomputed = load_season_totals(_Client(), 'eventi_importati', no_rows, today='2024-11-20')
+    assert_totals(totals)
+    assert recomputed == [] and rpc_calls == []
+
+    # An import into the current season flags only that period: one ranged call
+    assert touched_periods(['2024-10-05', '2024-07-20', '2024-06-15']) == [('estate', 2024), ('stagione', 2024)]
+    df.loc[5, 'presenze'] = 7
+    mark_stale(_Client(), 'eventi_importati', ['2024-10-05'])
+    totals, recomputed = load_season_totals(_Client(), 'eventi_importati', no_rows, today='2024-11-20')
+    assert recomputed == [('stagione', 2024)]
+    assert (rpc_calls[-1]['p_start'], rpc_calls[-1]['p_end']) == ('2024-09-01', '2025-05-31')
+    assert_totals(totals)
+
+    # An import flagging the period while it is recomputed: the older totals are not saved
+    df.loc[5, 'presenze'] = 9
+    mark_stale(_Client(), 'eventi_importati', ['2024-10-05'])
+    during_rpc.append(lambda: mark_stale(_Client(), 'eventi_importati', ['2024-10-06']))
+    load_season_totals(_Client(), 'eventi_importati', no_rows, today='2024-11-20')
+    assert find({'periodo': 'stagione', 'anno': 2024})['totali'] is None
+    totals, recomputed = load_season_totals(_Client(), 'eventi_importati', no_rows, today='2024-11-20')
+    assert recomputed == [('stagione', 2024)]
+    assert_totals(totals)
+
+    # Another eventi table: the cache is neither flagged nor read for it
+    assert mark_stale(_Client(), 'eventi_prova', ['2024-10-05']) == 0
+    try:
+        load_season_totals(_Client(), 'eventi_prova', no_rows, today='2024-11-20')
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+    print("✅ Season Cache Passed")
+
+
+def test_top_flop_parser():
+    print("\n--- Starting Top/Flop Verification ---")
+    from import_engine import parse_top_flop, build_highlights_payload
+
+    df_tf = pd.DataFrame({i: [None] * 5 for i in range(13)})
+    df_tf[0] = ["01/03/2023 21:00", "14/06/2023 21:00", "15/06/2023 21:00", "01/10/2023 18:30", "02/10/2023 21:00"]
+    df_tf[1] = [" Film A ", "Film B", "Film C (estate)", "Film D", "Film E"]
+    df_tf[2] = ["Regista A", None, "Regista C", "Regista D", "Regista E"]
+    df_tf[10] = [120, 30, 80, "n/d", 0]
+    df_tf[12] = [900.5, "gratis", 400.0, 10.0, 0.0]
+
+    records = build_highlights_payload(parse_top_flop(df_tf))
+
+    # Film C: estate, Film D: ingressi non numerici, Film E: 0 ingressi
+    assert [r['titolo_evento'] for r in records] == ['Film A', 'Film B']
+    assert records[0]['data'] == '2023-03-01' and records[0]['orario'] == '21:00'
+    assert records[1]['autore'] == '' and records[1]['incasso'] == 0.0
+    assert records[0]['categoria'] == 'DATA' and records[0]['proiezioni_count'] == 1
+    print("✅ Top/Flop Parser Passed")
+
+
 if __name__ == "__main__":
     test_logic()
     test_fiscali_logic()
+    test_event_rules_vectorized()
+    test_eventi_merge_plan()
+    test_paginated_fetch()
+    test_fiscali_streaming_reader()
+    test_fiscali_vectorized_aggregation()
+    test_fiscali_insert_plan()
+    test_highlights_plan_execution()
+    test_bulk_write()
+    test_kpi_metrics_paths()
+    test_result_cache()
+    test_table_schema()
+    test_pie_preparation()
+    test_multi_season_grouping()
+    test_daily_rollup()
+    test_season_rules()
+    test_season_cache()
+    test_top_flop_parser()